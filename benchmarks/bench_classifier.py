@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: session memory classification
+Compares the single compiled classifier with the previous per-pattern loop.
+
+    python benchmarks/bench_classifier.py [--texts N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_parser import MEMORY_TYPE_RULES, detect_memory_type
+
+SAMPLES = [
+    "We decided to go with PostgreSQL for the event store since it already runs in prod.",
+    "The error was in the retry loop: fixed the off-by-one and it works now.",
+    "The architecture splits ingestion and query into separate services behind a queue.",
+    "By default I keep configuration in environment variables and never commit secrets.",
+    "Here's the command:\n```bash\nsystemctl restart ollama\n```",
+    "Reading the logs again, the request took 340ms on average, nothing unusual there.",
+    "Let me check the remaining files in the directory listing before going further.",
+]
+
+
+def legacy_detect_memory_type(text: str) -> tuple[str, float]:
+    """The classifier before it was compiled: up to ~25 re.search calls per text"""
+    text_lower = text.lower()
+    for name, patterns, confidence in MEMORY_TYPE_RULES:
+        for pattern in patterns:
+            if re.search(pattern, text_lower, re.IGNORECASE):
+                return name, confidence
+    return "context", 0.5
+
+
+def make_texts(count: int, seed: int = 42) -> list[str]:
+    """Assistant-sized texts: mostly neutral prose with a classified sentence now and then"""
+    rng = random.Random(seed)
+    neutral = SAMPLES[-2:]
+    texts = []
+    for _ in range(count):
+        parts = [rng.choice(neutral) for _ in range(rng.randint(3, 20))]
+        if rng.random() < 0.4:
+            parts.insert(rng.randrange(len(parts) + 1), rng.choice(SAMPLES))
+        texts.append(" ".join(parts))
+    return texts
+
+
+def bench(fn, texts: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=5000, help="Number of texts (default: 5000)")
+    parser.add_argument("--repeat", type=int, default=5, help="Best of N runs (default: 5)")
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    mismatches = sum(detect_memory_type(t) != legacy_detect_memory_type(t) for t in texts)
+
+    legacy = bench(legacy_detect_memory_type, texts, args.repeat)
+    compiled = bench(detect_memory_type, texts, args.repeat)
+
+    print(f"texts: {len(texts)}, avg {sum(map(len, texts)) // len(texts)} chars, mismatches: {mismatches}")
+    print(f"legacy:   {legacy * 1000:8.1f} ms  ({legacy / len(texts) * 1e6:6.1f} µs/text)")
+    print(f"compiled: {compiled * 1000:8.1f} ms  ({compiled / len(texts) * 1e6:6.1f} µs/text)")
+    print(f"speedup:  {legacy / compiled:.1f}x")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
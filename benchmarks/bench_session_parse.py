@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: session file parsing throughput
+Compares parse_session_file with and without the raw-line prefilter on a
+synthetic tool-heavy session (most lines are tool results and user turns).
+
+    python benchmarks/bench_session_parse.py [--lines N] [--repeat N]
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import session_parser
+from session_parser import parse_session_file
+
+
+def make_session(path: Path, lines: int, seed: int = 42):
+    rng = random.Random(seed)
+    payload = "x = compute(value)  # some tool output line\n" * 40
+    with open(path, "w") as f:
+        for i in range(lines):
+            roll = rng.random()
+            if roll < 0.08:
+                msg = {"type": "assistant", "timestamp": f"t{i}", "message": {"content": [
+                    {"type": "text", "text": "We decided to go with the streaming reader because it keeps memory flat."}
+                ]}}
+            elif roll < 0.45:
+                msg = {"type": "assistant", "message": {"content": [
+                    {"type": "tool_use", "name": "Bash", "input": {"command": "ls -la"}}
+                ]}}
+            elif roll < 0.9:
+                msg = {"type": "user", "message": {"content": [
+                    {"type": "tool_result", "content": payload}
+                ]}}
+            else:
+                msg = {"type": "progress", "data": {"step": i, "detail": payload[:200]}}
+            f.write(json.dumps(msg, separators=(",", ":")) + "\n")
+
+
+def bench(path: Path, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = sum(1 for _ in parse_session_file(path))
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", type=int, default=50000, help="Lines in the synthetic session (default: 50000)")
+    parser.add_argument("--repeat", type=int, default=3, help="Best of N runs (default: 3)")
+    parser.add_argument("--stdlib-json", action="store_true", help="Decode with json even if orjson is installed")
+    args = parser.parse_args()
+    if args.stdlib_json:
+        session_parser._json_loads = json.loads
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "session.jsonl"
+        make_session(path, args.lines)
+        size_mb = path.stat().st_size / 1024 / 1024
+
+        prefiltered, found = bench(path, args.repeat)
+        original = session_parser._may_contain_memory
+        session_parser._may_contain_memory = lambda line: True
+        try:
+            decode_all, found_all = bench(path, args.repeat)
+        finally:
+            session_parser._may_contain_memory = original
+
+    decoder = getattr(session_parser._json_loads, "__module__", "json")
+    print(f"session: {args.lines} lines, {size_mb:.1f} MB, decoder: {decoder}, memories: {found}/{found_all}")
+    print(f"decode every line: {decode_all * 1000:8.1f} ms  ({size_mb / decode_all:6.1f} MB/s)")
+    print(f"prefiltered:       {prefiltered * 1000:8.1f} ms  ({size_mb / prefiltered:6.1f} MB/s)")
+    print(f"speedup:           {decode_all / prefiltered:.1f}x")
+    return 1 if found != found_all else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
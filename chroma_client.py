@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Claude Code RAG - Chroma Client
+ChromaDB client helpers shared by the MCP server and the web UI. Chroma keeps
+one System (sqlite pool, vector segments) per persist path and process, shared
+by every PersistentClient on that path. Its vector index is loaded once, so rows
+written by another process (claude-rag watch/capture/index, the MCP server for
+the web UI) never reach query() through it: reopen_client() replaces that System.
+"""
+import logging
+from typing import Optional
+
+import chromadb
+
+try:
+    from chromadb.api.client import SharedSystemClient
+except ImportError:  # chromadb < 0.4.15
+    SharedSystemClient = None
+
+_warned = False
+
+
+def _systems() -> Optional[dict]:
+    """Chroma's registry of shared Systems (persist path -> System), if this version has one"""
+    for name in ("_identifier_to_system", "_identifer_to_system"):  # Misspelled before chromadb 0.5.5
+        systems = getattr(SharedSystemClient, name, None)
+        if isinstance(systems, dict):
+            return systems
+    return None
+
+
+def reopen_client(path: str, **kwargs):
+    """
+    A PersistentClient on path that reads the database afresh (kwargs go to
+    PersistentClient). The System cached for path is dropped and stopped first;
+    collections opened through it must be replaced by ones from the new client.
+    """
+    global _warned
+    systems = _systems()
+    if systems is None:
+        if not _warned:
+            logging.warning(
+                f"chromadb {chromadb.__version__} has no shared system registry: "
+                "writes from other processes show up after a restart"
+            )
+            _warned = True
+    else:
+        system = systems.pop(path, None)
+        if system is not None:
+            try:
+                system.stop()
+            except Exception as e:
+                logging.warning(f"Stopping the Chroma system for {path} failed: {e}")
+    return chromadb.PersistentClient(path=path, **kwargs)
@@ -16,6 +16,9 @@ from pathlib import Path
 import chromadb
 import requests
 
+from embedding_backends import EMBED_BACKEND, get_backend
+from embedding_cache import cached_embed, get_disk_cache
+
 # Configuration
 OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
 EMBED_MODEL = os.environ.get("EMBED_MODEL", "nomic-embed-text")
@@ -25,13 +28,33 @@ VENV_PYTHON = Path(__file__).parent / ".venv" / "bin" / "python"
 
 
 def get_embedding(text: str) -> list:
-    """Get embedding from Ollama"""
-    resp = requests.post(
-        f"{OLLAMA_URL}/api/embeddings",
-        json={"model": EMBED_MODEL, "prompt": text},
-        timeout=30
-    )
-    return resp.json()["embedding"]
+    """Get embedding from the configured backend (through the persistent cache)"""
+    backend = get_backend()
+    return cached_embed([text], backend.cache_model, backend.embed)[0]
+
+
+def get_embeddings_batch(texts: list[str]) -> list[list]:
+    """Get embeddings for several texts in batched backend calls (through the persistent cache)"""
+    backend = get_backend()
+    return cached_embed(texts, backend.cache_model, backend.embed)
+
+
+def dimension_mismatches() -> list[str]:
+    """Scopes whose stored vectors were made by another embedding model (see mcp_server.check_embedding_dimension)"""
+    import mcp_server
+    mismatches = []
+    for scope in (mcp_server.SCOPE_PROJECT, mcp_server.SCOPE_GLOBAL):
+        db_path = mcp_server.get_db_path(scope)
+        if not os.path.isdir(db_path):
+            continue
+        try:
+            collection = chromadb.PersistentClient(path=db_path).get_collection("memories")
+        except Exception:
+            continue  # Nothing stored in this scope yet
+        mismatch = mcp_server.check_embedding_dimension(collection, scope)
+        if mismatch:
+            mismatches.append(mismatch)
+    return mismatches
 
 
 class SimpleRAG:
@@ -53,7 +76,7 @@ class SimpleRAG:
         chunks = [content[i:i+chunk_size] for i in range(0, len(content), chunk_size)]
 
         ids = [f"{doc_id}_{i}" for i in range(len(chunks))]
-        embeddings = [get_embedding(c) for c in chunks]
+        embeddings = get_embeddings_batch(chunks)
         metadatas = [{"source": filepath, "chunk": i} for i in range(len(chunks))]
 
         self.collection.upsert(
@@ -96,33 +119,42 @@ def cmd_init(args):
     """Initialize claude-rag: check deps, pull model, create DB"""
     print("🚀 Initializing claude-rag...\n")
 
-    # 1. Check Ollama
-    print("1. Checking Ollama...")
-    try:
-        resp = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
-        if resp.status_code == 200:
-            print(f"   ✅ Ollama running at {OLLAMA_URL}")
-        else:
-            print(f"   ❌ Ollama not responding")
+    if EMBED_BACKEND != "ollama":
+        # 1-2. Non-Ollama backends only need to load
+        print(f"1. Checking embedding backend ({EMBED_BACKEND})...")
+        health = get_backend().health()
+        if not health["ok"]:
+            print(f"   ❌ {health['error']}")
             return 1
-    except requests.exceptions.ConnectionError:
-        print(f"   ❌ Ollama not running. Start with: systemctl start ollama")
-        return 1
-
-    # 2. Check/pull embedding model
-    print(f"\n2. Checking embedding model ({EMBED_MODEL})...")
-    models = [m["name"] for m in resp.json().get("models", [])]
-    if any(EMBED_MODEL in m for m in models):
-        print(f"   ✅ Model {EMBED_MODEL} available")
+        print(f"   ✅ Backend {EMBED_BACKEND} ready ({health['model']})")
     else:
-        print(f"   ⏳ Pulling {EMBED_MODEL}...")
-        result = subprocess.run(["ollama", "pull", EMBED_MODEL], capture_output=True, text=True)
-        if result.returncode == 0:
-            print(f"   ✅ Model {EMBED_MODEL} pulled")
-        else:
-            print(f"   ❌ Failed to pull model: {result.stderr}")
+        # 1. Check Ollama
+        print("1. Checking Ollama...")
+        try:
+            resp = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
+            if resp.status_code == 200:
+                print(f"   ✅ Ollama running at {OLLAMA_URL}")
+            else:
+                print("   ❌ Ollama not responding")
+                return 1
+        except requests.exceptions.ConnectionError:
+            print("   ❌ Ollama not running. Start with: systemctl start ollama")
             return 1
 
+        # 2. Check/pull embedding model
+        print(f"\n2. Checking embedding model ({EMBED_MODEL})...")
+        models = [m["name"] for m in resp.json().get("models", [])]
+        if any(EMBED_MODEL in m for m in models):
+            print(f"   ✅ Model {EMBED_MODEL} available")
+        else:
+            print(f"   ⏳ Pulling {EMBED_MODEL}...")
+            result = subprocess.run(["ollama", "pull", EMBED_MODEL], capture_output=True, text=True)
+            if result.returncode == 0:
+                print(f"   ✅ Model {EMBED_MODEL} pulled")
+            else:
+                print(f"   ❌ Failed to pull model: {result.stderr}")
+                return 1
+
     # 3. Create DB directory
     print(f"\n3. Setting up database...")
     os.makedirs(CHROMA_PATH, exist_ok=True)
@@ -138,6 +170,11 @@ def cmd_init(args):
     except Exception as e:
         print(f"   ❌ Embedding failed: {e}")
         return 1
+    mismatches = dimension_mismatches()
+    for mismatch in mismatches:
+        print(f"   ❌ {mismatch}")
+    if mismatches:
+        return 1
 
     print("\n✅ claude-rag initialized successfully!")
     print("\nNext steps:")
@@ -151,26 +188,35 @@ def cmd_doctor(args):
     print("🩺 claude-rag doctor\n")
     issues = []
 
-    # 1. Ollama
-    print("Ollama:")
-    try:
-        resp = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
-        if resp.status_code == 200:
-            print(f"  ✅ Running at {OLLAMA_URL}")
-            models = [m["name"] for m in resp.json().get("models", [])]
-
-            # Check embedding model
-            if any(EMBED_MODEL in m for m in models):
-                print(f"  ✅ Model {EMBED_MODEL} available")
-            else:
-                print(f"  ❌ Model {EMBED_MODEL} not found")
-                issues.append(f"Run: ollama pull {EMBED_MODEL}")
+    # 1. Embedding backend
+    if EMBED_BACKEND != "ollama":
+        print(f"Embedding backend ({EMBED_BACKEND}):")
+        health = get_backend().health()
+        if health["ok"]:
+            print(f"  ✅ Ready ({health['model']})")
         else:
-            print(f"  ❌ Not responding (status {resp.status_code})")
-            issues.append("Check Ollama status")
-    except requests.exceptions.ConnectionError:
-        print(f"  ❌ Not running")
-        issues.append("Run: systemctl start ollama")
+            print(f"  ❌ {health['error']}")
+            issues.append(f"Fix the {EMBED_BACKEND} embedding backend")
+    else:
+        print("Ollama:")
+        try:
+            resp = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
+            if resp.status_code == 200:
+                print(f"  ✅ Running at {OLLAMA_URL}")
+                models = [m["name"] for m in resp.json().get("models", [])]
+
+                # Check embedding model
+                if any(EMBED_MODEL in m for m in models):
+                    print(f"  ✅ Model {EMBED_MODEL} available")
+                else:
+                    print(f"  ❌ Model {EMBED_MODEL} not found")
+                    issues.append(f"Run: ollama pull {EMBED_MODEL}")
+            else:
+                print(f"  ❌ Not responding (status {resp.status_code})")
+                issues.append("Check Ollama status")
+        except requests.exceptions.ConnectionError:
+            print("  ❌ Not running")
+            issues.append("Run: systemctl start ollama")
 
     # 2. Database
     print("\nDatabase:")
@@ -200,6 +246,10 @@ def cmd_doctor(args):
         print(f"  ⚠️  Path doesn't exist: {CHROMA_PATH}")
         issues.append("Run: claude-rag init")
 
+    for mismatch in dimension_mismatches():
+        print(f"  ❌ {mismatch}")
+        issues.append("Re-index with the current embedding model (or switch back to the previous one)")
+
     # 3. MCP Server
     print("\nMCP Server:")
     if MCP_SERVER.exists():
@@ -285,6 +335,100 @@ def cmd_index(args):
     return 0
 
 
+def cmd_watch(args):
+    """Watch files and reindex them as they change"""
+    import watcher
+
+    roots = args.paths or watcher.WATCH_PATHS
+    synced = watcher.get_synced_files()
+    if not roots and not synced:
+        print("❌ Nothing to watch: pass directories, set WATCH_PATHS, or run rag_sync first")
+        return 1
+
+    debounce = args.debounce if args.debounce is not None else watcher.WATCH_DEBOUNCE
+    w = watcher.Watcher(roots, synced, scope=args.scope, debounce=debounce,
+                        native=False if args.poll else None)
+    print(f"👀 Watching ({w.observer.mode})...")
+    for root in w.roots:
+        print(f"   📂 {root}")
+    for path in synced:
+        print(f"   📄 {path}")
+    print("   Press Ctrl+C to stop\n")
+
+    def report(result):
+        status = f"❌ {result['error']}" if "error" in result else "✅"
+        print(f"{status} {result['files']} changed → {result['updated']} updated, {result['removed']} removed "
+              f"in {result['elapsed']:.2f}s (queue: {len(w.queue)}, lag: {w.queue.lag():.1f}s)")
+
+    try:
+        w.run(on_batch=report)
+    except KeyboardInterrupt:
+        print("\n👋 Watcher stopped")
+    return 0
+
+
+def follow_capture(args):
+    """Capture new entries of active sessions as they are written"""
+    import threading
+
+    import mcp_server
+
+    follower = mcp_server.create_follower(scope=args.scope, all_projects=args.all_projects)
+    where = "all projects" if args.all_projects else mcp_server.PROJECT_PATH
+    print(f"👀 Following active sessions of {where} (every {follower.interval:.0f}s)...")
+    print("   Press Ctrl+C to stop\n")
+
+    def report(result):
+        print(f"✅ {time.strftime('%H:%M:%S')} captured {len(result['captured'])} memories "
+              f"({result['existing']} already stored, {result['duplicates']} near-duplicates)")
+
+    try:
+        follower.run(threading.Event(), on_capture=report)
+    except KeyboardInterrupt:
+        stats = follower.stats()
+        print(f"\n👋 Stopped: {stats['captured']} memories captured, {stats['errors']} errors")
+    return 0
+
+
+def cmd_capture(args):
+    """Capture memories from Claude Code sessions"""
+    import mcp_server
+
+    if args.follow:
+        return follow_capture(args)
+
+    checkpoints = mcp_server.load_checkpoints(args.scope, args.rescan)
+    sessions = mcp_server.find_capture_sessions(checkpoints, None if args.all else args.max_sessions, args.all_projects)
+    if sessions is None:
+        where = "any project" if args.all_projects else f"{mcp_server.PROJECT_PATH} (try --all-projects)"
+        print(f"❌ No Claude Code sessions found for {where}")
+        return 1
+    if not sessions:
+        print("✅ Nothing new to capture since the last run")
+        return 0
+
+    jobs = args.jobs or (mcp_server.CAPTURE_JOBS if args.all else 1)
+    start = time.time()
+    print(f"📥 Capturing from {len(sessions)} session(s) with {jobs} job(s)...")
+
+    def progress(done, total, captured):
+        print(f"\r   {done}/{total} sessions, {captured} memories ({time.time() - start:.1f}s)", end="", flush=True)
+
+    try:
+        result = mcp_server.capture_sessions(
+            sessions, scope=args.scope, min_confidence=args.min_confidence, dry_run=args.dry_run,
+            checkpoints=checkpoints, jobs=jobs, on_progress=progress
+        )
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrupted: run again to resume from the last stored batch")
+        return 130
+
+    verb = "Would capture" if args.dry_run else "Captured"
+    print(f"\n✅ {verb} {len(result['captured'])} memories (skipped {result['skipped']}, "
+          f"{result['existing']} already stored, {result['duplicates']} near-duplicates) in {time.time() - start:.1f}s")
+    return 0
+
+
 def cmd_search(args):
     """Search in RAG"""
     rag = SimpleRAG()
@@ -310,6 +454,9 @@ def cmd_stats(args):
     print(f"Total chunks: {stats['total_chunks']}")
     print(f"Database: {stats['path']}")
 
+    cache_stats = get_disk_cache().stats()
+    print(f"Embedding cache: {cache_stats['entries']} entries ({cache_stats['size_bytes'] / 1024 / 1024:.1f} MB)")
+
     # DB size
     if os.path.exists(CHROMA_PATH):
         total_size = sum(
@@ -362,6 +509,8 @@ Examples:
   claude-rag init                    # Setup claude-rag
   claude-rag doctor                  # Diagnose issues
   claude-rag index ~/CLAUDE.md       # Index a file
+  claude-rag watch ~/notes           # Reindex files as they change
+  claude-rag capture --all --jobs 4  # Backfill memories from all sessions
   claude-rag search "my query"       # Search memories
   claude-rag serve                   # Start MCP server
   claude-rag ui                      # Launch TUI
@@ -384,6 +533,25 @@ Examples:
     p_index = subparsers.add_parser("index", help="Index files")
     p_index.add_argument("path", help="File or directory to index")
 
+    # watch
+    p_watch = subparsers.add_parser("watch", help="Watch files and reindex on change")
+    p_watch.add_argument("paths", nargs="*", help="Directories to watch (default: WATCH_PATHS) besides synced files")
+    p_watch.add_argument("--scope", choices=["project", "global"], default="project", help="Scope for indexed directories")
+    p_watch.add_argument("--debounce", type=float, default=None, help="Seconds of quiet before reindexing (default: WATCH_DEBOUNCE or 1.0)")
+    p_watch.add_argument("--poll", action="store_true", help="Force stdlib polling instead of OS file events")
+
+    # capture
+    p_capture = subparsers.add_parser("capture", help="Capture memories from Claude Code sessions")
+    p_capture.add_argument("--all", action="store_true", help="Backfill every session (default: most recent only)")
+    p_capture.add_argument("--jobs", "-j", type=int, default=None, help="Parallel parser processes (default: RAG_CAPTURE_JOBS with --all, else 1)")
+    p_capture.add_argument("--all-projects", action="store_true", help="Include sessions of every project (default: current project)")
+    p_capture.add_argument("--max-sessions", type=int, default=3, help="Recent sessions to capture without --all (default: 3)")
+    p_capture.add_argument("--min-confidence", type=float, default=0.7, help="Minimum confidence (default: 0.7)")
+    p_capture.add_argument("--scope", choices=["project", "global"], default="project", help="Memory scope")
+    p_capture.add_argument("--dry-run", action="store_true", help="Show what would be captured without storing")
+    p_capture.add_argument("--rescan", action="store_true", help="Ignore checkpoints and re-read sessions from the start")
+    p_capture.add_argument("--follow", "-f", action="store_true", help="Keep running and capture active sessions as they are written")
+
     # search
     p_search = subparsers.add_parser("search", help="Search memories")
     p_search.add_argument("query", nargs="+", help="Search query")
@@ -410,6 +578,8 @@ Examples:
         "doctor": cmd_doctor,
         "serve": cmd_serve,
         "index": cmd_index,
+        "watch": cmd_watch,
+        "capture": cmd_capture,
         "search": cmd_search,
         "stats": cmd_stats,
         "ui": cmd_ui,
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Claude Code RAG - Embedding Backends
+Pluggable text -> vector providers, selected with EMBED_BACKEND:
+  ollama  Ollama HTTP API (default)
+  local   In-process CPU model via sentence-transformers (EMBED_MODEL_PATH)
+  hash    Deterministic feature-hashing fake, for tests and offline use
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Optional
+
+import requests
+
+# Configuration
+EMBED_BACKEND = os.environ.get("EMBED_BACKEND", "ollama")
+OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+EMBED_MODEL = os.environ.get("EMBED_MODEL", "nomic-embed-text")
+EMBED_MODEL_PATH = os.environ.get("EMBED_MODEL_PATH", "")
+EMBED_ONNX = os.environ.get("EMBED_ONNX", "").lower() in ("1", "true", "yes")
+EMBED_HASH_DIM = int(os.environ.get("EMBED_HASH_DIM", "256"))
+
+# Ollama batch dispatch (sub-batch size auto-tunes between the min and max)
+EMBED_BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "32"))
+EMBED_BATCH_MIN = 4
+EMBED_BATCH_MAX = 256
+EMBED_BATCH_MAX_CHARS = int(os.environ.get("EMBED_BATCH_MAX_CHARS", "48000"))
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "2"))
+EMBED_BATCH_TIMEOUT = 60
+EMBED_RETRIES = 2
+# Total time for one sub-batch, its timed-out halves and retries included
+EMBED_BATCH_BUDGET = 2 * EMBED_BATCH_TIMEOUT
+
+BatchCallback = Optional[Callable[[list[str], list[list]], None]]
+
+
+class EmbeddingBackend:
+    """Base class for embedding providers"""
+
+    name = "base"
+
+    def __init__(self, model: str):
+        self.model = model
+
+    @property
+    def cache_model(self) -> str:
+        """Namespace for cached vectors, so backends never share incompatible embeddings"""
+        return f"{self.name}:{self.model}"
+
+    def embed(self, texts: list[str], on_batch: BatchCallback = None) -> list[list]:
+        """Embed texts. on_batch(texts, embeddings) is called as batches complete"""
+        embeddings = self._embed(texts) if texts else []
+        if on_batch and texts:
+            on_batch(texts, embeddings)
+        return embeddings
+
+    def embed_one(self, text: str) -> list:
+        return self.embed([text])[0]
+
+    def _embed(self, texts: list[str]) -> list[list]:
+        raise NotImplementedError
+
+    def health(self) -> dict:
+        """Check the backend is usable: {"ok": bool, "error"?: str, ...}"""
+        return {"ok": True, "backend": self.name, "model": self.model}
+
+
+class BatchSizeTuner:
+    """Hill-climb the embedding sub-batch size on observed throughput (texts/s)"""
+
+    def __init__(self, size: int = EMBED_BATCH_SIZE, min_size: int = EMBED_BATCH_MIN, max_size: int = EMBED_BATCH_MAX):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.size = max(min_size, min(size, max_size))
+        self._direction = 1
+        self._last_throughput = None
+        self._lock = threading.Lock()
+
+    def record(self, count: int, elapsed: float):
+        """Record a successful request of `count` texts"""
+        with self._lock:
+            # Partial (tail) batches say nothing about the current size
+            if count < self.size:
+                return
+            throughput = count / max(elapsed, 1e-6)
+            if self._last_throughput is not None and throughput < self._last_throughput * 0.9:
+                self._direction = -self._direction
+            self._last_throughput = throughput
+            factor = 1.5 if self._direction > 0 else 1 / 1.5
+            self.size = max(self.min_size, min(self.max_size, round(self.size * factor)))
+
+    def failed(self):
+        """Record a timeout or server error: back off hard"""
+        with self._lock:
+            self.size = max(self.min_size, self.size // 2)
+            self._direction = -1
+            self._last_throughput = None
+
+
+def split_batches(texts: list[str], max_count: int, max_chars: int = EMBED_BATCH_MAX_CHARS) -> list[list[int]]:
+    """Split texts into sub-batches of indices, bounded by count and total characters"""
+    batches = []
+    current = []
+    current_chars = 0
+    for i, text in enumerate(texts):
+        if current and (len(current) >= max_count or current_chars + len(text) > max_chars):
+            batches.append(current)
+            current = []
+            current_chars = 0
+        current.append(i)
+        current_chars += len(text)
+    if current:
+        batches.append(current)
+    return batches
+
+
+class OllamaBackend(EmbeddingBackend):
+    """Ollama HTTP API with size-tuned sub-batches and bounded concurrency"""
+
+    name = "ollama"
+
+    def __init__(self, model: str = EMBED_MODEL, url: str = OLLAMA_URL, concurrency: int = EMBED_CONCURRENCY):
+        super().__init__(model)
+        self.url = url
+        self.tuner = BatchSizeTuner()
+        # Pooled keep-alive HTTP connections, shared by the embedding workers
+        self._http = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(concurrency, 4))
+        self._http.mount("http://", adapter)
+        self._http.mount("https://", adapter)
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed")
+
+    @property
+    def cache_model(self) -> str:
+        # Plain model name, so caches written before backends existed stay valid
+        return self.model
+
+    def embed_one(self, text: str) -> list:
+        resp = self._http.post(
+            f"{self.url}/api/embeddings",
+            json={"model": self.model, "prompt": text},
+            timeout=30
+        )
+        resp.raise_for_status()
+        data = resp.json()
+
+        if "embedding" not in data:
+            raise ValueError(f"Ollama response missing 'embedding' key. Got: {list(data.keys())}")
+
+        return data["embedding"]
+
+    def _post_batch(self, texts: list[str], deadline: Optional[float] = None) -> list[list]:
+        """
+        Embed one sub-batch with retries. Timed-out batches are retried in halves until
+        EMBED_BATCH_BUDGET runs out; a single text timing out means Ollama is hung, not
+        overloaded, and fails at once.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + EMBED_BATCH_BUDGET
+        for attempt in range(EMBED_RETRIES + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise requests.exceptions.Timeout(f"Embedding batch gave up after {EMBED_BATCH_BUDGET}s")
+            try:
+                start = time.time()
+                resp = self._http.post(
+                    f"{self.url}/api/embed",
+                    json={"model": self.model, "input": texts},
+                    timeout=min(EMBED_BATCH_TIMEOUT, remaining)
+                )
+                resp.raise_for_status()
+                data = resp.json()
+
+                if "embeddings" not in data:
+                    raise ValueError(f"Ollama response missing 'embeddings' key. Got: {list(data.keys())}")
+
+                self.tuner.record(len(texts), time.time() - start)
+                return data["embeddings"]
+
+            except requests.exceptions.Timeout:
+                self.tuner.failed()
+                if len(texts) == 1:
+                    raise
+                half = len(texts) // 2
+                return self._post_batch(texts[:half], deadline) + self._post_batch(texts[half:], deadline)
+            except requests.exceptions.HTTPError as e:
+                # Only server-side errors are worth retrying
+                if e.response is None or e.response.status_code < 500 or attempt == EMBED_RETRIES:
+                    raise
+                self.tuner.failed()
+            time.sleep(0.5 * 2 ** attempt)
+
+    def embed(self, texts: list[str], on_batch: BatchCallback = None) -> list[list]:
+        """
+        Embed texts in size-tuned sub-batches with bounded concurrency.
+        Finished sub-batches are reported through on_batch even if another
+        sub-batch ultimately fails.
+        """
+        results = [None] * len(texts)
+        if not texts:
+            return results
+        batches = split_batches(texts, self.tuner.size)
+
+        def handle(batch, embeddings):
+            for i, embedding in zip(batch, embeddings, strict=True):
+                results[i] = embedding
+            if on_batch:
+                on_batch([texts[i] for i in batch], embeddings)
+
+        if len(batches) == 1:
+            handle(batches[0], self._post_batch(texts))
+            return results
+
+        errors = []
+        futures = {self._pool.submit(self._post_batch, [texts[i] for i in batch]): batch for batch in batches}
+        for future in as_completed(futures):
+            try:
+                handle(futures[future], future.result())
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+        return results
+
+    def health(self) -> dict:
+        """Check if Ollama is running and model is available"""
+        try:
+            resp = self._http.get(f"{self.url}/api/tags", timeout=5)
+            if resp.status_code != 200:
+                return {"ok": False, "error": "Ollama not responding"}
+
+            models = [m["name"] for m in resp.json().get("models", [])]
+            if not any(self.model in m for m in models):
+                return {
+                    "ok": False,
+                    "error": f"Model '{self.model}' not found. Run: ollama pull {self.model}"
+                }
+
+            return {"ok": True, "backend": self.name, "ollama": "running", "model": self.model}
+
+        except requests.exceptions.ConnectionError:
+            return {"ok": False, "error": "Ollama not running. Start with: systemctl start ollama"}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+
+class LocalBackend(EmbeddingBackend):
+    """In-process CPU model loaded from a local path (sentence-transformers, optionally ONNX)"""
+
+    name = "local"
+
+    def __init__(self, model_path: str = EMBED_MODEL_PATH, onnx: bool = EMBED_ONNX):
+        super().__init__(model_path)
+        self.onnx = onnx
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._model is None:
+            if not self.model:
+                raise ValueError("EMBED_MODEL_PATH must point to a local model directory for EMBED_BACKEND=local")
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise ImportError(
+                    "EMBED_BACKEND=local requires sentence-transformers. "
+                    "Install with: pip install 'claude-code-rag[local]'"
+                ) from e
+            kwargs = {"backend": "onnx"} if self.onnx else {}
+            self._model = SentenceTransformer(self.model, device="cpu", local_files_only=True, **kwargs)
+        return self._model
+
+    def _embed(self, texts: list[str]) -> list[list]:
+        with self._lock:
+            model = self._load()
+            return model.encode(texts, convert_to_numpy=True, normalize_embeddings=True).tolist()
+
+    def health(self) -> dict:
+        try:
+            with self._lock:
+                self._load()
+            return {"ok": True, "backend": self.name, "model": self.model}
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+
+
+class HashBackend(EmbeddingBackend):
+    """Deterministic bag-of-words feature hashing. No model, no network: for tests"""
+
+    name = "hash"
+    _token_re = re.compile(r"\w+")
+
+    def __init__(self, dim: int = EMBED_HASH_DIM):
+        super().__init__(f"dim{dim}")
+        self.dim = dim
+
+    def _vector(self, text: str) -> list:
+        vector = [0.0] * self.dim
+        for token in self._token_re.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector))
+        if norm == 0:
+            vector[0] = 1.0
+            return vector
+        return [v / norm for v in vector]
+
+    def _embed(self, texts: list[str]) -> list[list]:
+        return [self._vector(t) for t in texts]
+
+
+BACKENDS = {
+    OllamaBackend.name: OllamaBackend,
+    LocalBackend.name: LocalBackend,
+    HashBackend.name: HashBackend,
+}
+
+_backend: Optional[EmbeddingBackend] = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(name: str = EMBED_BACKEND) -> EmbeddingBackend:
+    """Instantiate a backend by name"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EMBED_BACKEND '{name}' (must be one of: {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
+
+
+def get_backend() -> EmbeddingBackend:
+    """Get the process-wide backend selected by EMBED_BACKEND"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_backend()
+        return _backend
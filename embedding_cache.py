@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Claude Code RAG - Embedding Cache
+Persistent on-disk embedding store shared by the MCP server, CLI and web UI,
+plus the in-process search result cache.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Callable, Optional
+
+# Configuration
+CHROMA_PATH = os.path.expanduser(os.environ.get("CHROMA_PATH", "~/.local/share/claude-memory"))
+EMBED_CACHE_PATH = os.path.expanduser(
+    os.environ.get("EMBED_CACHE_PATH", os.path.join(CHROMA_PATH, "embedding_cache.db"))
+)
+EMBED_CACHE_MAX_ENTRIES = int(os.environ.get("EMBED_CACHE_MAX_ENTRIES", "200000"))
+EMBED_MEMORY_CACHE_MB = float(os.environ.get("EMBED_MEMORY_CACHE_MB", "64"))
+SEARCH_CACHE_ENTRIES = int(os.environ.get("SEARCH_CACHE_ENTRIES", "256"))
+
+# Approximate per-entry bookkeeping cost of an OrderedDict slot + linked list node
+LRU_ENTRY_OVERHEAD = 100
+
+# Evict down to this fraction of max_entries so we don't evict on every insert
+EVICTION_TARGET = 0.9
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text before hashing (unicode form + surrounding whitespace)"""
+    return unicodedata.normalize("NFC", text).strip()
+
+
+def text_hash(text: str) -> str:
+    """Hash of the normalized text, used as cache key together with the model"""
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+def pack_vector(vector) -> bytes:
+    """Encode an embedding as a compact float32 blob"""
+    return array("f", vector).tobytes()
+
+
+def unpack_vector(blob: bytes) -> list:
+    """Decode a float32 blob back to a list of floats"""
+    vector = array("f")
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class LRUVectorCache:
+    """In-process LRU cache of float32 vectors bounded by a memory budget"""
+
+    def __init__(self, max_bytes: int = int(EMBED_MEMORY_CACHE_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self.resident_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (array('f'), size)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
+
+    def get(self, key) -> Optional[list]:
+        """Get a vector and mark it most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0].tolist()
+
+    def put(self, key, vector):
+        """Store a vector, evicting least recently used entries over the budget"""
+        packed = array("f", vector)
+        size = sys.getsizeof(packed) + sys.getsizeof(key) + LRU_ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.resident_bytes -= old[1]
+            self._entries[key] = (packed, size)
+            self.resident_bytes += size
+            while self.resident_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.resident_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.resident_bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "resident_bytes": self.resident_bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query for cache keys (unicode form, case, runs of whitespace)"""
+    return " ".join(normalize_text(query).casefold().split())
+
+
+class SearchResultCache:
+    """
+    In-process LRU of search results. Keys must include the generation of every
+    collection searched: a write bumps it, so a stale result can never be served.
+    """
+
+    def __init__(self, max_entries: int = SEARCH_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> results
+        self._lock = threading.Lock()
+
+    def key(self, query: str, *parts) -> tuple:
+        return (normalize_query(query), *parts)
+
+    def get(self, key) -> Optional[list]:
+        """Cached results (copies of the hit dicts), or None"""
+        with self._lock:
+            results = self._entries.get(key)
+            if results is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return [dict(r) for r in results]
+
+    def put(self, key, results: list):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = [dict(r) for r in results]
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{(self.hits / total * 100) if total else 0:.1f}%",
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+
+class EmbeddingCache:
+    """SQLite-backed embedding store keyed by (model, text hash), with LRU eviction"""
+
+    def __init__(self, path: str = EMBED_CACHE_PATH, max_entries: int = EMBED_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._count = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database lazily (first lookup or insert)"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " text_hash TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " PRIMARY KEY (model, text_hash))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, texts: list[str]) -> dict[int, list]:
+        """Look up embeddings for texts. Returns {index: embedding} for cache hits only"""
+        if not self.enabled or not texts:
+            return {}
+
+        hashes = [text_hash(t) for t in texts]
+        found = {}
+        try:
+            with self._lock:
+                conn = self._connect()
+                unique = list(dict.fromkeys(hashes))
+                # SQLite limits bound parameters, so look up in slices
+                for start in range(0, len(unique), 500):
+                    batch = unique[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = conn.execute(
+                        f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                        [model, *batch]
+                    ).fetchall()
+                    found.update(rows)
+                if found:
+                    now = time.time()
+                    conn.executemany(
+                        "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                        [(now, model, h) for h in found]
+                    )
+                    conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Embedding cache lookup failed ({self.path}): {e}")
+            found = {}
+
+        results = {i: unpack_vector(found[h]) for i, h in enumerate(hashes) if h in found}
+        self.hits += len(results)
+        self.misses += len(texts) - len(results)
+        return results
+
+    def put_many(self, model: str, texts: list[str], embeddings: list[list]):
+        """Store embeddings for texts, evicting least recently used entries over the cap"""
+        if not self.enabled or not texts:
+            return
+
+        now = time.time()
+        rows = [(model, text_hash(t), pack_vector(e), now) for t, e in zip(texts, embeddings, strict=True)]
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                    rows
+                )
+                if self._count is None:
+                    self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                else:
+                    self._count += len(rows)
+                if self._count > self.max_entries:
+                    # Other processes share the file, so recount before evicting
+                    self._count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                    excess = self._count - int(self.max_entries * EVICTION_TARGET)
+                    if excess > 0:
+                        conn.execute(
+                            "DELETE FROM embeddings WHERE rowid IN "
+                            "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                            (excess,)
+                        )
+                        self.evictions += excess
+                        self._count -= excess
+                conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Embedding cache write failed ({self.path}): {e}")
+
+    def stats(self) -> dict:
+        """Get persistent cache statistics"""
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total > 0 else 0
+        entries = 0
+        if self.enabled and os.path.exists(self.path):
+            try:
+                with self._lock:
+                    entries = self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                    self._count = entries
+            except sqlite3.Error:
+                pass
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "total": total,
+            "hit_rate": f"{hit_rate:.1f}%",
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "size_bytes": size,
+            "path": self.path,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_lock = threading.Lock()
+
+
+def get_disk_cache() -> EmbeddingCache:
+    """Get the process-wide persistent embedding cache"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
+
+
+def cached_embed(texts: list[str], model: str, embed_fn: Callable[[list[str]], list[list]],
+                 cache: Optional[EmbeddingCache] = None) -> list[list]:
+    """Read embeddings through the persistent cache, calling embed_fn only for misses"""
+    if not texts:
+        return []
+    cache = cache or get_disk_cache()
+
+    results = [None] * len(texts)
+    for i, embedding in cache.get_many(model, texts).items():
+        results[i] = embedding
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if missing:
+        embeddings = embed_fn([texts[i] for i in missing])
+        for i, embedding in zip(missing, embeddings, strict=True):
+            results[i] = embedding
+        cache.put_many(model, [texts[i] for i in missing], embeddings)
+
+    return results
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Claude Code RAG - Indexing Pipeline
+Streams files through read/chunk -> embed -> write stages connected by
+bounded queues, so disk I/O, chunking, embedding and ChromaDB writes overlap.
+"""
+import os
+import queue
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+# Configuration
+INDEX_READERS = int(os.environ.get("INDEX_READERS", str(min(4, os.cpu_count() or 1))))
+INDEX_EMBED_BATCH = int(os.environ.get("INDEX_EMBED_BATCH", "128"))
+
+# Directory walking: files over this size are skipped, these directories are never entered
+INDEX_MAX_FILE_SIZE = int(os.environ.get("INDEX_MAX_FILE_SIZE", str(2 * 1024 * 1024)))
+DEFAULT_IGNORED_DIRS = {
+    ".git", ".hg", ".svn", "node_modules", ".venv", "venv", "__pycache__",
+    ".mypy_cache", ".pytest_cache", ".ruff_cache", ".tox", ".nox", ".cache",
+    "build", "dist", ".eggs", "site-packages",
+}
+IGNORE_FILES = (".gitignore", ".ragignore")
+
+# Queue bounds (backpressure): files waiting to be embedded, batches waiting to be written
+CHUNK_QUEUE_SIZE = 32
+WRITE_QUEUE_SIZE = 2
+
+# How long the batcher waits for more chunks before embedding a partial batch
+FLUSH_INTERVAL = 0.2
+
+_DONE = object()
+
+
+def _translate_pattern(pattern: str) -> str:
+    """Translate a gitignore glob (no leading '!' or trailing '/') into a regex"""
+    anchored = "/" in pattern
+    pattern = pattern.lstrip("/")
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                body = pattern[i + 1:end].replace("\\", "\\\\")
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    # Patterns without a slash match at any depth below the ignore file
+    prefix = "" if anchored else "(?:.*/)?"
+    return f"^{prefix}{''.join(out)}$"
+
+
+class IgnoreRules:
+    """Patterns from one .gitignore/.ragignore file, matched relative to its directory"""
+
+    def __init__(self, base: str, lines: Iterable[str]):
+        self.base = base
+        self.rules = []  # (regex, negate, dir_only)
+        for line in lines:
+            line = line.rstrip("\n").rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            if negate:
+                line = line[1:]
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if not line:
+                continue
+            self.rules.append((re.compile(_translate_pattern(line)), negate, dir_only))
+
+    @classmethod
+    def load(cls, directory: str) -> Optional["IgnoreRules"]:
+        """Read the ignore files of a directory, if any"""
+        lines = []
+        for name in IGNORE_FILES:
+            try:
+                with open(os.path.join(directory, name), encoding="utf-8", errors="replace") as f:
+                    lines.extend(f)
+            except OSError:
+                continue
+        rules = cls(directory, lines)
+        return rules if rules.rules else None
+
+    def match(self, path: str, is_dir: bool) -> Optional[bool]:
+        """True if ignored, False if re-included, None if no pattern applies (last match wins)"""
+        rel = os.path.relpath(path, self.base).replace(os.sep, "/")
+        result = None
+        for regex, negate, dir_only in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel):
+                result = not negate
+        return result
+
+
+def _is_ignored(path: str, is_dir: bool, rules: list[IgnoreRules]) -> bool:
+    ignored = False
+    for rule in rules:
+        verdict = rule.match(path, is_dir)
+        if verdict is not None:
+            ignored = verdict
+    return ignored
+
+
+def is_ignored_path(root, path) -> bool:
+    """Check one path under root against DEFAULT_IGNORED_DIRS and the ignore files along the way"""
+    root = os.path.abspath(root)
+    rel = os.path.relpath(os.path.abspath(path), root)
+    if rel.startswith(os.pardir):
+        return False
+    parts = rel.split(os.sep)
+    rules = []
+    directory = root
+    for i, part in enumerate(parts):
+        loaded = IgnoreRules.load(directory)
+        if loaded:
+            rules.append(loaded)
+        directory = os.path.join(directory, part)
+        is_dir = i < len(parts) - 1
+        if (is_dir and part in DEFAULT_IGNORED_DIRS) or _is_ignored(directory, is_dir, rules):
+            return True
+    return False
+
+
+def walk_files(root, extensions: dict, max_size: int = INDEX_MAX_FILE_SIZE):
+    """
+    Single-pass directory walk for indexing.
+    Yields (path, file_type, stat) for every supported file under root, honoring
+    .gitignore/.ragignore files and DEFAULT_IGNORED_DIRS. Ignored directories are
+    pruned before descending; symlinked directories are not followed.
+    """
+    root = os.path.abspath(root)
+    stack = [(root, [r for r in [IgnoreRules.load(root)] if r])]
+    while stack:
+        directory, rules = stack.pop()
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in DEFAULT_IGNORED_DIRS or _is_ignored(entry.path, True, rules):
+                        continue
+                    subdirs.append(entry.path)
+                    continue
+                if not entry.is_file():
+                    continue
+                file_type = extensions.get(os.path.splitext(entry.name)[1].lower())
+                if file_type is None or _is_ignored(entry.path, False, rules):
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue
+            if max_size and stat.st_size > max_size:
+                continue
+            yield entry.path, file_type, stat
+
+        # Reverse so the stack pops subdirectories in name order
+        for subdir in reversed(subdirs):
+            child = IgnoreRules.load(subdir)
+            stack.append((subdir, rules + [child] if child else rules))
+
+
+@dataclass
+class FileWork:
+    """Chunks of one file on their way to the collection"""
+    source: str
+    ids: list[str] = field(default_factory=list)
+    documents: list[str] = field(default_factory=list)
+    metadatas: list[dict] = field(default_factory=list)
+    # Runs in the writer thread once every chunk of the file has been written
+    finalize: Optional[Callable[[], None]] = None
+    info: dict = field(default_factory=dict)
+
+
+@dataclass
+class WriteBatch:
+    """Embedded chunks (possibly from several files) written with one upsert"""
+    ids: list[str] = field(default_factory=list)
+    embeddings: list[list] = field(default_factory=list)
+    documents: list[str] = field(default_factory=list)
+    metadatas: list[dict] = field(default_factory=list)
+    completes: list[FileWork] = field(default_factory=list)
+
+
+class IndexPipeline:
+    """
+    Bounded-queue indexing pipeline:
+      reader threads: prepare(item) -> FileWork (read, diff, chunk) or None to skip
+      batcher:        packs chunks across files into full batches -> embed(texts)
+      writer:         one upsert(WriteBatch) per batch, then finalizes finished files
+    """
+
+    def __init__(self, prepare: Callable[[object], Optional[FileWork]],
+                 embed: Callable[[list[str]], list[list]],
+                 upsert: Callable[[WriteBatch], None],
+                 readers: int = INDEX_READERS, batch_size: int = INDEX_EMBED_BATCH):
+        self.prepare = prepare
+        self.embed = embed
+        self.upsert = upsert
+        self.readers = max(1, readers)
+        self.batch_size = max(1, batch_size)
+        self._chunk_queue = queue.Queue(maxsize=CHUNK_QUEUE_SIZE)
+        self._write_queue = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._stop = threading.Event()
+        self._errors = []
+        self._completed = []
+
+    def _fail(self, error: Exception):
+        self._errors.append(error)
+        self._stop.set()
+
+    def _put(self, q: queue.Queue, item) -> bool:
+        """Blocking put that gives up once the pipeline is stopping"""
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _reader(self, items, lock: threading.Lock, remaining: list):
+        try:
+            while not self._stop.is_set():
+                with lock:
+                    item = next(items, _DONE)
+                if item is _DONE:
+                    break
+                work = self.prepare(item)
+                if work is not None and not self._put(self._chunk_queue, work):
+                    break
+        except Exception as e:
+            self._fail(e)
+        finally:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                self._put(self._chunk_queue, _DONE)
+
+    def _batcher(self):
+        batch = WriteBatch()
+        texts = []
+        left = {}  # id(work) -> chunks of that work not yet batched
+
+        def flush() -> bool:
+            nonlocal batch, texts
+            if not batch.ids and not batch.completes:
+                return True
+            if texts:
+                batch.embeddings = self.embed(texts)
+            ok = self._put(self._write_queue, batch)
+            batch = WriteBatch()
+            texts = []
+            return ok
+
+        try:
+            while not self._stop.is_set():
+                try:
+                    work = self._chunk_queue.get(timeout=FLUSH_INTERVAL)
+                except queue.Empty:
+                    # Input is slow: don't sit on a partial batch
+                    if not flush():
+                        return
+                    continue
+
+                if work is _DONE:
+                    if flush():
+                        self._put(self._write_queue, _DONE)
+                    return
+
+                if not work.ids:
+                    batch.completes.append(work)
+                    continue
+
+                left[id(work)] = len(work.ids)
+                for chunk in zip(work.ids, work.documents, work.metadatas, strict=True):
+                    batch.ids.append(chunk[0])
+                    batch.documents.append(chunk[1])
+                    batch.metadatas.append(chunk[2])
+                    texts.append(chunk[1])
+                    left[id(work)] -= 1
+                    if left[id(work)] == 0:
+                        del left[id(work)]
+                        batch.completes.append(work)
+                    if len(batch.ids) >= self.batch_size and not flush():
+                        return
+        except Exception as e:
+            self._fail(e)
+
+    def _writer(self):
+        try:
+            while True:
+                try:
+                    batch = self._write_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        return
+                    continue
+                if batch is _DONE:
+                    return
+                if batch.ids:
+                    self.upsert(batch)
+                for work in batch.completes:
+                    if work.finalize:
+                        work.finalize()
+                    self._completed.append(work)
+        except Exception as e:
+            self._fail(e)
+
+    def run(self, items: Iterable) -> list[FileWork]:
+        """Run the pipeline to completion. Returns the fully written FileWork items"""
+        items = iter(items)
+        lock = threading.Lock()
+        remaining = [self.readers]
+        threads = [
+            threading.Thread(target=self._reader, args=(items, lock, remaining), name=f"index-reader-{i}", daemon=True)
+            for i in range(self.readers)
+        ]
+        threads.append(threading.Thread(target=self._batcher, name="index-batcher", daemon=True))
+        threads.append(threading.Thread(target=self._writer, name="index-writer", daemon=True))
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if self._errors:
+            raise self._errors[0]
+        return self._completed
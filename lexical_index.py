@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Claude Code RAG - Lexical Index
+Persistent BM25 index (SQLite FTS5) kept next to each scope's ChromaDB, so
+identifiers, file paths and error strings match exactly. Every collection
+write is mirrored into it; search fuses it with vector results (RRF).
+A trigram index over the same documents answers exact substring lookups
+(identifiers, paths) without embeddings. It also holds the collection's
+generation, bumped on every write (from any process), which keys search
+result caches and tells the server another process wrote (reopen needed).
+"""
+import itertools
+import logging
+import os
+import re
+import sqlite3
+import threading
+from typing import Callable, Iterable, Optional
+
+# Stored in the scope's ChromaDB directory (removed together with it)
+LEXICAL_INDEX_FILE = "lexical_index.db"
+
+# Documents read per page when building the index from an existing collection
+BUILD_PAGE_SIZE = 1000
+
+# Reciprocal rank fusion constant: damps the advantage of the very first ranks
+RRF_K = 60
+
+# Query terms beyond this are ignored (bounds the cost of very long queries)
+MAX_QUERY_TERMS = 32
+
+# BM25 column weights: document text, source path
+BM25_WEIGHTS = (1.0, 0.5)
+
+# Exact lookups: substrings the trigram index can match, longest accepted
+MIN_EXACT_LENGTH = 3
+MAX_EXACT_LENGTH = 200
+
+_TERM_RE = re.compile(r"\w+")
+# Identifier or path markers: snake_case, dotted names, paths, camelCase humps
+# (not acronym suffixes like PostgreSQL), calls, scopes
+_IDENTIFIER_RE = re.compile(r"[_./\\~:]|[a-z][A-Z][a-z]|\(\)$")
+
+
+def match_expression(query: str) -> Optional[str]:
+    """
+    FTS5 MATCH expression for a free-text query: any term may match (BM25 ranks
+    documents with more and rarer terms first). Terms are quoted, so identifiers
+    like get_collection become the phrase "get collection" after tokenization.
+    """
+    terms = list(dict.fromkeys(_TERM_RE.findall(query.lower())))[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return " OR ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def looks_like_identifier(query: str) -> Optional[str]:
+    """
+    The identifier or path a query is made of (get_collection, SYNC_STATE_FILE,
+    ~/.config/fish/config.fish, `SessionCatalog`), or None for free text
+    """
+    needle = query.strip().strip("`'\"")
+    if not MIN_EXACT_LENGTH <= len(needle) <= MAX_EXACT_LENGTH or any(c.isspace() for c in needle):
+        return None
+    return needle if _IDENTIFIER_RE.search(needle) else None
+
+
+def reciprocal_rank_fusion(rankings: Iterable[list], k: int = RRF_K) -> dict:
+    """Fuse ranked ID lists: {id: sum of 1 / (k + rank)} over the lists containing it"""
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return scores
+
+
+class LexicalIndex:
+    """BM25 full-text index of one collection's documents and sources"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.trigrams = False
+        self._lock = threading.Lock()
+        self._conn = None
+        # Meta reads (generation, built) on their own connection: WAL readers are not
+        # blocked by a write or rebuild holding the main one
+        self._read_lock = threading.Lock()
+        self._reader = None
+        self._build_lock = threading.Lock()
+        self._seen = None  # (epoch, counter) after this process's last write or acknowledge()
+        self._previous = None  # Counter before our last write: committed yet or not, it is ours
+        self._missed = False  # Another process wrote before one of ours
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database lazily (first write or search), so startup stays fast"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            # A recreated index restarts its write counter: the epoch tells the two apart
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('epoch', lower(hex(randomblob(8))))")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS docs ("
+                " rowid INTEGER PRIMARY KEY,"
+                " id TEXT NOT NULL UNIQUE,"
+                " memory_type TEXT)"
+            )
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS terms USING fts5("
+                " document, source, tokenize='unicode61 remove_diacritics 2')"
+            )
+            self.trigrams = self._create_trigrams(conn)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _read(self, sql: str, params: tuple = ()) -> list:
+        with self._read_lock:
+            if self._reader is None:
+                if self._conn is None:
+                    with self._lock:
+                        self._connect()  # Creates the schema
+                self._reader = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            return self._reader.execute(sql, params).fetchall()
+
+    def _create_trigrams(self, conn: sqlite3.Connection) -> bool:
+        """Substring index (trigram tokenizer: SQLite 3.34+). Returns False if unsupported"""
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'grams'").fetchone()
+        if exists:
+            return True
+        try:
+            conn.execute("CREATE VIRTUAL TABLE grams USING fts5(document, source, tokenize='trigram')")
+        except sqlite3.OperationalError as e:
+            logging.warning(f"Exact match index unavailable ({e}): identifier lookups use embeddings")
+            return False
+        # Added to an index built without it: fill it on the next search
+        if conn.execute("SELECT 1 FROM docs LIMIT 1").fetchone():
+            self._set_built(conn, False)
+        return True
+
+    def _read_generation(self, conn: Optional[sqlite3.Connection] = None) -> tuple:
+        sql = "SELECT key, value FROM meta WHERE key IN ('epoch', 'generation')"
+        rows = dict(conn.execute(sql).fetchall() if conn else self._read(sql))
+        return rows.get("epoch"), int(rows.get("generation", 0))
+
+    def _bump(self, conn: sqlite3.Connection):
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', '1')"
+            " ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+        # Read back inside the write transaction: anything but our last count + 1 means another process wrote
+        epoch, counter = self._read_generation(conn)
+        if self._seen != (epoch, counter - 1):
+            self._missed = True
+        self._previous = (epoch, counter - 1)
+        self._seen = (epoch, counter)
+
+    def generation(self) -> Optional[str]:
+        """Write version of the collection ("epoch:counter"), or None if it cannot be read (don't cache then)"""
+        try:
+            epoch, counter = self._read_generation()
+            return f"{epoch}:{counter}"
+        except sqlite3.Error:
+            return None
+
+    def acknowledge(self):
+        """Mark every write so far as seen (the collection was just (re)opened)"""
+        try:
+            self._seen = self._read_generation()
+            self._missed = False
+        except sqlite3.Error as e:
+            logging.warning(f"Lexical index unreadable ({self.path}): {e}")
+
+    def changed_elsewhere(self) -> bool:
+        """True if another process wrote to the collection since acknowledge()"""
+        try:
+            # Our own write may be bumped but not committed yet: either count is ours
+            return self._missed or self._read_generation() not in (self._seen, self._previous)
+        except sqlite3.Error:
+            return False
+
+    def bump_generation(self):
+        """Record a collection write that changed nothing indexed"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                self._bump(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Lexical index write failed ({self.path}): {e}")
+
+    def _set_built(self, conn: sqlite3.Connection, built: bool):
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', ?)", ("1" if built else "0",))
+
+    def is_built(self) -> bool:
+        """True once the index holds every document of the collection"""
+        try:
+            rows = self._read("SELECT value FROM meta WHERE key = 'built'")
+            return bool(rows and rows[0][0] == "1")
+        except sqlite3.Error:
+            return False
+
+    def ensure_built(self, pages: Callable[[], Iterable[tuple[list, list, list]]]):
+        """Build from pages() unless built: one build at a time, callers meanwhile wait for it"""
+        if self.is_built():
+            return
+        with self._build_lock:
+            if not self.is_built():
+                self.rebuild(pages())
+
+    def _write(self, conn: sqlite3.Connection, doc_id: str, document: str, source: str, memory_type: Optional[str]):
+        row = conn.execute("SELECT rowid FROM docs WHERE id = ?", (doc_id,)).fetchone()
+        if row:
+            rowid = row[0]
+            self._unindex(conn, rowid)
+            conn.execute("UPDATE docs SET memory_type = ? WHERE rowid = ?", (memory_type, rowid))
+        else:
+            rowid = conn.execute("INSERT INTO docs (id, memory_type) VALUES (?, ?)", (doc_id, memory_type)).lastrowid
+        conn.execute("INSERT INTO terms (rowid, document, source) VALUES (?, ?, ?)", (rowid, document, source))
+        if self.trigrams:
+            conn.execute("INSERT INTO grams (rowid, document, source) VALUES (?, ?, ?)", (rowid, document, source))
+
+    def _unindex(self, conn: sqlite3.Connection, rowid: int):
+        conn.execute("DELETE FROM terms WHERE rowid = ?", (rowid,))
+        if self.trigrams:
+            conn.execute("DELETE FROM grams WHERE rowid = ?", (rowid,))
+
+    def _mark_stale(self, error: Exception):
+        """A failed mirror write leaves the index incomplete: rebuild it on the next search"""
+        logging.warning(f"Lexical index write failed ({self.path}): {error}")
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.rollback()
+                self._set_built(conn, False)
+                self._bump(conn)
+                conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def upsert(self, ids: list[str], documents: list[str], metadatas: Optional[list[dict]] = None):
+        """Add or replace documents"""
+        metadatas = metadatas or [{}] * len(ids)
+        try:
+            with self._lock:
+                conn = self._connect()
+                for doc_id, document, meta in zip(ids, documents, metadatas, strict=True):
+                    meta = meta or {}
+                    self._write(conn, doc_id, document or "", meta.get("source", ""), meta.get("memory_type"))
+                self._bump(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            self._mark_stale(e)
+
+    def update(self, ids: list[str], documents: Optional[list] = None, metadatas: Optional[list] = None):
+        """Partial update: missing documents or metadata keep their indexed values"""
+        try:
+            with self._lock:
+                conn = self._connect()
+                for i, doc_id in enumerate(ids):
+                    row = conn.execute(
+                        "SELECT terms.document, terms.source, docs.memory_type FROM docs"
+                        " JOIN terms ON terms.rowid = docs.rowid WHERE docs.id = ?", (doc_id,)
+                    ).fetchone()
+                    document, source, memory_type = row or ("", "", None)
+                    if documents is not None:
+                        document = documents[i] or ""
+                    if metadatas is not None and metadatas[i]:
+                        source = metadatas[i].get("source", source)
+                        memory_type = metadatas[i].get("memory_type", memory_type)
+                    self._write(conn, doc_id, document, source, memory_type)
+                self._bump(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            self._mark_stale(e)
+
+    def delete(self, ids: list[str]):
+        try:
+            with self._lock:
+                conn = self._connect()
+                for doc_id in ids:
+                    row = conn.execute("SELECT rowid FROM docs WHERE id = ?", (doc_id,)).fetchone()
+                    if row:
+                        self._unindex(conn, row[0])
+                        conn.execute("DELETE FROM docs WHERE rowid = ?", (row[0],))
+                self._bump(conn)
+                conn.commit()
+        except sqlite3.Error as e:
+            self._mark_stale(e)
+
+    def rebuild(self, pages: Iterable[tuple[list, list, list]]):
+        """Replace the whole index with (ids, documents, metadatas) pages"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM terms")
+                if self.trigrams:
+                    conn.execute("DELETE FROM grams")
+                conn.execute("DELETE FROM docs")
+                for ids, documents, metadatas in pages:
+                    for doc_id, document, meta in zip(ids, documents, metadatas, strict=True):
+                        meta = meta or {}
+                        self._write(conn, doc_id, document or "", meta.get("source", ""), meta.get("memory_type"))
+                self._set_built(conn, True)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def search(self, query: str, n_results: int, memory_type: Optional[str] = None) -> list[str]:
+        """IDs of the best BM25 matches, best first"""
+        expression = match_expression(query)
+        if not expression:
+            return []
+        sql = (
+            f"SELECT docs.id FROM terms JOIN docs ON docs.rowid = terms.rowid"
+            f" WHERE terms MATCH ?{' AND docs.memory_type = ?' if memory_type else ''}"
+            f" ORDER BY bm25(terms, {BM25_WEIGHTS[0]}, {BM25_WEIGHTS[1]}) LIMIT ?"
+        )
+        params = [expression, memory_type, n_results] if memory_type else [expression, n_results]
+        with self._lock:
+            return [row[0] for row in self._connect().execute(sql, params)]
+
+    def exact(self, needle: str, n_results: int, memory_type: Optional[str] = None) -> list[str]:
+        """IDs of documents or sources containing needle (case-insensitive), best BM25 first"""
+        if len(needle) < MIN_EXACT_LENGTH:
+            return []
+        with self._lock:
+            conn = self._connect()
+            if not self.trigrams:
+                return []
+            sql = (
+                f"SELECT docs.id FROM grams JOIN docs ON docs.rowid = grams.rowid"
+                f" WHERE grams MATCH ?{' AND docs.memory_type = ?' if memory_type else ''}"
+                f" ORDER BY rank LIMIT ?"
+            )
+            # One quoted string: the trigram tokenizer matches it as a substring
+            expression = '"' + needle.replace('"', '""') + '"'
+            params = [expression, memory_type, n_results] if memory_type else [expression, n_results]
+            return [row[0] for row in conn.execute(sql, params)]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connect().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        with self._read_lock:
+            if self._reader is not None:
+                self._reader.close()
+                self._reader = None
+
+
+_serials = itertools.count(1)
+
+
+def _as_list(value) -> Optional[list]:
+    if value is None:
+        return None
+    return [value] if isinstance(value, (str, dict)) else list(value)
+
+
+class IndexedCollection:
+    """ChromaDB collection proxy that mirrors every write into a LexicalIndex (and bumps the generation)"""
+
+    def __init__(self, collection, index: LexicalIndex):
+        self._collection = collection
+        self.lexical = index
+        self._serial = next(_serials)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    def generation(self) -> Optional[str]:
+        """
+        Version for search result caches: the write count, and which proxy (client) answered.
+        A collection reopened after another process wrote gets new keys even if the count was
+        read between that write and the reopen.
+        """
+        generation = self.lexical.generation()
+        return generation and f"{generation}/{self._serial}"
+
+    def changed_elsewhere(self) -> bool:
+        return self.lexical.changed_elsewhere()
+
+    def add(self, ids, embeddings=None, documents=None, metadatas=None, **kwargs):
+        self._collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas, **kwargs)
+        if documents is not None:
+            self.lexical.upsert(_as_list(ids), _as_list(documents), _as_list(metadatas))
+        else:
+            self.lexical.bump_generation()
+
+    def upsert(self, ids, embeddings=None, documents=None, metadatas=None, **kwargs):
+        self._collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas, **kwargs)
+        if documents is not None:
+            self.lexical.upsert(_as_list(ids), _as_list(documents), _as_list(metadatas))
+        elif metadatas is not None:
+            self.lexical.update(_as_list(ids), metadatas=_as_list(metadatas))
+        else:
+            self.lexical.bump_generation()
+
+    def update(self, ids, embeddings=None, documents=None, metadatas=None, **kwargs):
+        self._collection.update(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas, **kwargs)
+        if documents is not None or metadatas is not None:
+            self.lexical.update(_as_list(ids), _as_list(documents), _as_list(metadatas))
+        else:
+            self.lexical.bump_generation()
+
+    def delete(self, ids=None, where=None, **kwargs):
+        if ids is None and where is not None:
+            # Resolve the filter first: the lexical index only knows IDs
+            ids = self._collection.get(where=where, include=[])["ids"]
+            where = None
+        self._collection.delete(ids=ids, where=where, **kwargs)
+        if ids is not None:
+            self.lexical.delete(_as_list(ids))
+        else:
+            self.lexical.bump_generation()
+
+    def _pages(self):
+        offset = 0
+        while True:
+            page = self._collection.get(include=["documents", "metadatas"], limit=BUILD_PAGE_SIZE, offset=offset)
+            if not page["ids"]:
+                return
+            yield page["ids"], page["documents"], page["metadatas"]
+            offset += len(page["ids"])
+
+    def _ensure_built(self):
+        """Build the index from the collection on first use (existing databases)"""
+        self.lexical.ensure_built(self._pages)
+
+    def lexical_query(self, query: str, n_results: int, memory_type: Optional[str] = None) -> list[str]:
+        """BM25 search"""
+        self._ensure_built()
+        return self.lexical.search(query, n_results, memory_type)
+
+    def exact_query(self, needle: str, n_results: int, memory_type: Optional[str] = None) -> list[str]:
+        """Documents or sources containing needle, through the trigram index"""
+        self._ensure_built()
+        return self.lexical.exact(needle, n_results, memory_type)
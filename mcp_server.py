@@ -5,20 +5,41 @@ Provides semantic search tools for Claude Code
 """
 import os
 import re
+import asyncio
 import hashlib
+import logging
 import time
 import json
+import threading
+import heapq
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 
 import chromadb
+import numpy as np
 import requests
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent
 
 # Import session parser for auto-capture
-from session_parser import parse_recent_sessions, get_all_sessions
+from session_parser import SessionCheckpoints, SimHashIndex, get_session_catalog, parse_sessions_parallel
+from chroma_client import reopen_client
+from embedding_cache import LRUVectorCache, SearchResultCache, get_disk_cache
+from embedding_backends import get_backend
+from indexer import FileWork, IndexPipeline, WriteBatch, walk_files
+from lexical_index import (
+    LEXICAL_INDEX_FILE,
+    RRF_K,
+    IndexedCollection,
+    LexicalIndex,
+    looks_like_identifier,
+    reciprocal_rank_fusion,
+)
+from session_follower import CAPTURE_FOLLOW_BATCH, SessionFollower, lower_thread_priority
 
 # Configuration
 OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
@@ -43,9 +64,25 @@ MAX_QUERY_LENGTH = 10000
 MAX_RESULTS = 100
 MAX_CONTENT_LENGTH = 100000
 
+# Search modes: embeddings only, or embeddings + BM25 fused with reciprocal rank fusion
+SEARCH_MODE_VECTOR = "vector"
+SEARCH_MODE_HYBRID = "hybrid"
+VALID_SEARCH_MODES = {SEARCH_MODE_VECTOR, SEARCH_MODE_HYBRID}
+
+# rag_search_batch: queries per call
+MAX_BATCH_QUERIES = 10
+
+# Scopes are queried concurrently; one that has not answered within this budget is
+# left out, so a slow or corrupted scope does not add its latency to every search
+SEARCH_SCOPE_TIMEOUT = float(os.environ.get("RAG_SEARCH_TIMEOUT", "5"))
+
 # Sync state file (tracks file hashes for change detection)
 SYNC_STATE_FILE = os.path.join(CHROMA_PATH, "sync_state.json")
 
+# Status of a running `claude-rag watch` (rewritten at least every third of the max age)
+WATCH_STATUS_FILE = os.path.join(CHROMA_PATH, "watch_status.json")
+WATCH_STATUS_MAX_AGE = 90
+
 # Supported file extensions
 SUPPORTED_EXTENSIONS = {
     ".md": "markdown",
@@ -61,12 +98,65 @@ SUPPORTED_EXTENSIONS = {
     ".fish": "shell",
 }
 
+# Session capture: memories embedded + upserted per batch
+CAPTURE_BATCH_SIZE = 64
+CAPTURE_JOBS = int(os.environ.get("RAG_CAPTURE_JOBS", str(min(4, os.cpu_count() or 1))))
+MAX_CAPTURE_JOBS = os.cpu_count() or 1
+
+# Background capture of the current project's active sessions while the server runs
+CAPTURE_FOLLOW = os.environ.get("RAG_CAPTURE_FOLLOW", "").lower() in ("1", "true", "yes")
+
+# Near-duplicate suppression: memories whose SimHash is within this many bits of one
+# captured in the same run are dropped before embedding; then memories whose cosine
+# similarity to a stored (or batch) neighbour reaches the threshold are dropped (0 disables)
+CAPTURE_SIMHASH_DISTANCE = 4
+CAPTURE_DEDUP_SIMILARITY = float(os.environ.get("RAG_CAPTURE_DEDUP", "0.95"))
+# Stored neighbours are looked up among conversation memories only (captured or added by
+# hand): a memory quoting code is not a duplicate of the file chunk it quotes
+CAPTURE_DEDUP_WHERE = {"$or": [{"auto_captured": "true"}, {"source": "manual"}]}
+
+# Tool execution: handlers are blocking (Ollama HTTP, ChromaDB), so they run in thread pools
+TOOL_WORKERS = int(os.environ.get("RAG_TOOL_WORKERS", "8"))
+BULK_TOOL_WORKERS = int(os.environ.get("RAG_BULK_TOOL_WORKERS", "2"))
+BULK_TOOLS = {"rag_index", "rag_capture", "rag_sync", "rag_backup", "rag_restore", "rag_export", "rag_reset"}
+DEFAULT_TOOL_CONCURRENCY = TOOL_WORKERS
+TOOL_CONCURRENCY = {
+    "rag_index": 1,
+    "rag_capture": 1,
+    "rag_sync": 1,
+    "rag_backup": 1,
+    "rag_restore": 1,
+    "rag_export": 1,
+    "rag_reset": 1,
+}
+
 # Initialize server
 server = Server("claude-rag")
 
-# ChromaDB clients (lazy init)
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="rag-tool")
+_bulk_tool_pool = ThreadPoolExecutor(max_workers=BULK_TOOL_WORKERS, thread_name_prefix="rag-bulk")
+_tool_semaphores = {}  # tool name -> asyncio.Semaphore
+_follower = None  # SessionFollower when CAPTURE_FOLLOW is enabled
+
+# Search results keyed by query, filters and the collections' generations (any write invalidates)
+_search_cache = SearchResultCache()
+
+# Per-scope vector and BM25 queries (never on the tool pools: no self-deadlock). Jobs never
+# wait on each other, and a timed-out query keeps its worker, hence the headroom
+_search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rag-search")
+# Timed-out queries still holding a worker, per scope: the scope is skipped until they finish,
+# so a hung scope holds one search's worth of workers instead of filling the pool
+_abandoned = {}  # scope -> futures
+_abandoned_lock = threading.Lock()
+
+# ChromaDB clients (lazy init, shared by the tool threads)
 _clients = {}  # scope -> client
 _collections = {}  # scope -> collection
+_collections_lock = threading.RLock()
+_dimension_errors = {}  # scope -> message, for collections written by another embedding model
+
+# Embedded once to learn the configured model's vector size (then served from the caches)
+EMBED_DIMENSION_PROBE = "embedding dimension probe"
 
 
 def get_project_id() -> str:
@@ -103,26 +193,63 @@ def is_safe_path(path: Path, base_path: Path = None) -> bool:
         return False
 
 
+def check_embedding_dimension(collection, scope: str) -> Optional[str]:
+    """
+    A message if the scope's stored vectors differ in size from the configured
+    embedding model's (EMBED_BACKEND/EMBED_MODEL switched), else None
+    """
+    stored = collection.get(limit=1, include=["embeddings"])["embeddings"]
+    if stored is None or len(stored) == 0:
+        return None
+    try:
+        expected = len(get_embedding(EMBED_DIMENSION_PROBE))
+    except Exception:
+        return None  # Backend unavailable: reported by its own health check
+    if len(stored[0]) == expected:
+        return None
+    return (
+        f"The {scope} memories were embedded with {len(stored[0])}-dimension vectors, but "
+        f"{get_backend().cache_model} produces {expected}: searches and writes on this scope will fail. "
+        f"Switch EMBED_BACKEND/EMBED_MODEL back, or move {get_db_path(scope)} aside (or set CHROMA_PATH) and re-index."
+    )
+
+
+def dimension_warnings(scope: str) -> str:
+    """Warnings for the given scope(s) whose collection does not match the embedding model"""
+    scopes = [SCOPE_PROJECT, SCOPE_GLOBAL] if scope == SCOPE_ALL else [scope]
+    return "".join(f"⚠️ {_dimension_errors[s]}\n\n" for s in scopes if s in _dimension_errors)
+
+
 def get_collection(scope: str = SCOPE_PROJECT):
     """Get or create ChromaDB collection for a scope"""
     global _clients, _collections
 
-    if scope not in _collections:
+    # Fast path: only fully opened collections are ever published
+    collection = _collections.get(scope)
+    if collection is not None and not collection.changed_elsewhere():
+        return collection
+
+    with _collections_lock:
+        collection = _collections.get(scope)
+        if collection is not None:
+            if collection.changed_elsewhere():
+                collection = _reopen_collection(scope, collection)
+            return collection
+
         db_path = get_db_path(scope)
         os.makedirs(db_path, exist_ok=True)
-        _clients[scope] = chromadb.PersistentClient(path=db_path)
+        client = chromadb.PersistentClient(path=db_path)
         try:
-            _collections[scope] = _clients[scope].get_or_create_collection(
+            collection = client.get_or_create_collection(
                 name="memories",
                 metadata={"hnsw:space": "cosine"}
             )
             # Test the collection is not corrupted
-            _collections[scope].count()
+            collection.count()
         except KeyError as e:
             # ChromaDB schema corruption (e.g., after version upgrade)
             # IMPORTANT: Backup before deleting!
             import shutil
-            import logging
             from datetime import datetime
 
             logging.warning(f"Corrupted collection detected ({e}): {db_path}")
@@ -139,16 +266,57 @@ def get_collection(scope: str = SCOPE_PROJECT):
                 logging.error(f"Backup failed: {backup_err}")
 
             # Now reset
-            del _clients[scope]
+            del client
             shutil.rmtree(db_path)
             os.makedirs(db_path, exist_ok=True)
-            _clients[scope] = chromadb.PersistentClient(path=db_path)
-            _collections[scope] = _clients[scope].get_or_create_collection(
+            client = chromadb.PersistentClient(path=db_path)
+            collection = client.get_or_create_collection(
                 name="memories",
                 metadata={"hnsw:space": "cosine"}
             )
             logging.warning(f"Collection reset: {db_path}")
-    return _collections[scope]
+
+        # Every write is mirrored into the scope's BM25 index, which also counts writes from other processes
+        index = LexicalIndex(os.path.join(db_path, LEXICAL_INDEX_FILE))
+        index.acknowledge()
+        collection = IndexedCollection(collection, index)
+        _clients[scope] = client
+        _collections[scope] = collection
+
+    # The probe embeds a text: a slow or unreachable backend must not hold up opening
+    # the collection, nor keyword searches that need no embeddings
+    threading.Thread(
+        target=_probe_embedding_dimension, args=(collection, scope), name=f"rag-dimension-{scope}", daemon=True
+    ).start()
+    return collection
+
+
+def _probe_embedding_dimension(collection, scope: str):
+    """Record a newly opened scope's embedding dimension mismatch, shown by rag_search/rag_stats"""
+    try:
+        mismatch = check_embedding_dimension(collection, scope)
+    except Exception as e:
+        logging.warning(f"Embedding dimension check failed ({scope}): {e}")
+        return
+    if mismatch:
+        logging.warning(mismatch)
+        _dimension_errors[scope] = mismatch
+
+
+def _reopen_collection(scope: str, stale: IndexedCollection) -> IndexedCollection:
+    """
+    Reopen a collection another process wrote to (claude-rag watch/capture/index, the web UI):
+    the client's cached Chroma system would keep answering from its in-memory vector index.
+    """
+    stale.lexical.acknowledge()  # First: writes landing from now on trigger another reopen
+    client = reopen_client(get_db_path(scope))
+    collection = IndexedCollection(
+        client.get_or_create_collection(name="memories", metadata={"hnsw:space": "cosine"}),
+        stale.lexical
+    )
+    _clients[scope] = client
+    _collections[scope] = collection
+    return collection
 
 
 def get_collections_for_scope(scope: str) -> list:
@@ -161,49 +329,60 @@ def get_collections_for_scope(scope: str) -> list:
         return [(get_collection(SCOPE_PROJECT), SCOPE_PROJECT)]
 
 
-# Simple in-memory cache for embeddings (cleared on restart)
-_embedding_cache = {}
+# In-memory LRU cache for embeddings (cleared on restart), backed by the persistent disk cache
+_embedding_cache = LRUVectorCache()
 _cache_hits = 0
 _cache_misses = 0
+_cache_counts_lock = threading.Lock()  # Handlers embed from several executor threads
 
 
-def get_embedding(text: str, use_cache: bool = True) -> list:
-    """Get embedding from Ollama (with caching)"""
+def _memory_cache_key(text: str) -> bytes:
+    return hashlib.md5(text.encode()).digest()
+
+
+def _count_cache(hits: int = 0, misses: int = 0):
     global _cache_hits, _cache_misses
+    with _cache_counts_lock:
+        _cache_hits += hits
+        _cache_misses += misses
+
+
+def get_embedding(text: str, use_cache: bool = True) -> list:
+    """Get embedding from the configured backend (with caching)"""
+    backend = get_backend()
 
     # Check cache first
-    cache_key = hashlib.md5(text.encode()).hexdigest()
-    if use_cache and cache_key in _embedding_cache:
-        _cache_hits += 1
-        return _embedding_cache[cache_key]
-
-    _cache_misses += 1
-    resp = requests.post(
-        f"{OLLAMA_URL}/api/embeddings",
-        json={"model": EMBED_MODEL, "prompt": text},
-        timeout=30
-    )
-    resp.raise_for_status()
-    data = resp.json()
+    cache_key = _memory_cache_key(text)
+    if use_cache:
+        cached = _embedding_cache.get(cache_key)
+        if cached is not None:
+            _count_cache(hits=1)
+            return cached
 
-    if "embedding" not in data:
-        raise ValueError(f"Ollama response missing 'embedding' key. Got: {list(data.keys())}")
+    # Then the persistent cache (survives MCP restarts)
+    if use_cache:
+        cached = get_disk_cache().get_many(backend.cache_model, [text])
+        if cached:
+            _count_cache(hits=1)
+            _embedding_cache.put(cache_key, cached[0])
+            return cached[0]
 
-    embedding = data["embedding"]
+    _count_cache(misses=1)
+    embedding = backend.embed_one(text)
 
     # Cache it
     if use_cache:
-        _embedding_cache[cache_key] = embedding
+        _embedding_cache.put(cache_key, embedding)
+        get_disk_cache().put_many(backend.cache_model, [text], [embedding])
 
     return embedding
 
 
 def get_embeddings_batch(texts: list[str], use_cache: bool = True) -> list[list]:
-    """Get embeddings for multiple texts in one API call (much faster)"""
-    global _cache_hits, _cache_misses
-
+    """Get embeddings for multiple texts in batched backend calls (much faster)"""
     if not texts:
         return []
+    backend = get_backend()
 
     # Check cache for each text
     results = [None] * len(texts)
@@ -211,50 +390,56 @@ def get_embeddings_batch(texts: list[str], use_cache: bool = True) -> list[list]
     uncached_texts = []
 
     for i, text in enumerate(texts):
-        cache_key = hashlib.md5(text.encode()).hexdigest()
-        if use_cache and cache_key in _embedding_cache:
-            _cache_hits += 1
-            results[i] = _embedding_cache[cache_key]
+        cached = _embedding_cache.get(_memory_cache_key(text)) if use_cache else None
+        if cached is not None:
+            results[i] = cached
         else:
-            _cache_misses += 1
             uncached_indices.append(i)
             uncached_texts.append(text)
 
-    # Batch call for uncached texts
-    if uncached_texts:
-        resp = requests.post(
-            f"{OLLAMA_URL}/api/embed",
-            json={"model": EMBED_MODEL, "input": uncached_texts},
-            timeout=120  # Longer timeout for batch
-        )
-        resp.raise_for_status()
-        data = resp.json()
+    # Then the persistent cache for the remaining texts
+    if use_cache and uncached_texts:
+        cached = get_disk_cache().get_many(backend.cache_model, uncached_texts)
+        for j, embedding in cached.items():
+            idx = uncached_indices[j]
+            results[idx] = embedding
+            _embedding_cache.put(_memory_cache_key(texts[idx]), embedding)
+        uncached_indices = [idx for j, idx in enumerate(uncached_indices) if j not in cached]
+        uncached_texts = [texts[idx] for idx in uncached_indices]
 
-        if "embeddings" not in data:
-            raise ValueError(f"Ollama response missing 'embeddings' key. Got: {list(data.keys())}")
+    _count_cache(hits=len(texts) - len(uncached_texts), misses=len(uncached_texts))
 
-        embeddings = data["embeddings"]
+    # Sub-batched calls for uncached texts, caching each sub-batch as it lands
+    if uncached_texts:
+        def cache_batch(batch_texts, embeddings):
+            for text, embedding in zip(batch_texts, embeddings, strict=True):
+                _embedding_cache.put(_memory_cache_key(text), embedding)
+            get_disk_cache().put_many(backend.cache_model, batch_texts, embeddings)
 
-        # Store in results and cache
-        for idx, embedding in zip(uncached_indices, embeddings):
+        embeddings = backend.embed(uncached_texts, on_batch=cache_batch if use_cache else None)
+        for idx, embedding in zip(uncached_indices, embeddings, strict=True):
             results[idx] = embedding
-            if use_cache:
-                cache_key = hashlib.md5(texts[idx].encode()).hexdigest()
-                _embedding_cache[cache_key] = embedding
 
     return results
 
 
 def get_cache_stats() -> dict:
     """Get embedding cache statistics"""
-    total = _cache_hits + _cache_misses
-    hit_rate = (_cache_hits / total * 100) if total > 0 else 0
+    with _cache_counts_lock:
+        hits, misses = _cache_hits, _cache_misses
+    total = hits + misses
+    hit_rate = (hits / total * 100) if total > 0 else 0
+    memory_stats = _embedding_cache.stats()
     return {
-        "hits": _cache_hits,
-        "misses": _cache_misses,
+        "hits": hits,
+        "misses": misses,
         "total": total,
         "hit_rate": f"{hit_rate:.1f}%",
-        "cache_size": len(_embedding_cache)
+        "cache_size": memory_stats["entries"],
+        "resident_bytes": memory_stats["resident_bytes"],
+        "max_bytes": memory_stats["max_bytes"],
+        "evictions": memory_stats["evictions"],
+        "disk": get_disk_cache().stats()
     }
 
 
@@ -397,6 +582,19 @@ def save_sync_state(state: dict):
         json.dump(state, f, indent=2)
 
 
+def get_watch_status() -> Optional[dict]:
+    """Status of a running file watcher, or None if none is running"""
+    try:
+        with open(WATCH_STATUS_FILE) as f:
+            status = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    # A watcher that stopped heartbeating was killed without cleanup
+    if time.time() - status.get("updated_at", 0) > WATCH_STATUS_MAX_AGE:
+        return None
+    return status
+
+
 def get_file_hash(filepath: str) -> str:
     """Get SHA256 hash of file content"""
     with open(filepath, 'rb') as f:
@@ -425,30 +623,737 @@ def get_indexed_sources(scope: str) -> set:
         return set()
 
 
-def check_ollama_health() -> dict:
-    """Check if Ollama is running and model is available"""
+def sync_file_chunks(collection, filepath: str, chunks: list[dict], file_type: str, file_hash: str) -> dict:
+    """
+    Bring the stored chunks of a synced file in line with its new chunks.
+    Chunk IDs are content-addressed, so unchanged IDs only get their metadata
+    refreshed, moved sections reuse their stored embedding, and only new
+    content is embedded. IDs that no longer exist are deleted.
+    """
+    source_pattern = f"file:{filepath}"
     try:
-        # Check if Ollama is running
-        resp = requests.get(f"{OLLAMA_URL}/api/tags", timeout=5)
-        if resp.status_code != 200:
-            return {"ok": False, "error": "Ollama not responding"}
-
-        # Check if embedding model is available
-        models = [m["name"] for m in resp.json().get("models", [])]
-        model_available = any(EMBED_MODEL in m for m in models)
-
-        if not model_available:
-            return {
-                "ok": False,
-                "error": f"Model '{EMBED_MODEL}' not found. Run: ollama pull {EMBED_MODEL}"
-            }
+        existing_ids = collection.get(where={"source": source_pattern}, include=[])["ids"]
+    except Exception:
+        existing_ids = []  # Collection might not have where filter support
+
+    ids = [generate_chunk_id(chunk["text"], filepath, i) for i, chunk in enumerate(chunks)]
+    indexed_at = datetime.now().isoformat()
+    metadatas = [{
+        "source": source_pattern,
+        "file_type": file_type,
+        "memory_type": "context",
+        "chunk_index": str(i),
+        "file_hash": file_hash[:16],
+        "indexed_at": indexed_at
+    } for i in range(len(chunks))]
+
+    existing = set(existing_ids)
+    current = set(ids)
+    vanished = [i for i in existing_ids if i not in current]
+    kept = [i for i, chunk_id in enumerate(ids) if chunk_id in existing]
+    new = [i for i, chunk_id in enumerate(ids) if chunk_id not in existing]
+
+    # Sections that only moved keep their content hash (last ID component)
+    by_content = {chunk_id.rsplit("_", 1)[-1]: chunk_id for chunk_id in vanished}
+    reuse = {i: by_content[ids[i].rsplit("_", 1)[-1]] for i in new if ids[i].rsplit("_", 1)[-1] in by_content}
+    embeddings = {}
+    if reuse:
+        stored = collection.get(ids=list(set(reuse.values())), include=["embeddings"])
+        # Handle embeddings (can be numpy array or list)
+        vectors = {
+            chunk_id: e.tolist() if hasattr(e, 'tolist') else e
+            for chunk_id, e in zip(stored["ids"], stored["embeddings"], strict=True)
+        }
+        embeddings = {i: vectors[old] for i, old in reuse.items() if old in vectors}
+
+    to_embed = [i for i in new if i not in embeddings]
+    if to_embed:
+        for i, embedding in zip(to_embed, get_embeddings_batch([chunks[i]["text"] for i in to_embed]), strict=True):
+            embeddings[i] = embedding
+
+    if new:
+        collection.upsert(
+            ids=[ids[i] for i in new],
+            embeddings=[embeddings[i] for i in new],
+            documents=[chunks[i]["text"] for i in new],
+            metadatas=[metadatas[i] for i in new]
+        )
+    if kept:
+        collection.update(ids=[ids[i] for i in kept], metadatas=[metadatas[i] for i in kept])
+    if vanished:
+        collection.delete(ids=vanished)
+
+    return {"kept": len(kept), "reused": len(new) - len(to_embed), "embedded": len(to_embed), "removed": len(vanished)}
+
+
+def sync_paths(paths: list[str], scope: str = SCOPE_PROJECT, force: bool = False) -> dict:
+    """Sync watched files whose content changed since the last sync (see sync_file_chunks)"""
+    collection = get_collection(scope)
+    sync_state = get_sync_state()
+    updated = []
+    skipped = []
+    not_found = []
+
+    for filepath in paths:
+        if not os.path.exists(filepath):
+            not_found.append(filepath)
+            continue
+
+        # Get current file hash
+        current_hash = get_file_hash(filepath)
+        state_key = f"{scope}:{filepath}"
+        stored_hash = sync_state.get(state_key, {}).get("hash")
+
+        # Skip if unchanged (unless force)
+        if not force and current_hash == stored_hash:
+            skipped.append(filepath)
+            continue
+
+        # Read and chunk the file
+        content = Path(filepath).read_text()
+        ext = Path(filepath).suffix.lower()
+        file_type = SUPPORTED_EXTENSIONS.get(ext, "text")
+        chunks = chunk_content(content, file_type)
+
+        diff = sync_file_chunks(collection, filepath, chunks, file_type, current_hash)
+        chunk_count = len(chunks)
+
+        # Update sync state
+        sync_state[state_key] = {
+            "hash": current_hash,
+            "indexed_at": datetime.now().isoformat(),
+            "chunks": chunk_count
+        }
+        updated.append({"path": filepath, "chunks": chunk_count, "embedded": diff["embedded"]})
 
-        return {"ok": True, "ollama": "running", "model": EMBED_MODEL}
+    # Save sync state
+    save_sync_state(sync_state)
+    return {"updated": updated, "skipped": skipped, "not_found": not_found}
 
-    except requests.exceptions.ConnectionError:
-        return {"ok": False, "error": "Ollama not running. Start with: systemctl start ollama"}
-    except Exception as e:
-        return {"ok": False, "error": str(e)}
+
+# ============================================================================
+# Incremental Indexing (rag_index)
+# ============================================================================
+
+def get_indexed_file_states(collection) -> dict:
+    """
+    Map each file indexed by rag_index to what is stored for it:
+    {source: {"mtime", "size", "hash", "ids", "metadatas"}}
+    """
+    states = {}
+    data = collection.get(include=["metadatas"])
+    for doc_id, meta in zip(data.get("ids", []), data.get("metadatas", []) or [], strict=True):
+        if not meta or "chunk_type" not in meta:
+            continue  # Not a rag_index chunk (manual, session capture, rag_sync...)
+        source = meta.get("source", "")
+        state = states.setdefault(source, {
+            "mtime": meta.get("file_mtime"),
+            "size": meta.get("file_size"),
+            "hash": meta.get("file_hash"),
+            "ids": [],
+            "metadatas": [],
+        })
+        state["ids"].append(doc_id)
+        state["metadatas"].append(meta)
+    return states
+
+
+def _prepare_file(collection, filepath: Path, file_type: str, stat: os.stat_result, stored: dict, force: bool = False):
+    """
+    Read and chunk one file if it changed since it was stored (runs in an index reader thread).
+    Returns a FileWork for the pipeline, or None for unreadable files.
+    """
+    source = str(filepath)
+
+    # Cheap check first: unchanged mtime and size means unchanged file
+    if not force and stored and stored["mtime"] == stat.st_mtime and stored["size"] == stat.st_size:
+        return FileWork(source=source, info={"status": "skipped", "chunks": len(stored["ids"])})
+
+    try:
+        content = filepath.read_text()
+    except (UnicodeDecodeError, OSError):
+        return None  # Skip binary or vanished files
+
+    file_hash = hashlib.sha256(content.encode()).hexdigest()[:16]
+
+    # Touched but identical: refresh the stored mtime so the cheap check hits next time
+    if not force and stored and stored["hash"] == file_hash:
+        metadatas = [dict(meta, file_mtime=stat.st_mtime, file_size=stat.st_size) for meta in stored["metadatas"]]
+        return FileWork(
+            source=source,
+            finalize=lambda: collection.update(ids=stored["ids"], metadatas=metadatas),
+            info={"status": "skipped", "chunks": len(stored["ids"])}
+        )
+
+    doc_id = hashlib.md5(source.encode()).hexdigest()[:8]
+
+    # Smart chunking based on file type
+    chunks = chunk_content(content, file_type)
+
+    ids = [f"{doc_id}_{i}" for i in range(len(chunks))]
+    indexed_at = datetime.now().isoformat()
+    metadatas = [{
+        "source": source,
+        "file_type": file_type,
+        "file_hash": file_hash,
+        "file_mtime": stat.st_mtime,
+        "file_size": stat.st_size,
+        "chunk_index": i,
+        "chunk_type": c["type"],
+        "indexed_at": indexed_at
+    } for i, c in enumerate(chunks)]
+
+    # The file shrank: drop chunks past the new end once the new ones are written
+    stale = list(set(stored["ids"]) - set(ids)) if stored else []
+
+    return FileWork(
+        source=source,
+        ids=ids,
+        documents=[c["text"] for c in chunks],
+        metadatas=metadatas,
+        finalize=(lambda: collection.delete(ids=stale)) if stale else None,
+        info={"status": "updated", "chunks": len(chunks), "name": filepath.name}
+    )
+
+
+def _run_index(collection, states: dict, files, force: bool = False) -> tuple[dict, set]:
+    """Run (path, file_type, stat) items through the pipeline. Returns (result, seen sources)"""
+    seen = set()
+
+    def prepare(item):
+        filepath, file_type, stat = item
+        seen.add(filepath)
+        return _prepare_file(collection, Path(filepath), file_type, stat, states.get(filepath), force=force)
+
+    def upsert(batch: WriteBatch):
+        collection.upsert(
+            ids=batch.ids,
+            embeddings=batch.embeddings,
+            documents=batch.documents,
+            metadatas=batch.metadatas
+        )
+
+    pipeline = IndexPipeline(prepare, get_embeddings_batch, upsert)
+    completed = pipeline.run(files)
+
+    result = {"files": [], "chunks": 0, "updated": 0, "skipped": 0, "removed": 0}
+    for work in completed:
+        status = work.info["status"]
+        result[status] += 1
+        if status == "updated":
+            result["chunks"] += work.info["chunks"]
+            result["files"].append(f"{work.info['name']} ({work.info['chunks']} chunks)")
+    return result, seen
+
+
+def index_path(path: Path, scope: str = SCOPE_PROJECT, force: bool = False) -> dict:
+    """
+    Incrementally index a file or directory: only new or changed files are
+    re-chunked and re-embedded, and chunks of deleted files are removed.
+    Files stream through the read/chunk -> embed -> upsert pipeline (see indexer.py).
+    """
+    start = time.time()
+    path = Path(os.path.abspath(path))
+    collection = get_collection(scope)
+    states = get_indexed_file_states(collection)
+
+    # Find all supported files: (path, file_type, stat), stat reused by the change check
+    if path.is_dir():
+        files = walk_files(path, SUPPORTED_EXTENSIONS)
+    else:
+        try:
+            files = [(str(path), SUPPORTED_EXTENSIONS.get(path.suffix.lower(), "text"), path.stat())]
+        except OSError:
+            files = []
+
+    result, seen = _run_index(collection, states, files, force=force)
+
+    # Files that disappeared from an indexed directory
+    if path.is_dir():
+        prefix = str(path) + os.sep
+        for source, state in states.items():
+            if source.startswith(prefix) and source not in seen:
+                collection.delete(ids=state["ids"])
+                result["removed"] += 1
+
+    result["elapsed"] = time.time() - start
+    return result
+
+
+def index_files(paths: list, scope: str = SCOPE_PROJECT) -> dict:
+    """
+    Incrementally reindex individual files (e.g. from the file watcher).
+    Paths that no longer exist have their chunks removed.
+    """
+    start = time.time()
+    collection = get_collection(scope)
+    states = get_indexed_file_states(collection)
+
+    files = []
+    missing = []
+    for path in dict.fromkeys(os.path.abspath(p) for p in paths):
+        try:
+            files.append((path, SUPPORTED_EXTENSIONS.get(Path(path).suffix.lower(), "text"), os.stat(path)))
+        except FileNotFoundError:
+            missing.append(path)
+        except OSError:
+            continue
+
+    result, _ = _run_index(collection, states, files)
+
+    for path in missing:
+        if path in states:
+            collection.delete(ids=states[path]["ids"])
+            result["removed"] += 1
+
+    result["elapsed"] = time.time() - start
+    return result
+
+
+# ============================================================================
+# Session Capture (rag_capture)
+# ============================================================================
+
+def checkpoint_namespace(scope: str) -> str:
+    """Session checkpoints are kept per collection: what one scope captured is still unread for another"""
+    return os.path.relpath(get_db_path(scope), CHROMA_PATH)
+
+
+def load_checkpoints(scope: str, rescan: bool = False) -> SessionCheckpoints:
+    """Session read positions of the scope's collection (none with rescan: re-read sessions from the start)"""
+    namespace = checkpoint_namespace(scope)
+    return SessionCheckpoints(namespace=namespace) if rescan else SessionCheckpoints.load(namespace=namespace)
+
+
+def find_capture_sessions(checkpoints: SessionCheckpoints, limit: Optional[int] = None,
+                          all_projects: bool = False) -> Optional[list]:
+    """
+    Sessions of this project (or every project), newest first, limited to the
+    `limit` most recent, minus those with nothing new since their checkpoint.
+    Returns None when there are no sessions at all.
+    """
+    catalog = get_session_catalog()
+    infos = catalog.sessions(None if all_projects else PROJECT_PATH, checkpoints)
+    if not infos:
+        return None
+    if limit is not None:
+        infos = infos[:limit]
+    return [info.path for info in infos if info.unread > 0]
+
+
+def _novel_embeddings(collection, embeddings: list, similarity: float) -> list[int]:
+    """Indices of embeddings not within `similarity` (cosine) of a stored memory or an earlier one in the list"""
+    if not similarity or not embeddings:
+        return list(range(len(embeddings)))
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    nearest = np.full(len(vectors), -1.0)
+    if collection.count():
+        result = collection.query(
+            query_embeddings=vectors.tolist(), n_results=1, where=CAPTURE_DEDUP_WHERE, include=["distances"]
+        )
+        # Collections use cosine space: distance = 1 - similarity
+        nearest = np.array([1 - d[0] if d else -1.0 for d in result["distances"]])
+
+    keep = []
+    for i, vector in enumerate(vectors):
+        if nearest[i] >= similarity:
+            continue
+        if keep and float(np.max(vectors[keep] @ vector)) >= similarity:
+            continue
+        keep.append(i)
+    return keep
+
+
+def capture_sessions(
+    sessions: list,
+    scope: str = SCOPE_PROJECT,
+    min_confidence: float = 0.7,
+    dry_run: bool = False,
+    checkpoints: Optional[SessionCheckpoints] = None,
+    jobs: int = 1,
+    on_progress=None,
+    similarity: float = CAPTURE_DEDUP_SIMILARITY,
+    batch_size: int = CAPTURE_BATCH_SIZE
+) -> dict:
+    """
+    Extract memories from session files and store them. Sessions are parsed in
+    a process pool when jobs > 1 (at most one per CPU); memories are embedded and
+    upserted in batches.
+    Checkpoints are saved only after the memories read so far are stored, so an
+    interrupted capture resumes where it stopped.
+    Near-duplicates are dropped: by SimHash within the run, then by cosine
+    similarity >= `similarity` to a stored memory or an earlier one in the batch.
+    on_progress(sessions_done, sessions_total, memories_captured) is called per session.
+    """
+    jobs = max(1, min(jobs, MAX_CAPTURE_JOBS))
+    collection = None if dry_run else get_collection(scope)
+    captured = []
+    skipped = 0
+    existing = 0
+    duplicates = 0
+    pending = []
+    sketches = SimHashIndex(CAPTURE_SIMHASH_DISTANCE)
+
+    def flush():
+        if not pending:
+            return
+        nonlocal existing, duplicates
+        # The same memory can appear twice in a batch (e.g. a repeated summary): one upsert per ID
+        unique = {hashlib.md5(f"{m.content}{m.timestamp}".encode()).hexdigest()[:12]: m for m in pending}
+        # IDs are content-addressed: anything already stored was captured by an earlier run
+        stored = set(collection.get(ids=list(unique), include=[])["ids"])
+        existing += len(stored)
+        ids = [doc_id for doc_id in unique if doc_id not in stored]
+        new = [unique[doc_id] for doc_id in ids]
+        pending.clear()
+
+        if new:
+            embeddings = get_embeddings_batch([m.content for m in new])
+            keep = _novel_embeddings(collection, embeddings, similarity)
+            duplicates += len(new) - len(keep)
+            ids = [ids[i] for i in keep]
+            new = [new[i] for i in keep]
+            embeddings = [embeddings[i] for i in keep]
+
+        if new:
+            indexed_at = datetime.now().isoformat()
+            metadatas = [{
+                "source": f"session:{m.source}",
+                "memory_type": m.memory_type,
+                "tags": ",".join(m.tags) if m.tags else "",
+                "confidence": str(m.confidence),
+                "indexed_at": indexed_at,
+                "auto_captured": "true"
+            } for m in new]
+            collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                documents=[m.content for m in new],
+                metadatas=metadatas
+            )
+            captured.extend({"type": m.memory_type, "id": doc_id} for m, doc_id in zip(new, ids, strict=True))
+
+        # Everything read so far is stored: safe to move the checkpoints
+        if checkpoints:
+            checkpoints.save()
+
+    done = 0
+    for _, memories, finished in parse_sessions_parallel(sessions, checkpoints, jobs):
+        done += finished
+        for memory in memories:
+            if memory.confidence < min_confidence:
+                skipped += 1
+            elif sketches.find(memory.simhash) is not None:
+                duplicates += 1
+            elif dry_run:
+                sketches.add(memory.simhash)
+                captured.append({
+                    "type": memory.memory_type,
+                    "confidence": memory.confidence,
+                    "content": memory.content[:100] + "...",
+                    "tags": memory.tags
+                })
+            else:
+                sketches.add(memory.simhash)
+                pending.append(memory)
+                if len(pending) >= batch_size:
+                    flush()
+        if on_progress:
+            on_progress(done, len(sessions), len(captured) + len(pending))
+
+    if not dry_run:
+        flush()
+        if checkpoints:
+            checkpoints.save()
+
+    return {"captured": captured, "skipped": skipped, "existing": existing, "duplicates": duplicates,
+            "sessions": len(sessions)}
+
+
+def check_embedding_health() -> dict:
+    """Check if the embedding backend is usable (Ollama running + model pulled, local model loads...)"""
+    return get_backend().health()
+
+
+def _vector_hits(collection, embeddings: list, n_results: int, where: Optional[dict]) -> list[list[dict]]:
+    """Nearest neighbours of each embedding (one multi-query call), best first (score = cosine similarity)"""
+    results = collection.query(query_embeddings=embeddings, n_results=n_results, where=where)
+    return [
+        [
+            {"id": doc_id, "document": doc, "metadata": meta, "score": 1 - dist}
+            for doc_id, doc, meta, dist in zip(ids, documents, metadatas, distances, strict=True)
+        ]
+        for ids, documents, metadatas, distances in zip(
+            results["ids"], results["documents"], results["metadatas"], results["distances"], strict=True
+        )
+    ]
+
+
+def _fuse_hits(collection, vector: list[dict], lexical: list[str]) -> list[dict]:
+    """RRF of vector hits and BM25 IDs, best first (score normalized: 1.0 = first in both lists)"""
+    scores = reciprocal_rank_fusion([[hit["id"] for hit in vector], lexical])
+    hits = {hit["id"]: hit for hit in vector}
+    missing = [doc_id for doc_id in lexical if doc_id not in hits]
+    if missing:
+        found = collection.get(ids=missing, include=["documents", "metadatas"])
+        # IDs the index still lists but the collection no longer has are dropped
+        for doc_id, doc, meta in zip(found["ids"], found["documents"], found["metadatas"], strict=True):
+            hits[doc_id] = {"id": doc_id, "document": doc, "metadata": meta}
+    best = 2 / (RRF_K + 1)
+    for doc_id, hit in hits.items():
+        hit["score"] = scores[doc_id] / best
+    return sorted(hits.values(), key=lambda hit: hit["score"], reverse=True)
+
+
+def _abandon(scope: str, future):
+    """Track a query that missed SEARCH_SCOPE_TIMEOUT until it finishes"""
+    with _abandoned_lock:
+        futures = _abandoned.setdefault(scope, set())
+        futures.add(future)
+
+    def release(done):
+        with _abandoned_lock:
+            futures.discard(done)
+
+    future.add_done_callback(release)
+
+
+def _responsive(collections: list) -> tuple[list, bool]:
+    """(collection, scope) pairs with no abandoned query still running, and whether none was skipped"""
+    with _abandoned_lock:
+        busy = {coll_scope for _, coll_scope in collections if _abandoned.get(coll_scope)}
+    for coll_scope in sorted(busy):
+        logging.warning(f"Skipping scope {coll_scope}: an earlier search of it is still running")
+    return [(coll, coll_scope) for coll, coll_scope in collections if coll_scope not in busy], not busy
+
+
+def _search_collections(collections: list, queries: list[dict]) -> list[tuple[list[dict], bool]]:
+    """
+    Run queries ({query, n_results, memory_type, mode}) against (collection, scope)
+    pairs concurrently: one embedding batch for all queries, one multi-query call per
+    collection and memory_type filter. Returns (hits best first, every scope answered) per query.
+    """
+    collections, responsive = _responsive(collections)
+    complete = [responsive] * len(queries)
+    # Over-fetch: the scopes' results are merged before keeping n_results
+    fetch = [q["n_results"] * 2 for q in queries]
+
+    lexical = {}  # (query index, scope) -> BM25 future, started before the embedding call
+    for i, q in enumerate(queries):
+        if q["mode"] == SEARCH_MODE_HYBRID:
+            for coll, coll_scope in collections:
+                lexical[i, coll_scope] = _search_pool.submit(coll.lexical_query, q["query"], fetch[i], q["memory_type"])
+    try:
+        embeddings = get_embeddings_batch([q["query"] for q in queries])
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+        # Keyword results can still answer, but only if every query has them
+        if len(lexical) < len(queries) * len(collections):
+            raise
+        embeddings = None
+        complete = [False] * len(queries)
+
+    groups = {}  # memory_type -> query indices
+    for i, q in enumerate(queries):
+        groups.setdefault(q["memory_type"], []).append(i)
+
+    # The budget covers the scope queries, not the embedding call
+    deadline = time.monotonic() + SEARCH_SCOPE_TIMEOUT
+    vector = {}  # (memory_type, scope) -> future of per-query hit lists
+    if embeddings is not None:
+        for memory_type, members in groups.items():
+            where_filter = {"memory_type": memory_type} if memory_type else None
+            for coll, coll_scope in collections:
+                vector[memory_type, coll_scope] = _search_pool.submit(
+                    _vector_hits, coll, [embeddings[i] for i in members], max(fetch[i] for i in members), where_filter
+                )
+
+    ranked = [[] for _ in queries]  # Per query: one best-first list per scope
+    for coll, coll_scope in collections:
+        for memory_type, members in groups.items():
+            try:
+                if vector:
+                    per_query = vector[memory_type, coll_scope].result(timeout=max(0, deadline - time.monotonic()))
+                else:
+                    per_query = [[] for _ in members]
+            except FutureTimeoutError:
+                logging.warning(f"Search of scope {coll_scope} timed out after {SEARCH_SCOPE_TIMEOUT:.1f}s")
+                _abandon(coll_scope, vector[memory_type, coll_scope])
+                per_query = None
+            except Exception as e:
+                logging.warning(f"Vector search failed ({coll_scope}): {e}")
+                per_query = None
+            if per_query is None:
+                # Hybrid queries still get this scope's keyword ranking
+                per_query = [[] for _ in members]
+                for i in members:
+                    complete[i] = False
+
+            for i, scope_hits in zip(members, per_query, strict=True):
+                scope_hits = scope_hits[:fetch[i]]
+                if (i, coll_scope) in lexical:
+                    try:
+                        keyword = lexical[i, coll_scope].result(timeout=max(0, deadline - time.monotonic()))
+                    except FutureTimeoutError:
+                        logging.warning(f"Search of scope {coll_scope} timed out after {SEARCH_SCOPE_TIMEOUT:.1f}s")
+                        _abandon(coll_scope, lexical[i, coll_scope])
+                        complete[i] = False
+                        continue
+                    except Exception as e:
+                        logging.warning(f"Lexical search failed ({coll_scope}): {e}")
+                        keyword = []
+                        complete[i] = False
+                    try:
+                        scope_hits = _fuse_hits(coll, scope_hits, keyword)
+                    except Exception:
+                        complete[i] = False
+                        continue
+                for hit in scope_hits:
+                    hit["scope"] = coll_scope
+                ranked[i].append(scope_hits)
+
+    return [
+        (list(islice(heapq.merge(*ranked[i], key=lambda hit: hit["score"], reverse=True), q["n_results"])), complete[i])
+        for i, q in enumerate(queries)
+    ]
+
+
+def _exact_lookup(coll, candidates: list[str], n_results: int, memory_type: Optional[str]) -> tuple:
+    """One scope's trigram lookup: (IDs best first, their documents, the candidate that matched)"""
+    for candidate in candidates:
+        ids = coll.exact_query(candidate, n_results, memory_type)
+        if ids:
+            return ids, coll.get(ids=ids, include=["documents", "metadatas"]), candidate
+    return [], None, None
+
+
+def _exact_hits(collections: list, needle: str, n_results: int, memory_type: Optional[str],
+                deadline: float) -> tuple[list[dict], bool]:
+    """
+    Documents or sources containing an identifier or path, from the trigram index
+    (no embedding). Case-sensitive matches score 1.0 and come first, others 0.9.
+    Scopes are looked up concurrently until deadline (time.monotonic()): a first
+    lookup may have to build the index. Returns (hits, every scope answered).
+    """
+    candidates = [needle]
+    if needle.startswith("~"):
+        candidates.append(os.path.expanduser(needle))  # Sources are stored as absolute paths
+
+    collections, complete = _responsive(collections)
+    lookups = [
+        (order, coll_scope, _search_pool.submit(_exact_lookup, coll, candidates, n_results, memory_type))
+        for order, (coll, coll_scope) in enumerate(collections)
+        if getattr(coll, "exact_query", None) is not None
+    ]
+    ranked = []  # (score, rank, scope order, hit)
+    for order, coll_scope, future in lookups:
+        try:
+            ids, found, candidate = future.result(timeout=max(0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            logging.warning(f"Exact lookup in scope {coll_scope} timed out after {SEARCH_SCOPE_TIMEOUT:.1f}s")
+            _abandon(coll_scope, future)
+            complete = False
+            continue
+        except Exception as e:
+            logging.warning(f"Exact lookup failed ({coll_scope}): {e}")
+            complete = False
+            continue
+        if not ids:
+            continue
+        rank = {doc_id: i for i, doc_id in enumerate(ids)}
+        for doc_id, doc, meta in zip(found["ids"], found["documents"], found["metadatas"], strict=True):
+            meta = meta or {}
+            text = f"{doc}\n{meta.get('source', '')}"
+            score = 1.0 if candidate in text else 0.9
+            hit = {"id": doc_id, "document": doc, "metadata": meta, "score": score, "scope": coll_scope, "exact": True}
+            ranked.append((-score, rank[doc_id], order, hit))
+
+    ranked.sort(key=lambda entry: entry[:3])
+    return [entry[3] for entry in ranked[:n_results]], complete
+
+
+def search_memories_batch(queries: list[dict], scope: str = SCOPE_ALL) -> list[list[dict]]:
+    """
+    Search several queries ({query, n_results, memory_type, mode}) in one pass.
+    Returns one hit list ({id, document, metadata, score, scope}, best first) per
+    query. Cached queries are answered from the search cache; the others are
+    embedded together and sent to each scope as multi-query calls. Queries that
+    look like an identifier or path are first looked up in the trigram index;
+    only those without an exact match fall back to embeddings.
+    """
+    collections = get_collections_for_scope(scope)
+    generations = tuple(getattr(coll, "generation", lambda: None)() for coll, _ in collections)
+    needles = [looks_like_identifier(q["query"]) for q in queries]
+    results = [None] * len(queries)
+    keys = [None] * len(queries)
+    if None not in generations:
+        for i, q in enumerate(queries):
+            # Exact lookups rank case-sensitive matches first: the raw needle keeps
+            # SYNC_STATE_FILE and sync_state_file apart in the casefolded key
+            keys[i] = _search_cache.key(q["query"], needles[i], scope, q["memory_type"], q["n_results"], q["mode"], generations)
+            results[i] = _search_cache.get(keys[i])
+
+    # Identifiers and paths: exact substring matches answer without embeddings
+    deadline = time.monotonic() + SEARCH_SCOPE_TIMEOUT  # Shared by the exact lookups of every query
+    missing = []
+    partial = set()  # Queries whose exact lookup missed a scope
+    for i, hits in enumerate(results):
+        if hits is None and needles[i]:
+            q = queries[i]
+            hits, complete = _exact_hits(collections, needles[i], q["n_results"], q["memory_type"], deadline)
+            if not complete:
+                partial.add(i)
+            if hits:
+                results[i] = hits
+                if keys[i] and complete:
+                    _search_cache.put(keys[i], hits)
+        if results[i] is None:
+            missing.append(i)
+
+    if missing:
+        answers = _search_collections(collections, [queries[i] for i in missing])
+        for i, (hits, complete) in zip(missing, answers, strict=True):
+            results[i] = hits
+            # Partial results (a scope timed out or failed) are not worth remembering
+            if keys[i] and complete and i not in partial:
+                _search_cache.put(keys[i], hits)
+    return results
+
+
+def search_memories(query: str, n_results: int = 3, memory_type: Optional[str] = None,
+                    scope: str = SCOPE_ALL, mode: str = SEARCH_MODE_VECTOR) -> list[dict]:
+    """
+    Search the collections of a scope concurrently. Returns hits ({id, document,
+    metadata, score, scope}), best first. In hybrid mode the BM25 lookups run
+    while the query is embedded, and still answer if the embedding backend is down.
+    Scopes that miss the SEARCH_SCOPE_TIMEOUT budget or fail are left out (hybrid
+    queries keep their keyword hits).
+    Results are cached until one of the collections is written to: a cache hit
+    skips both the embedding and the index lookups.
+    """
+    query = {"query": query, "n_results": n_results, "memory_type": memory_type, "mode": mode}
+    return search_memories_batch([query], scope)[0]
+
+
+def format_hit(number: int, hit: dict, compact: bool = False) -> str:
+    """One search result as shown by rag_search"""
+    doc, meta, score = hit["document"], hit["metadata"], hit["score"]
+    source = meta.get("source", "unknown")
+    mem_type = meta.get("memory_type", "")
+    type_str = f" [{mem_type}]" if mem_type else ""
+    scope_str = " 🌐" if hit["scope"] == "global" else " 📁"
+
+    if compact:
+        # Compact mode: just title/first line (~50-60 chars)
+        title = doc.split('\n')[0][:60].strip()
+        if len(doc.split('\n')[0]) > 60:
+            title += "..."
+        source_short = source.split('/')[-1] if '/' in source else source
+        return f"[{number}]{scope_str}{type_str} {title} ({source_short})\n"
+    # Normal mode: full details
+    score_str = "Exact match" if hit.get("exact") else f"Score: {score:.3f}"
+    return f"[{number}]{scope_str} {score_str}{type_str} | Source: {source}\n    {doc[:300]}...\n\n"
 
 
 @server.list_tools()
@@ -485,14 +1390,59 @@ async def list_tools():
                         "type": "boolean",
                         "description": "Return compact results (title only, ~50 chars) to save tokens. Recommended for Claude Pro users. Default: false",
                         "default": False
+                    },
+                    "mode": {
+                        "type": "string",
+                        "description": "'vector' (semantic, default) or 'hybrid' (semantic + keyword BM25, better for identifiers, file paths and error messages)",
+                        "enum": ["vector", "hybrid"],
+                        "default": "vector"
                     }
                 },
                 "required": ["query"]
             }
         ),
+        Tool(
+            name="rag_search_batch",
+            description="Run several searches in one call (e.g. a decision, the related bugfix and a snippet). Queries are embedded together and results are grouped per query; a memory already returned for an earlier query is not repeated.",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "description": f"Searches to run (max {MAX_BATCH_QUERIES})",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "query": {"type": "string", "description": "What you're looking for"},
+                                "n_results": {"type": "integer", "description": "Results for this query (default: 3)", "default": 3},
+                                "memory_type": {
+                                    "type": "string",
+                                    "description": "Filter by memory type",
+                                    "enum": ["context", "decision", "bugfix", "architecture", "preference", "snippet"]
+                                },
+                                "mode": {"type": "string", "enum": ["vector", "hybrid"], "default": "vector"}
+                            },
+                            "required": ["query"]
+                        }
+                    },
+                    "scope": {
+                        "type": "string",
+                        "description": "Memory scope for every query: 'project', 'global' or 'all' (default)",
+                        "enum": ["project", "global", "all"],
+                        "default": "all"
+                    },
+                    "compact": {
+                        "type": "boolean",
+                        "description": "Return compact results (title only) to save tokens. Default: false",
+                        "default": False
+                    }
+                },
+                "required": ["queries"]
+            }
+        ),
         Tool(
             name="rag_index",
-            description="Index a file or directory into the RAG memory. Use this after modifying CLAUDE.md or adding new documentation.",
+            description="Index a file or directory into the RAG memory. Only new or modified files are re-embedded; chunks of deleted files are removed. Directories honor .gitignore/.ragignore and skip node_modules, .venv, .git and build output. Use this after modifying CLAUDE.md or adding new documentation.",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -505,6 +1455,11 @@ async def list_tools():
                         "description": "Memory scope: 'project' (default) or 'global' (system-wide knowledge)",
                         "enum": ["project", "global"],
                         "default": "project"
+                    },
+                    "force": {
+                        "type": "boolean",
+                        "description": "Reindex every file even if unchanged since the last index",
+                        "default": False
                     }
                 },
                 "required": ["path"]
@@ -663,7 +1618,7 @@ async def list_tools():
         ),
         Tool(
             name="rag_capture",
-            description="Auto-capture memories from recent Claude Code sessions. Parses session files and extracts decisions, bugfixes, architecture choices, etc.",
+            description="Auto-capture memories from recent Claude Code sessions of the current project. Parses session files and extracts decisions, bugfixes, architecture choices, etc. Only lines added since the last capture are read.",
             inputSchema={
                 "type": "object",
                 "properties": {
@@ -687,6 +1642,26 @@ async def list_tools():
                         "description": "Memory scope: 'project' (default) or 'global'",
                         "enum": ["project", "global"],
                         "default": "project"
+                    },
+                    "rescan": {
+                        "type": "boolean",
+                        "description": "Re-read sessions from the start instead of resuming from saved checkpoints (default: false)",
+                        "default": False
+                    },
+                    "all": {
+                        "type": "boolean",
+                        "description": "Backfill: capture every session instead of the most recent max_sessions (default: false)",
+                        "default": False
+                    },
+                    "jobs": {
+                        "type": "integer",
+                        "description": "Parallel session parser processes (default: 1, or RAG_CAPTURE_JOBS with all=true; at most one per CPU)",
+                        "minimum": 1
+                    },
+                    "all_projects": {
+                        "type": "boolean",
+                        "description": "Capture sessions of every Claude Code project, not just the current one (default: false)",
+                        "default": False
                     }
                 }
             }
@@ -783,9 +1758,8 @@ async def list_tools():
     ]
 
 
-@server.call_tool()
-async def call_tool(name: str, arguments: dict):
-    """Handle tool calls"""
+def handle_tool(name: str, arguments: dict) -> list:
+    """Handle tool calls (blocking - runs in a worker thread, see call_tool)"""
 
     if name == "rag_search":
         query = arguments.get("query", "")
@@ -793,6 +1767,7 @@ async def call_tool(name: str, arguments: dict):
         memory_type = arguments.get("memory_type")
         scope = arguments.get("scope", SCOPE_ALL)
         compact = arguments.get("compact", False)
+        mode = arguments.get("mode", SEARCH_MODE_VECTOR)
 
         # Security: validate inputs
         if not query:
@@ -805,69 +1780,84 @@ async def call_tool(name: str, arguments: dict):
             return [TextContent(type="text", text=f"Error: invalid scope (must be one of: {', '.join(VALID_SCOPES)})")]
         if memory_type and memory_type not in VALID_MEMORY_TYPES:
             return [TextContent(type="text", text=f"Error: invalid memory_type (must be one of: {', '.join(VALID_MEMORY_TYPES)})")]
+        if mode not in VALID_SEARCH_MODES:
+            return [TextContent(type="text", text=f"Error: invalid mode (must be one of: {', '.join(sorted(VALID_SEARCH_MODES))})")]
 
         try:
             start = time.time()
-            query_embedding = get_embedding(query)
+            hits = search_memories(query, n_results, memory_type, scope, mode)
 
-            # Build where filter if memory_type specified
-            where_filter = None
+            warnings = dimension_warnings(scope)
+            if not hits:
+                filter_msg = f" (type: {memory_type})" if memory_type else ""
+                return [TextContent(type="text", text=f"{warnings}No results found{filter_msg}.")]
+
+            output = warnings + f"Search completed in {time.time()-start:.2f}s (scope: {scope})"
+            if mode != SEARCH_MODE_VECTOR:
+                output += f" (mode: {mode})"
             if memory_type:
-                where_filter = {"memory_type": memory_type}
+                output += f" (type: {memory_type})"
+            output += "\n\n"
 
-            # Collect results from all relevant collections
-            all_results = []
-            collections = get_collections_for_scope(scope)
+            for i, hit in enumerate(hits):
+                output += format_hit(i + 1, hit, compact)
 
-            for coll, coll_scope in collections:
-                try:
-                    results = coll.query(
-                        query_embeddings=[query_embedding],
-                        n_results=n_results * 2,
-                        where=where_filter
-                    )
-                    if results["documents"][0]:
-                        for doc, meta, dist in zip(
-                            results["documents"][0],
-                            results["metadatas"][0],
-                            results["distances"][0]
-                        ):
-                            meta["_scope"] = coll_scope
-                            all_results.append((doc, meta, dist))
-                except Exception:
-                    continue
+            return [TextContent(type="text", text=output)]
 
-            if not all_results:
-                filter_msg = f" (type: {memory_type})" if memory_type else ""
-                return [TextContent(type="text", text=f"No results found{filter_msg}.")]
+        except requests.exceptions.ConnectionError:
+            return [TextContent(type="text", text="Error: Ollama not running. Start with: systemctl start ollama")]
+        except Exception as e:
+            return [TextContent(type="text", text=f"Error: {str(e)}")]
 
-            # Sort by distance (lower is better)
-            all_results.sort(key=lambda x: x[2])
+    elif name == "rag_search_batch":
+        queries = arguments.get("queries")
+        scope = arguments.get("scope", SCOPE_ALL)
+        compact = arguments.get("compact", False)
 
-            output = f"Search completed in {time.time()-start:.2f}s (scope: {scope})"
-            if memory_type:
-                output += f" (type: {memory_type})"
-            output += "\n\n"
+        # Security: validate inputs
+        if not isinstance(queries, list) or not queries:
+            return [TextContent(type="text", text="Error: queries must be a non-empty list")]
+        if len(queries) > MAX_BATCH_QUERIES:
+            return [TextContent(type="text", text=f"Error: too many queries (max {MAX_BATCH_QUERIES})")]
+        if scope not in VALID_SCOPES:
+            return [TextContent(type="text", text=f"Error: invalid scope (must be one of: {', '.join(VALID_SCOPES)})")]
 
-            for i, (doc, meta, dist) in enumerate(all_results[:n_results]):
-                score = 1 - dist
-                source = meta.get("source", "unknown")
-                mem_type = meta.get("memory_type", "")
-                mem_scope = meta.get("_scope", "")
-                type_str = f" [{mem_type}]" if mem_type else ""
-                scope_str = f" 🌐" if mem_scope == "global" else " 📁"
-
-                if compact:
-                    # Compact mode: just title/first line (~50-60 chars)
-                    title = doc.split('\n')[0][:60].strip()
-                    if len(doc.split('\n')[0]) > 60:
-                        title += "..."
-                    source_short = source.split('/')[-1] if '/' in source else source
-                    output += f"[{i+1}]{scope_str}{type_str} {title} ({source_short})\n"
-                else:
-                    # Normal mode: full details
-                    output += f"[{i+1}]{scope_str} Score: {score:.3f}{type_str} | Source: {source}\n"
-                    output += f"    {doc[:300]}...\n\n"
+        batch = []
+        for i, item in enumerate(queries, start=1):
+            if isinstance(item, str):
+                item = {"query": item}
+            if not isinstance(item, dict) or not item.get("query") or not isinstance(item["query"], str):
+                return [TextContent(type="text", text=f"Error: query {i} is missing its text")]
+            if len(item["query"]) > MAX_QUERY_LENGTH:
+                return [TextContent(type="text", text=f"Error: query {i} too long (max {MAX_QUERY_LENGTH} chars)")]
+            n_results = item.get("n_results", 3)
+            if not isinstance(n_results, int) or n_results < 1 or n_results > MAX_RESULTS:
+                n_results = min(max(1, int(n_results) if isinstance(n_results, (int, float)) else 3), MAX_RESULTS)
+            memory_type = item.get("memory_type")
+            if memory_type and memory_type not in VALID_MEMORY_TYPES:
+                return [TextContent(type="text", text=f"Error: query {i} has an invalid memory_type (must be one of: {', '.join(VALID_MEMORY_TYPES)})")]
+            mode = item.get("mode", SEARCH_MODE_VECTOR)
+            if mode not in VALID_SEARCH_MODES:
+                return [TextContent(type="text", text=f"Error: query {i} has an invalid mode (must be one of: {', '.join(sorted(VALID_SEARCH_MODES))})")]
+            batch.append({"query": item["query"], "n_results": n_results, "memory_type": memory_type or None, "mode": mode})
+
+        try:
+            start = time.time()
+            results = search_memories_batch(batch, scope)
+
+            output = dimension_warnings(scope) + f"Batch of {len(batch)} searches completed in {time.time()-start:.2f}s (scope: {scope})\n"
+            seen = set()  # (scope, id) already shown for an earlier query
+            for i, (q, hits) in enumerate(zip(batch, results, strict=True), start=1):
+                filters = f" [{q['memory_type']}]" if q["memory_type"] else ""
+                output += f"\n## {i}. {q['query'][:80]}{filters}\n"
+                fresh = [hit for hit in hits if (hit["scope"], hit["id"]) not in seen]
+                if not hits:
+                    output += "No results found.\n"
+                for j, hit in enumerate(fresh, start=1):
+                    seen.add((hit["scope"], hit["id"]))
+                    output += format_hit(j, hit, compact)
+                if len(fresh) < len(hits):
+                    output += f"({len(hits) - len(fresh)} result(s) already shown above)\n"
 
             return [TextContent(type="text", text=output)]
 
@@ -879,6 +1869,7 @@ async def call_tool(name: str, arguments: dict):
     elif name == "rag_index":
         path_str = arguments.get("path", "")
         scope = arguments.get("scope", SCOPE_PROJECT)
+        force = arguments.get("force", False)
 
         # Security: validate inputs
         if not path_str:
@@ -895,64 +1886,18 @@ async def call_tool(name: str, arguments: dict):
             if not path.exists():
                 return [TextContent(type="text", text="Error: path not found or not accessible")]
 
-            start = time.time()
-            collection = get_collection(scope)
-            total_chunks = 0
-            indexed_files = []
-
-            # Find all supported files
-            if path.is_dir():
-                files = []
-                for ext in SUPPORTED_EXTENSIONS:
-                    files.extend(path.glob(f"**/*{ext}"))
-            else:
-                files = [path]
-
-            for filepath in files:
-                ext = filepath.suffix.lower()
-                file_type = SUPPORTED_EXTENSIONS.get(ext, "text")
+            result = index_path(path, scope, force=force)
 
-                try:
-                    content = filepath.read_text()
-                except UnicodeDecodeError:
-                    continue  # Skip binary files
-
-                doc_id = hashlib.md5(str(filepath).encode()).hexdigest()[:8]
-                file_hash = hashlib.md5(content.encode()).hexdigest()[:8]
-
-                # Smart chunking based on file type
-                chunks = chunk_content(content, file_type)
-
-                ids = [f"{doc_id}_{i}" for i in range(len(chunks))]
-                # Batch embeddings for performance
-                embeddings = get_embeddings_batch([c["text"] for c in chunks])
-                metadatas = [{
-                    "source": str(filepath),
-                    "file_type": file_type,
-                    "file_hash": file_hash,
-                    "chunk_index": i,
-                    "chunk_type": c["type"],
-                    "indexed_at": datetime.now().isoformat()
-                } for i, c in enumerate(chunks)]
-
-                collection.upsert(
-                    ids=ids,
-                    embeddings=embeddings,
-                    documents=[c["text"] for c in chunks],
-                    metadatas=metadatas
-                )
-                total_chunks += len(chunks)
-                indexed_files.append(f"{filepath.name} ({len(chunks)} chunks)")
-
-            elapsed = time.time() - start
+            indexed_files = result["files"]
             files_list = "\n".join(f"  - {f}" for f in indexed_files[:10])
             if len(indexed_files) > 10:
                 files_list += f"\n  ... and {len(indexed_files) - 10} more"
 
             scope_icon = "🌐" if scope == SCOPE_GLOBAL else "📁"
+            summary = f"{result['updated']} updated, {result['skipped']} unchanged, {result['removed']} removed"
             return [TextContent(
                 type="text",
-                text=f"{scope_icon} Indexed {len(indexed_files)} file(s) to {scope}: {total_chunks} chunks in {elapsed:.2f}s\n\n{files_list}"
+                text=f"{scope_icon} Indexed {len(indexed_files)} file(s) to {scope}: {result['chunks']} chunks in {result['elapsed']:.2f}s ({summary})\n\n{files_list}"
             )]
 
         except requests.exceptions.ConnectionError:
@@ -1023,6 +1968,7 @@ async def call_tool(name: str, arguments: dict):
             for s in scopes_to_check:
                 try:
                     coll = get_collection(s)
+                    output += dimension_warnings(s)
                     count = coll.count()
                     total_count += count
 
@@ -1054,10 +2000,43 @@ async def call_tool(name: str, arguments: dict):
             output += f"  - Misses: {cache_stats['misses']}\n"
             output += f"  - Hit rate: {cache_stats['hit_rate']}\n"
             output += f"  - Cached embeddings: {cache_stats['cache_size']}\n"
+            output += f"  - Memory: {cache_stats['resident_bytes'] / 1024 / 1024:.1f} / {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB\n"
+            output += f"  - Evictions: {cache_stats['evictions']}\n"
+            disk_stats = cache_stats["disk"]
+            output += "\n**Persistent cache**:\n"
+            output += f"  - Hits: {disk_stats['hits']}\n"
+            output += f"  - Misses: {disk_stats['misses']}\n"
+            output += f"  - Hit rate: {disk_stats['hit_rate']}\n"
+            output += f"  - Entries: {disk_stats['entries']} / {disk_stats['max_entries']}\n"
+            output += f"  - Evictions: {disk_stats['evictions']}\n"
+            output += f"  - Size: {disk_stats['size_bytes'] / 1024 / 1024:.1f} MB\n"
+
+            watch_status = get_watch_status()
+            if watch_status:
+                output += f"\n**Watcher** ({watch_status['mode']}, pid {watch_status['pid']}):\n"
+                output += f"  - Queue depth: {watch_status['queue_depth']}\n"
+                output += f"  - Lag: {watch_status['lag']:.1f}s\n"
+                output += f"  - Files reindexed: {watch_status['processed']} in {watch_status['batches']} batches\n"
+                output += f"  - Errors: {watch_status['errors']}\n"
+
+            search_stats = _search_cache.stats()
+            output += "\n**Search cache**:\n"
+            output += f"  - Hits: {search_stats['hits']}\n"
+            output += f"  - Misses: {search_stats['misses']}\n"
+            output += f"  - Hit rate: {search_stats['hit_rate']}\n"
+            output += f"  - Cached queries: {search_stats['entries']} / {search_stats['max_entries']}\n"
+
+            if _follower:
+                follow = _follower.stats()
+                output += f"\n**Session follower** (every {follow['interval']:.0f}s):\n"
+                output += f"  - Memories captured: {follow['captured']} ({follow['duplicates']} near-duplicates dropped)\n"
+                if follow["last_capture"]:
+                    ago = time.time() - follow["last_capture"]["at"]
+                    output += f"  - Last capture: {ago:.0f}s ago from {follow['last_capture']['sessions']} session(s)\n"
+                output += f"  - Errors: {follow['errors']}\n"
 
             # Add DB size on disk
             try:
-                import shutil
                 db_size = sum(
                     sum(os.path.getsize(os.path.join(dirpath, f)) for f in filenames)
                     for dirpath, _, filenames in os.walk(CHROMA_PATH)
@@ -1078,7 +2057,7 @@ async def call_tool(name: str, arguments: dict):
 
     elif name == "rag_health":
         try:
-            health = check_ollama_health()
+            health = check_embedding_health()
 
             if not health["ok"]:
                 return [TextContent(type="text", text=f"❌ RAG Health Check FAILED\n\nError: {health['error']}")]
@@ -1089,7 +2068,7 @@ async def call_tool(name: str, arguments: dict):
 
             return [TextContent(
                 type="text",
-                text=f"✅ RAG Health Check OK\n\n- Ollama: running\n- Model: {EMBED_MODEL}\n- Project: {PROJECT_PATH}\n- 📁 Project memories: {project_count}\n- 🌐 Global memories: {global_count}\n- Database: {CHROMA_PATH}"
+                text=f"✅ RAG Health Check OK\n\n- Backend: {health['backend']}\n- Model: {health['model']}\n- Project: {PROJECT_PATH}\n- 📁 Project memories: {project_count}\n- 🌐 Global memories: {global_count}\n- Database: {CHROMA_PATH}"
             )]
 
         except Exception as e:
@@ -1233,47 +2212,30 @@ async def call_tool(name: str, arguments: dict):
         min_confidence = arguments.get("min_confidence", 0.7)
         dry_run = arguments.get("dry_run", False)
         scope = arguments.get("scope", SCOPE_PROJECT)
+        rescan = arguments.get("rescan", False)
+        backfill = arguments.get("all", False)
+        all_projects = arguments.get("all_projects", False)
+        jobs = arguments.get("jobs", CAPTURE_JOBS if backfill else 1)
 
-        try:
-            collection = get_collection(scope)
-            captured = []
-            skipped = 0
-
-            for memory in parse_recent_sessions(max_sessions=max_sessions):
-                if memory.confidence < min_confidence:
-                    skipped += 1
-                    continue
+        # Security: one parser process per job, so keep it to the available CPUs
+        if not isinstance(jobs, int) or jobs < 1 or jobs > MAX_CAPTURE_JOBS:
+            jobs = min(max(1, int(jobs) if isinstance(jobs, (int, float)) else 1), MAX_CAPTURE_JOBS)
 
-                if dry_run:
-                    captured.append({
-                        "type": memory.memory_type,
-                        "confidence": memory.confidence,
-                        "content": memory.content[:100] + "...",
-                        "tags": memory.tags
-                    })
-                else:
-                    # Store in RAG
-                    doc_id = hashlib.md5(f"{memory.content}{memory.timestamp}".encode()).hexdigest()[:12]
-                    embedding = get_embedding(memory.content)
-                    metadata = {
-                        "source": f"session:{memory.source}",
-                        "memory_type": memory.memory_type,
-                        "tags": ",".join(memory.tags) if memory.tags else "",
-                        "confidence": str(memory.confidence),
-                        "indexed_at": datetime.now().isoformat(),
-                        "auto_captured": "true"
-                    }
-
-                    collection.upsert(
-                        ids=[doc_id],
-                        embeddings=[embedding],
-                        documents=[memory.content],
-                        metadatas=[metadata]
-                    )
-                    captured.append({
-                        "type": memory.memory_type,
-                        "id": doc_id
-                    })
+        try:
+            # Resume each session where the last capture stopped (session files are append-only)
+            checkpoints = load_checkpoints(scope, rescan)
+            sessions = find_capture_sessions(checkpoints, None if backfill else max_sessions, all_projects)
+            if sessions is None:
+                where = "any project" if all_projects else f"project {PROJECT_PATH} (try all_projects=true)"
+                return [TextContent(type="text", text=f"No Claude Code sessions found for {where}")]
+            if not sessions:
+                return [TextContent(type="text", text="✅ Nothing new to capture since the last run")]
+
+            result = capture_sessions(
+                sessions, scope=scope, min_confidence=min_confidence, dry_run=dry_run,
+                checkpoints=checkpoints, jobs=jobs
+            )
+            captured, skipped = result["captured"], result["skipped"]
 
             if dry_run:
                 output = f"🔍 DRY RUN - Would capture {len(captured)} memories (skipped {skipped} below confidence {min_confidence}):\n\n"
@@ -1289,7 +2251,7 @@ async def call_tool(name: str, arguments: dict):
                     if mem['tags']:
                         output += f"  Tags: {', '.join(mem['tags'])}\n"
             else:
-                output = f"✅ Captured {len(captured)} memories from {max_sessions} session(s) (skipped {skipped}):\n\n"
+                output = f"✅ Captured {len(captured)} memories from {result['sessions']} session(s) (skipped {skipped}, {result['existing']} already stored, {result['duplicates']} near-duplicates):\n\n"
                 by_type = {}
                 for mem in captured:
                     t = mem["type"]
@@ -1319,78 +2281,8 @@ async def call_tool(name: str, arguments: dict):
             paths = [os.path.expanduser(p) for p in paths]
 
         try:
-            collection = get_collection(scope)
-            sync_state = get_sync_state()
-            updated = []
-            skipped = []
-            not_found = []
-
-            for filepath in paths:
-                if not os.path.exists(filepath):
-                    not_found.append(filepath)
-                    continue
-
-                # Get current file hash
-                current_hash = get_file_hash(filepath)
-                state_key = f"{scope}:{filepath}"
-                stored_hash = sync_state.get(state_key, {}).get("hash")
-
-                # Skip if unchanged (unless force)
-                if not force and current_hash == stored_hash:
-                    skipped.append(filepath)
-                    continue
-
-                # Delete old chunks for this file (clean reindex)
-                source_pattern = f"file:{filepath}"
-                try:
-                    existing = collection.get(
-                        where={"source": source_pattern},
-                        include=["metadatas"]
-                    )
-                    if existing["ids"]:
-                        collection.delete(ids=existing["ids"])
-                except Exception:
-                    pass  # Collection might not have where filter support
-
-                # Read and chunk the file
-                content = Path(filepath).read_text()
-                ext = Path(filepath).suffix.lower()
-                file_type = SUPPORTED_EXTENSIONS.get(ext, "text")
-                chunks = chunk_content(content, file_type)
-
-                # Batch embeddings for performance
-                chunk_texts = [chunk["text"] for chunk in chunks]
-                embeddings = get_embeddings_batch(chunk_texts)
-
-                # Index all chunks at once
-                ids = [generate_chunk_id(chunk["text"], filepath, i) for i, chunk in enumerate(chunks)]
-                metadatas = [{
-                    "source": source_pattern,
-                    "file_type": file_type,
-                    "memory_type": "context",
-                    "chunk_index": str(i),
-                    "file_hash": current_hash[:16],
-                    "indexed_at": datetime.now().isoformat()
-                } for i in range(len(chunks))]
-
-                collection.upsert(
-                    ids=ids,
-                    embeddings=embeddings,
-                    documents=chunk_texts,
-                    metadatas=metadatas
-                )
-                chunk_count = len(chunks)
-
-                # Update sync state
-                sync_state[state_key] = {
-                    "hash": current_hash,
-                    "indexed_at": datetime.now().isoformat(),
-                    "chunks": chunk_count
-                }
-                updated.append({"path": filepath, "chunks": chunk_count})
-
-            # Save sync state
-            save_sync_state(sync_state)
+            result = sync_paths(paths, scope=scope, force=force)
+            updated, skipped, not_found = result["updated"], result["skipped"], result["not_found"]
 
             # Build output
             output = f"🔄 Sync completed (scope: {scope})\n\n"
@@ -1398,7 +2290,7 @@ async def call_tool(name: str, arguments: dict):
             if updated:
                 output += f"**Updated ({len(updated)}):**\n"
                 for item in updated:
-                    output += f"  ✅ {item['path']} ({item['chunks']} chunks)\n"
+                    output += f"  ✅ {item['path']} ({item['chunks']} chunks, {item['embedded']} re-embedded)\n"
                 output += "\n"
 
             if skipped:
@@ -1843,6 +2735,9 @@ async def call_tool(name: str, arguments: dict):
             total_count = sum(counts.values())
 
             if total_count == 0:
+                if confirm:
+                    for s in scopes_to_clear:
+                        SessionCheckpoints.clear(checkpoint_namespace(s))
                 return [TextContent(type="text", text="Database is already empty.")]
 
             if not confirm:
@@ -1866,6 +2761,10 @@ async def call_tool(name: str, arguments: dict):
                 except Exception:
                     pass
 
+            # Sessions captured into the cleared scopes are unread again
+            for s in scopes_to_clear:
+                SessionCheckpoints.clear(checkpoint_namespace(s))
+
             # Clear sync state for cleared scopes
             try:
                 sync_state = get_sync_state()
@@ -1884,12 +2783,61 @@ async def call_tool(name: str, arguments: dict):
     return [TextContent(type="text", text=f"Unknown tool: {name}")]
 
 
+def _get_tool_semaphore(name: str) -> asyncio.Semaphore:
+    """Per-tool concurrency limit (created lazily inside the running loop)"""
+    if name not in _tool_semaphores:
+        _tool_semaphores[name] = asyncio.Semaphore(TOOL_CONCURRENCY.get(name, DEFAULT_TOOL_CONCURRENCY))
+    return _tool_semaphores[name]
+
+
+@server.call_tool()
+async def call_tool(name: str, arguments: dict):
+    """Handle tool calls without blocking the event loop"""
+    # Bulk tools get their own small pool so they can never starve interactive searches
+    pool = _bulk_tool_pool if name in BULK_TOOLS else _tool_pool
+    async with _get_tool_semaphore(name):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, handle_tool, name, arguments or {})
+
+
+def create_follower(scope: str = SCOPE_PROJECT, all_projects: bool = False) -> SessionFollower:
+    """Follower capturing new session entries in small batches, resuming from the saved checkpoints"""
+    return SessionFollower(
+        lambda paths, checkpoints: capture_sessions(
+            paths, scope=scope, checkpoints=checkpoints, batch_size=CAPTURE_FOLLOW_BATCH
+        ),
+        None if all_projects else PROJECT_PATH, lambda: load_checkpoints(scope)
+    )
+
+
+async def follow_sessions(follower: SessionFollower):
+    """Background task: poll active sessions on a dedicated low-priority thread"""
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rag-follow", initializer=lower_thread_priority)
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            # Never overlap an explicit rag_capture
+            async with _get_tool_semaphore("rag_capture"):
+                await loop.run_in_executor(pool, follower.poll)
+            await asyncio.sleep(follower.interval)
+    finally:
+        pool.shutdown(wait=False)
+
+
 async def main():
     """Run the MCP server"""
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(read_stream, write_stream, server.create_initialization_options())
+    global _follower
+    follow_task = None
+    if CAPTURE_FOLLOW:
+        _follower = create_follower()
+        follow_task = asyncio.create_task(follow_sessions(_follower))
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await server.run(read_stream, write_stream, server.create_initialization_options())
+    finally:
+        if follow_task:
+            follow_task.cancel()
 
 
 if __name__ == "__main__":
-    import asyncio
     asyncio.run(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Claude Code RAG - Session Follower
+Background auto-capture: tails the current project's active session files and
+captures new assistant/summary entries in small batches while they are written,
+so memory stays fresh without a full rag_capture at the start of each session.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from session_parser import SessionCatalog, SessionCheckpoints, get_session_catalog
+
+# Configuration
+CAPTURE_FOLLOW_INTERVAL = float(os.environ.get("RAG_CAPTURE_FOLLOW_INTERVAL", "5"))
+
+# Sessions written to within this window count as active
+CAPTURE_FOLLOW_ACTIVE = 15 * 60
+
+# Memories embedded + upserted per batch (small: each batch is a short burst of work)
+CAPTURE_FOLLOW_BATCH = 8
+
+# Niceness added to the follower thread, so capture yields the CPU to interactive work
+CAPTURE_FOLLOW_NICE = 10
+
+
+def lower_thread_priority(increment: int = CAPTURE_FOLLOW_NICE):
+    """Best effort: lower the calling thread's priority (Linux schedules threads individually)"""
+    if not sys.platform.startswith("linux"):
+        return
+    try:
+        tid = threading.get_native_id()
+        os.setpriority(os.PRIO_PROCESS, tid, os.getpriority(os.PRIO_PROCESS, tid) + increment)
+    except (AttributeError, OSError):
+        pass
+
+
+class SessionFollower:
+    """Captures the unread tail of recently written session files, one poll at a time"""
+
+    def __init__(self, capture: Callable[[list[Path], SessionCheckpoints], dict], project_path: Optional[str],
+                 load_checkpoints: Callable[[], SessionCheckpoints], catalog: Optional[SessionCatalog] = None,
+                 interval: float = CAPTURE_FOLLOW_INTERVAL, active_window: float = CAPTURE_FOLLOW_ACTIVE):
+        self.capture = capture
+        self.project_path = project_path
+        self.load_checkpoints = load_checkpoints  # Reloaded every poll: rag_capture may have moved them
+        self.catalog = catalog or get_session_catalog()
+        self.interval = interval
+        self.active_window = active_window
+        self.polls = 0
+        self.captured = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.last_capture = None
+        self._sizes = {}  # path -> size when last captured
+
+    def active_sessions(self, checkpoints: SessionCheckpoints, now: Optional[float] = None) -> list:
+        """Recently written sessions that grew since the last capture (SessionInfo, newest first)"""
+        now = time.time() if now is None else now
+        return [
+            info for info in self.catalog.sessions(self.project_path, checkpoints)
+            if now - info.mtime <= self.active_window
+            and info.unread > 0
+            and self._sizes.get(info.path) != info.size
+        ]
+
+    def poll(self) -> Optional[dict]:
+        """Capture whatever was appended to active sessions. Returns the capture result, if any"""
+        self.polls += 1
+        try:
+            checkpoints = self.load_checkpoints()
+            active = self.active_sessions(checkpoints)
+            if not active:
+                return None
+            result = self.capture([info.path for info in active], checkpoints)
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"Session follow capture failed: {e}")
+            return None
+
+        # A trailing line still being written stays unread: wait for the file to grow again
+        for info in active:
+            self._sizes[info.path] = info.size
+        self.captured += len(result["captured"])
+        self.duplicates += result.get("duplicates", 0)
+        self.last_capture = {"sessions": len(active), "captured": len(result["captured"]), "at": time.time()}
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "project": self.project_path,
+            "interval": self.interval,
+            "polls": self.polls,
+            "captured": self.captured,
+            "duplicates": self.duplicates,
+            "errors": self.errors,
+            "last_capture": self.last_capture,
+        }
+
+    def run(self, stop: threading.Event, on_capture: Optional[Callable[[dict], None]] = None):
+        """Poll until stop is set (runs in the calling thread, at lowered priority)"""
+        lower_thread_priority()
+        while not stop.is_set():
+            result = self.poll()
+            if result and on_capture:
+                on_capture(result)
+            stop.wait(self.interval)
@@ -3,17 +3,37 @@
 Claude Code Session Parser
 Parses .jsonl session files and extracts meaningful content for RAG indexing.
 """
+import hashlib
 import json
 import logging
+import multiprocessing
+import os
 import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
 from dataclasses import dataclass
 from datetime import datetime
 from typing import Iterator, Optional
 
-# Security constants
-MAX_LINE_SIZE = 1_000_000  # 1MB per line
-MAX_FILE_SIZE = 100_000_000  # 100MB per file
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # Optional speedup: pip install 'claude-code-rag[fast]'
+    _json_loads = json.loads
+
+# Security constants (resource limits: nothing is skipped, work is bounded)
+MAX_LINE_SIZE = 1_000_000  # 1MB buffered per line, longer lines are truncated
+MAX_FILE_SIZE = 100_000_000  # 100MB read per file per pass, the rest resumes from the checkpoint
+READ_BLOCK_SIZE = 64 * 1024
+
+# Near-duplicate sketches: 64-bit SimHash over single words (keeps short
+# restatements within a few bits of each other)
+SIMHASH_BITS = 64
+
+# Where capture remembers how far each session file has been read
+CHROMA_PATH = os.path.expanduser(os.environ.get("CHROMA_PATH", "~/.local/share/claude-memory"))
+SESSION_CHECKPOINT_FILE = os.path.join(CHROMA_PATH, "session_checkpoints.json")
 
 
 @dataclass
@@ -25,6 +45,51 @@ class ExtractedMemory:
     timestamp: str
     confidence: float  # 0-1, how confident we are about the classification
     tags: list[str]
+    simhash: int = 0  # Near-duplicate sketch of content, computed on creation
+
+    def __post_init__(self):
+        if not self.simhash:
+            self.simhash = simhash(self.content)
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the words of text: similar texts differ in few bits"""
+    weights = [0] * SIMHASH_BITS
+    for word in re.findall(r"\w+", text.lower()):
+        h = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=SIMHASH_BITS // 8).digest(), "little")
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+class SimHashIndex:
+    """
+    Finds stored sketches within `distance` bits of a new one without a full scan.
+    Sketches are split into distance + 1 bands: by pigeonhole, two sketches that
+    differ in at most `distance` bits agree on at least one whole band.
+    """
+
+    def __init__(self, distance: int = 4):
+        self.distance = distance
+        bands = distance + 1
+        width = SIMHASH_BITS // bands
+        self._bands = [(i * width, width if i < bands - 1 else SIMHASH_BITS - i * width) for i in range(bands)]
+        self._buckets = [{} for _ in self._bands]
+
+    def _keys(self, sketch: int) -> list[int]:
+        return [sketch >> shift & ((1 << width) - 1) for shift, width in self._bands]
+
+    def find(self, sketch: int) -> Optional[int]:
+        """A stored sketch within distance bits, or None"""
+        for buckets, key in zip(self._buckets, self._keys(sketch), strict=True):
+            for candidate in buckets.get(key, ()):
+                if (candidate ^ sketch).bit_count() <= self.distance:
+                    return candidate
+        return None
+
+    def add(self, sketch: int):
+        for buckets, key in zip(self._buckets, self._keys(sketch), strict=True):
+            buckets.setdefault(key, []).append(sketch)
 
 
 # Patterns for detecting memory types
@@ -67,6 +132,56 @@ SNIPPET_PATTERNS = [
 ]
 
 
+# (type, patterns, confidence), in priority order: the first type with any match wins
+MEMORY_TYPE_RULES = [
+    ("decision", DECISION_PATTERNS, 0.8),
+    ("bugfix", BUGFIX_PATTERNS, 0.8),
+    ("architecture", ARCHITECTURE_PATTERNS, 0.7),
+    ("preference", PREFERENCE_PATTERNS, 0.7),
+    ("snippet", SNIPPET_PATTERNS, 0.6),
+]
+
+
+def _strip_optional_prefix(pattern: str) -> str:
+    """
+    Drop leading optional groups: "(?:we )?(decided|chose)" -> "(decided|chose)".
+    We only ask whether a pattern matches anywhere, and the rest matches wherever
+    the whole does, so this is equivalent - and lets the regex engine skip ahead
+    on the first character instead of trying the prefix at every position.
+    """
+    while pattern.startswith("(?:"):
+        depth = 0
+        for _end, char in enumerate(pattern):
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                depth -= 1
+                if depth == 0:
+                    break
+        rest = pattern[_end + 1:]
+        if not rest.startswith("?") or rest[1:2] in ("?", "+") or not rest[1:]:
+            break
+        pattern = rest[1:]
+    return pattern
+
+
+def compile_classifiers(rules: list) -> list[re.Pattern]:
+    """
+    Compile the rules into alternations of named groups (one group per type, in
+    priority order). classifiers[k] covers the first k + 1 types, so once a type
+    is found, the scan continues looking for higher-priority types only.
+    """
+    groups = [
+        f"(?P<{name}>{'|'.join(f'(?:{_strip_optional_prefix(p)})' for p in patterns)})"
+        for name, patterns, _ in rules
+    ]
+    return [re.compile("|".join(groups[:k + 1])) for k in range(len(groups))]
+
+
+_CLASSIFIERS = compile_classifiers(MEMORY_TYPE_RULES)
+_TYPE_RANK = {name: rank for rank, (name, _, _) in enumerate(MEMORY_TYPE_RULES)}
+
+
 def detect_memory_type(text: str) -> tuple[str, float]:
     """
     Detect the type of memory based on content patterns.
@@ -74,59 +189,307 @@ def detect_memory_type(text: str) -> tuple[str, float]:
     """
     text_lower = text.lower()
 
-    # Check each pattern category
-    for pattern in DECISION_PATTERNS:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            return "decision", 0.8
+    # Single left-to-right scan: search returns the leftmost match, and at that
+    # position the highest-priority type wins (alternatives are tried in order).
+    # Then keep scanning just past it for strictly higher-priority types.
+    best = len(MEMORY_TYPE_RULES)
+    pos = 0
+    while best > 0:
+        match = _CLASSIFIERS[best - 1].search(text_lower, pos)
+        if match is None:
+            break
+        best = _TYPE_RANK[match.lastgroup]
+        pos = match.start() + 1
+
+    if best == len(MEMORY_TYPE_RULES):
+        return "context", 0.5
+    name, _, confidence = MEMORY_TYPE_RULES[best]
+    return name, confidence
+
+
+# Tech keywords to look for (earlier = preferred when a text has more than MAX_TAGS)
+TECH_KEYWORDS = [
+    "python", "javascript", "typescript", "rust", "go", "java",
+    "docker", "kubernetes", "k8s", "nginx", "postgres", "postgresql",
+    "mysql", "redis", "mongodb", "sqlite", "git", "github",
+    "api", "rest", "graphql", "grpc", "http", "https",
+    "linux", "windows", "macos", "ubuntu", "debian", "arch", "cachyos",
+    "npm", "pip", "cargo", "pacman", "apt", "brew",
+    "react", "vue", "angular", "svelte", "nextjs", "fastapi", "flask", "django",
+    "ollama", "rocm", "cuda", "gpu", "cpu", "ram", "nvme", "ssd",
+    "systemd", "grub", "kernel", "bios", "uefi",
+]
+MAX_TAGS = 5
+
+# Optional keyword file (one keyword or phrase per line, # comments) replacing TECH_KEYWORDS
+TAG_KEYWORDS_FILE = os.environ.get("RAG_TAG_KEYWORDS", "")
+
+
+class KeywordMatcher:
+    """Whole-word keyword (and phrase) matching in a single pass over the text's tokens"""
+
+    _token_re = re.compile(r"\w+")
+
+    def __init__(self, keywords: list[str]):
+        self.keywords = list(dict.fromkeys(k.strip().lower() for k in keywords if k.strip()))
+        # first token -> [(tokens, rank)], longest phrase first
+        self._index = {}
+        for rank, keyword in enumerate(self.keywords):
+            tokens = tuple(self._token_re.findall(keyword))
+            if tokens:
+                self._index.setdefault(tokens[0], []).append((tokens, rank))
+        for entries in self._index.values():
+            entries.sort(key=lambda entry: -len(entry[0]))
 
-    for pattern in BUGFIX_PATTERNS:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            return "bugfix", 0.8
+    def find(self, text: str, limit: Optional[int] = None) -> list[str]:
+        """Keywords present in text, in keyword-list order"""
+        tokens = self._token_re.findall(text.lower())
+        found = set()
+        for i, token in enumerate(tokens):
+            for keyword_tokens, rank in self._index.get(token, ()):
+                if len(keyword_tokens) == 1 or tuple(tokens[i:i + len(keyword_tokens)]) == keyword_tokens:
+                    found.add(rank)
+        return [self.keywords[rank] for rank in sorted(found)[:limit]]
 
-    for pattern in ARCHITECTURE_PATTERNS:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            return "architecture", 0.7
 
-    for pattern in PREFERENCE_PATTERNS:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            return "preference", 0.7
+def load_keywords(path: str) -> list[str]:
+    """Read a keyword file (one keyword or phrase per line, # comments)"""
+    with open(os.path.expanduser(path), encoding="utf-8") as f:
+        return [line.split("#", 1)[0].strip() for line in f if line.split("#", 1)[0].strip()]
 
-    for pattern in SNIPPET_PATTERNS:
-        if re.search(pattern, text_lower, re.IGNORECASE):
-            return "snippet", 0.6
 
-    return "context", 0.5
+_tag_matcher: Optional[KeywordMatcher] = None
+
+
+def get_tag_matcher() -> KeywordMatcher:
+    """Keyword matcher built once per process (from RAG_TAG_KEYWORDS if set)"""
+    global _tag_matcher
+    if _tag_matcher is None:
+        keywords = TECH_KEYWORDS
+        if TAG_KEYWORDS_FILE:
+            try:
+                keywords = load_keywords(TAG_KEYWORDS_FILE)
+            except OSError as e:
+                logging.warning(f"Could not read tag keywords from {TAG_KEYWORDS_FILE}: {e}")
+        _tag_matcher = KeywordMatcher(keywords)
+    return _tag_matcher
 
 
 def extract_tags(text: str) -> list[str]:
-    """Extract relevant tags from text"""
-    tags = []
-
-    # Tech keywords to look for
-    tech_keywords = [
-        "python", "javascript", "typescript", "rust", "go", "java",
-        "docker", "kubernetes", "k8s", "nginx", "postgres", "postgresql",
-        "mysql", "redis", "mongodb", "sqlite", "git", "github",
-        "api", "rest", "graphql", "grpc", "http", "https",
-        "linux", "windows", "macos", "ubuntu", "debian", "arch", "cachyos",
-        "npm", "pip", "cargo", "pacman", "apt", "brew",
-        "react", "vue", "angular", "svelte", "nextjs", "fastapi", "flask", "django",
-        "ollama", "rocm", "cuda", "gpu", "cpu", "ram", "nvme", "ssd",
-        "systemd", "grub", "kernel", "bios", "uefi",
-    ]
+    """Extract relevant tags from text (whole words only: "go" does not match "good")"""
+    return get_tag_matcher().find(text, MAX_TAGS)
+
+
+# Raw markers of the only lines memories come from (assistant text, summaries).
+# Lines without them (user turns, tool results, progress...) are never decoded.
+ASSISTANT_MARKER = b'"assistant"'
+TEXT_MARKER = b'"text"'
+SUMMARY_MARKER = b'"summary"'
 
-    text_lower = text.lower()
-    for keyword in tech_keywords:
-        if keyword in text_lower:
-            tags.append(keyword)
 
-    return tags[:5]  # Limit to 5 tags
+def _may_contain_memory(line: bytes) -> bool:
+    """Cheap byte-level check before json decoding (false positives are fine)"""
+    return SUMMARY_MARKER in line or (ASSISTANT_MARKER in line and TEXT_MARKER in line)
 
 
-def parse_session_file(filepath: Path) -> Iterator[ExtractedMemory]:
+class SessionCheckpoints:
+    """
+    Per-file read positions {path: {"inode", "size", "offset"}}, so capture only
+    reads what was appended to a session since the last run.
+    Positions are kept per namespace (the collection captured into), so what one
+    scope captured is still unread for another.
+    Positions advance in memory while parsing; save() persists them once the
+    caller has stored the memories.
+    """
+
+    def __init__(self, path: str = SESSION_CHECKPOINT_FILE, entries: Optional[dict] = None, namespace: str = ""):
+        self.path = path
+        self.namespace = namespace
+        self.entries = entries or {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str = SESSION_CHECKPOINT_FILE, namespace: str = "") -> "SessionCheckpoints":
+        return cls(path, cls._read(path).get(namespace, {}), namespace)
+
+    @staticmethod
+    def _read(path: str) -> dict:
+        """{namespace: {path: entry}}. Files from before namespaces ({path: entry}) can't be attributed: dropped"""
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if not isinstance(data, dict):
+            return {}
+        return {
+            namespace: entries for namespace, entries in data.items()
+            if isinstance(entries, dict) and "offset" not in entries
+        }
+
+    @classmethod
+    def _write(cls, path: str, data: dict):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def clear(cls, namespace: str, path: str = SESSION_CHECKPOINT_FILE):
+        """Forget every position of a namespace (its collection was wiped: sessions are unread again)"""
+        data = cls._read(path)
+        if data.pop(namespace, None) is not None:
+            cls._write(path, data)
+
+    def start_offset(self, filepath: Path, stat: os.stat_result) -> int:
+        """Where to resume reading, or 0 if the file was rotated or truncated"""
+        with self._lock:
+            entry = self.entries.get(str(filepath))
+        if not entry or entry.get("inode") != stat.st_ino or stat.st_size < entry.get("offset", 0):
+            return 0
+        return entry["offset"]
+
+    def update(self, filepath: Path, stat: os.stat_result, offset: int):
+        self.set(filepath, {"inode": stat.st_ino, "size": max(stat.st_size, offset), "offset": offset})
+
+    def set(self, filepath: Path, entry: dict):
+        with self._lock:
+            self.entries[str(filepath)] = entry
+            self._dirty.add(str(filepath))
+
+    def save(self):
+        """Persist updated positions, merged with what other processes saved meanwhile"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = self._read(self.path)
+            merged = data.setdefault(self.namespace, {})
+            for key in self._dirty:
+                ours, theirs = self.entries[key], merged.get(key)
+                # A concurrent capture read further: never move it back (truncation is caught on read)
+                if theirs and theirs.get("inode") == ours["inode"] and theirs.get("offset", 0) > ours["offset"]:
+                    continue
+                merged[key] = ours
+            self._write(self.path, data)
+            self.entries = merged
+            self._dirty.clear()
+
+
+def _iter_lines(f, max_line: int = MAX_LINE_SIZE) -> Iterator[tuple[bytes, int, bool]]:
+    """
+    Read complete lines in fixed-size blocks: yields (line, length, truncated).
+    Only the first max_line bytes of a line are kept, the rest is read past
+    without buffering. A last line without newline (still being written) is not yielded.
+    """
+    head = bytearray()
+    length = 0
+    while True:
+        block = f.read(READ_BLOCK_SIZE)
+        if not block:
+            return
+        start = 0
+        while True:
+            newline = block.find(b"\n", start)
+            end = len(block) if newline == -1 else newline + 1
+            room = max_line - len(head)
+            if room > 0:
+                head += block[start:min(end, start + room)]
+            length += end - start
+            if newline == -1:
+                break
+            yield bytes(head), length, length > max_line
+            head.clear()
+            length = 0
+            start = end
+
+
+# Salvaging truncated lines: the interesting parts are JSON strings near the start
+_JSON_STRING = rb'"((?:[^"\\]|\\.)*)'
+_SALVAGE_ASSISTANT_RE = re.compile(rb'"(?:type|role)"\s*:\s*"assistant"')
+_SALVAGE_SUMMARY_RE = re.compile(rb'"type"\s*:\s*"summary"\s*,\s*"summary"\s*:\s*' + _JSON_STRING)
+_SALVAGE_TEXT_RE = re.compile(rb'"type"\s*:\s*"text"\s*,\s*"text"\s*:\s*' + _JSON_STRING)
+_SALVAGE_TIMESTAMP_RE = re.compile(rb'"timestamp"\s*:\s*"([^"\\]*)"')
+
+
+def _decode_json_string(raw: bytes) -> str:
+    """Decode the body of a JSON string that may have been cut off mid-escape or mid-character"""
+    for cut in range(8):
+        try:
+            return _json_loads(b'"' + raw[:len(raw) - cut] + b'"')
+        except ValueError:
+            continue
+    return raw.decode("utf-8", errors="replace")
+
+
+def _salvage_message(head: bytes) -> Optional[dict]:
+    """Rebuild the parts of a truncated line that memories come from"""
+    summary = _SALVAGE_SUMMARY_RE.search(head)
+    if summary:
+        return {"type": "summary", "summary": _decode_json_string(summary.group(1))}
+    if not _SALVAGE_ASSISTANT_RE.search(head):
+        return None
+    blocks = [{"type": "text", "text": _decode_json_string(m.group(1))} for m in _SALVAGE_TEXT_RE.finditer(head)]
+    if not blocks:
+        return None
+    msg = {"type": "assistant", "message": {"content": blocks}}
+    timestamp = _SALVAGE_TIMESTAMP_RE.search(head)
+    if timestamp:
+        msg["timestamp"] = timestamp.group(1).decode("utf-8", errors="replace")
+    return msg
+
+
+def _extract_memories(msg: dict, source: str) -> Iterator[ExtractedMemory]:
+    """Memories from one decoded session line"""
+    msg_type = msg.get("type")
+
+    # Process assistant messages
+    if msg_type == "assistant":
+        content_blocks = msg.get("message", {}).get("content", [])
+        timestamp = msg.get("timestamp", datetime.now().isoformat())
+
+        for block in content_blocks:
+            if block.get("type") == "text":
+                text = block.get("text", "")
+                if len(text) > 50:  # Skip very short messages
+                    mem_type, confidence = detect_memory_type(text)
+                    if confidence >= 0.7:  # Only extract high-confidence memories
+                        yield ExtractedMemory(
+                            content=text[:2000],  # Limit size
+                            memory_type=mem_type,
+                            source=source,
+                            timestamp=timestamp,
+                            confidence=confidence,
+                            tags=extract_tags(text)
+                        )
+
+    # Process summaries (these are high-value)
+    elif msg_type == "summary":
+        summary = msg.get("summary", "")
+        if summary:
+            yield ExtractedMemory(
+                content=f"Session summary: {summary}",
+                memory_type="context",
+                source=source,
+                timestamp=datetime.now().isoformat(),
+                confidence=0.9,
+                tags=extract_tags(summary)
+            )
+
+
+def parse_session_file(
+    filepath: Path,
+    checkpoints: Optional[SessionCheckpoints] = None,
+    max_bytes: Optional[int] = MAX_FILE_SIZE
+) -> Iterator[ExtractedMemory]:
     """
     Parse a Claude Code session .jsonl file and extract memories.
-    Yields ExtractedMemory objects.
+    Yields ExtractedMemory objects. With checkpoints, only lines appended since
+    the last checkpoint are read, and the checkpoint advances once the pass is
+    fully consumed. A pass reads at most max_bytes (then stops at a line
+    boundary) in constant memory; the next pass resumes from the checkpoint.
+    Returns (as the generator's value) True if the read budget stopped the pass.
     """
     if not filepath.exists():
         return
@@ -136,96 +499,240 @@ def parse_session_file(filepath: Path) -> Iterator[ExtractedMemory]:
         logging.warning(f"Skipping symlink: {filepath}")
         return
 
-    # Security: check file size
     try:
-        file_size = filepath.stat().st_size
-        if file_size > MAX_FILE_SIZE:
-            logging.warning(f"Skipping large file ({file_size} bytes): {filepath}")
-            return
+        stat = filepath.stat()
     except OSError:
         return
-
-    with open(filepath, 'r') as f:
-        for line_num, line in enumerate(f):
-            # Security: check line size
-            if len(line) > MAX_LINE_SIZE:
-                logging.warning(f"Skipping large line {line_num} in {filepath}")
+    offset = checkpoints.start_offset(filepath, stat) if checkpoints else 0
+    budget_end = offset + max_bytes if max_bytes else None
+    budget_reached = False
+    source = str(filepath)
+
+    with open(filepath, 'rb') as f:
+        f.seek(offset)
+        for line_num, (line, length, truncated) in enumerate(_iter_lines(f, MAX_LINE_SIZE)):
+            # Resource limit: stop at a line boundary, the rest is read on the next pass
+            if budget_end is not None and offset >= budget_end:
+                budget_reached = True
+                if checkpoints:
+                    logging.info(f"Read budget reached at byte {offset} of {filepath}, resuming next pass")
+                else:
+                    logging.warning(f"Read budget reached at byte {offset} of {filepath}: the rest is skipped (no checkpoints)")
+                break
+            offset += length
+
+            if not _may_contain_memory(line):
                 continue
 
-            try:
-                msg = json.loads(line)
-            except json.JSONDecodeError:
-                continue
+            if truncated:
+                # Resource limit: only the head of huge lines is kept, salvage what it holds
+                logging.warning(f"Truncated {length}-byte line {line_num} in {filepath}")
+                msg = _salvage_message(line)
+                if msg is None:
+                    continue
+            else:
+                try:
+                    msg = _json_loads(line)
+                except ValueError:  # Invalid JSON or UTF-8 (json and orjson errors are ValueErrors)
+                    continue
 
             # Security: validate message structure
             if not isinstance(msg, dict):
                 continue
 
-            msg_type = msg.get("type")
-
-            # Process assistant messages
-            if msg_type == "assistant":
-                content_blocks = msg.get("message", {}).get("content", [])
-                timestamp = msg.get("timestamp", datetime.now().isoformat())
-
-                for block in content_blocks:
-                    if block.get("type") == "text":
-                        text = block.get("text", "")
-                        if len(text) > 50:  # Skip very short messages
-                            mem_type, confidence = detect_memory_type(text)
-                            if confidence >= 0.7:  # Only extract high-confidence memories
-                                yield ExtractedMemory(
-                                    content=text[:2000],  # Limit size
-                                    memory_type=mem_type,
-                                    source=str(filepath),
-                                    timestamp=timestamp,
-                                    confidence=confidence,
-                                    tags=extract_tags(text)
-                                )
-
-            # Process summaries (these are high-value)
-            elif msg_type == "summary":
-                summary = msg.get("summary", "")
-                if summary:
-                    yield ExtractedMemory(
-                        content=f"Session summary: {summary}",
-                        memory_type="context",
-                        source=str(filepath),
-                        timestamp=datetime.now().isoformat(),
-                        confidence=0.9,
-                        tags=extract_tags(summary)
-                    )
-
-
-def get_all_sessions(projects_dir: Optional[Path] = None) -> list[Path]:
-    """Get all session files from Claude Code projects directory"""
-    if projects_dir is None:
-        projects_dir = Path.home() / ".claude" / "projects"
-
-    if not projects_dir.exists():
-        return []
-
-    sessions = []
-    for project_dir in projects_dir.iterdir():
-        # Security: reject symlinked directories
-        if project_dir.is_dir() and not project_dir.is_symlink():
-            for session_file in project_dir.glob("*.jsonl"):
-                # Security: reject symlinked files
-                if not session_file.is_symlink():
-                    sessions.append(session_file)
-
-    return sorted(sessions, key=lambda p: p.stat().st_mtime, reverse=True)
+            yield from _extract_memories(msg, source)
+
+    if checkpoints:
+        checkpoints.update(filepath, stat, offset)
+    return budget_reached
+
+
+@dataclass
+class SessionInfo:
+    """A session file known to the catalog"""
+    path: Path
+    project: str  # Claude project directory name
+    mtime: float
+    size: int
+    captured_offset: int = 0  # 0 if never captured, rotated or truncated
+
+    @property
+    def unread(self) -> int:
+        return self.size - self.captured_offset
+
+
+def project_dir_name(project_path: str) -> str:
+    """Claude Code's project directory name for a path: every non-alphanumeric character becomes '-'"""
+    return re.sub(r"[^A-Za-z0-9]", "-", os.path.abspath(project_path))
+
+
+class SessionCatalog:
+    """
+    Index of session files under ~/.claude/projects. Directory listings are
+    cached until the directory's mtime changes (files added or removed), so
+    discovery lists one project directory at most and stats each session once.
+    """
+
+    def __init__(self, projects_dir: Optional[Path] = None):
+        self.projects_dir = Path(projects_dir) if projects_dir else Path.home() / ".claude" / "projects"
+        self._listings = {}  # directory -> (mtime_ns, [entry names])
+        self._lock = threading.Lock()
+
+    def _list(self, directory: Path, want_dirs: bool) -> list[str]:
+        """Names of plain (non-symlink) subdirectories or .jsonl files, cached by directory mtime"""
+        try:
+            mtime = directory.stat().st_mtime_ns
+        except OSError:
+            return []
+        key = (str(directory), want_dirs)
+        with self._lock:
+            cached = self._listings.get(key)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        names = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    # Security: reject symlinked directories and files
+                    if entry.is_symlink():
+                        continue
+                    if want_dirs and entry.is_dir(follow_symlinks=False):
+                        names.append(entry.name)
+                    elif not want_dirs and entry.name.endswith(".jsonl") and entry.is_file(follow_symlinks=False):
+                        names.append(entry.name)
+        except OSError:
+            return []
+        with self._lock:
+            self._listings[key] = (mtime, names)
+        return names
+
+    def projects(self) -> list[str]:
+        return self._list(self.projects_dir, want_dirs=True)
+
+    def sessions(self, project_path: Optional[str] = None,
+                 checkpoints: Optional[SessionCheckpoints] = None) -> list[SessionInfo]:
+        """Sessions of one project (all projects if None), newest first"""
+        projects = [project_dir_name(project_path)] if project_path else self.projects()
+        sessions = []
+        for project in projects:
+            directory = self.projects_dir / project
+            for name in self._list(directory, want_dirs=False):
+                path = directory / name
+                try:
+                    stat = os.stat(path, follow_symlinks=False)
+                except OSError:
+                    continue
+                offset = checkpoints.start_offset(path, stat) if checkpoints else 0
+                sessions.append(SessionInfo(path, project, stat.st_mtime, stat.st_size, offset))
+        return sorted(sessions, key=lambda info: info.mtime, reverse=True)
+
+
+_catalogs = {}
+
+
+def get_session_catalog(projects_dir: Optional[Path] = None) -> SessionCatalog:
+    """Process-wide catalog per projects directory"""
+    key = str(projects_dir) if projects_dir else ""
+    if key not in _catalogs:
+        _catalogs[key] = SessionCatalog(projects_dir)
+    return _catalogs[key]
+
+
+def get_all_sessions(projects_dir: Optional[Path] = None, project_path: Optional[str] = None) -> list[Path]:
+    """Get session files from Claude Code projects directory (one project's if project_path), newest first"""
+    return [info.path for info in get_session_catalog(projects_dir).sessions(project_path)]
 
 
 def parse_recent_sessions(
     max_sessions: int = 5,
-    projects_dir: Optional[Path] = None
+    projects_dir: Optional[Path] = None,
+    checkpoints: Optional[SessionCheckpoints] = None
 ) -> Iterator[ExtractedMemory]:
-    """Parse the most recent sessions and yield memories"""
+    """Parse the most recent sessions and yield memories (only new lines, with checkpoints)"""
     sessions = get_all_sessions(projects_dir)[:max_sessions]
 
     for session_file in sessions:
-        yield from parse_session_file(session_file)
+        yield from parse_session_file(session_file, checkpoints)
+
+
+def scan_session(filepath: str, checkpoint: Optional[dict] = None,
+                 max_bytes: Optional[int] = MAX_FILE_SIZE) -> tuple[list[ExtractedMemory], Optional[dict], bool]:
+    """
+    Process-pool worker: parse one pass of a session from its checkpoint.
+    Returns (memories, new checkpoint, whether the read budget stopped the pass early)
+    """
+    checkpoints = SessionCheckpoints(path="", entries={filepath: checkpoint} if checkpoint else {})
+    memories = []
+    reader = parse_session_file(Path(filepath), checkpoints, max_bytes)
+    try:
+        while True:
+            memories.append(next(reader))
+    except StopIteration as done:
+        # From wherever the pass started: a rotated or truncated file restarts at 0
+        more = bool(done.value)
+    return memories, checkpoints.entries.get(filepath), more
+
+
+def parse_sessions_parallel(
+    sessions: list[Path],
+    checkpoints: Optional[SessionCheckpoints] = None,
+    jobs: int = 1,
+    max_bytes: Optional[int] = MAX_FILE_SIZE
+) -> Iterator[tuple[Path, list[ExtractedMemory], bool]]:
+    """
+    Parse sessions in a process pool, yielding (session, memories, finished) in
+    order of completion. A session's checkpoint advances only after the caller resumes
+    the generator, i.e. once it has handled that session's memories. Sessions
+    larger than one pass's read budget are yielded once per pass.
+    """
+    # Each session's latest checkpoint, also for passes resumed within this run
+    entries = dict(checkpoints.entries) if checkpoints else {}
+
+    def advance(session: Path, checkpoint: Optional[dict]):
+        if checkpoint:
+            entries[str(session)] = checkpoint
+            if checkpoints is not None:
+                checkpoints.set(session, checkpoint)
+
+    if jobs <= 1:
+        queue = list(sessions)
+        while queue:
+            session = queue.pop(0)
+            memories, checkpoint, more = scan_session(str(session), entries.get(str(session)), max_bytes)
+            yield session, memories, not more
+            advance(session, checkpoint)
+            if more:
+                queue.append(session)
+        return
+
+    pending = list(sessions)
+    # spawn: callers (the MCP server) are multi-threaded, which fork does not mix well with
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+        running = {}
+
+        def submit():
+            # Keep a bounded number of sessions in flight
+            while pending and len(running) < jobs * 2:
+                session = pending.pop(0)
+                future = pool.submit(scan_session, str(session), entries.get(str(session)), max_bytes)
+                running[future] = session
+
+        submit()
+        try:
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    session = running.pop(future)
+                    memories, checkpoint, more = future.result()
+                    yield session, memories, not more
+                    advance(session, checkpoint)
+                    if more:
+                        pending.append(session)
+                submit()
+        finally:
+            for future in running:
+                future.cancel()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Shared fixtures
+"""
+import os
+import sys
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chromadb
+import pytest
+
+import mcp_server
+from embedding_backends import HashBackend
+from lexical_index import IndexedCollection, LexicalIndex
+
+
+@pytest.fixture
+def collection(monkeypatch, tmp_path):
+    """In-memory collection + hash embeddings, so no Ollama or disk DB is needed"""
+    client = chromadb.EphemeralClient()
+    coll = client.create_collection(f"test_{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"})
+    coll = IndexedCollection(coll, LexicalIndex(str(tmp_path / "lexical_index.db")))
+    backend = HashBackend(dim=32)
+    calls = []
+
+    def fake_batch(texts, use_cache=True):
+        calls.append(len(texts))
+        return backend.embed(texts)
+
+    monkeypatch.setattr(mcp_server, "get_collection", lambda scope=None: coll)
+    monkeypatch.setattr(mcp_server, "get_collections_for_scope", lambda scope: [(coll, mcp_server.SCOPE_PROJECT)])
+    monkeypatch.setattr(mcp_server, "get_embeddings_batch", fake_batch)
+    monkeypatch.setattr(mcp_server, "get_embedding", lambda text, use_cache=True: fake_batch([text])[0])
+    coll.embed_calls = calls
+    return coll
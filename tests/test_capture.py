@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Tests for session capture (rag_capture)
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mcp_server
+from session_follower import SessionFollower
+from session_parser import SessionCatalog, SessionCheckpoints, project_dir_name
+
+MEMORIES = [
+    "We decided to use PostgreSQL instead of MySQL for the main database of this service.",
+    "The error was in the session parser: I fixed the offset handling and it works now, all green again.",
+    "The architecture of the project splits ingestion and query into separate components.",
+]
+
+
+def write_session(path, texts):
+    with open(path, "a") as f:
+        for i, text in enumerate(texts):
+            f.write(json.dumps({
+                "type": "assistant",
+                "timestamp": f"2026-01-0{i + 1}T00:00:00",
+                "message": {"content": [{"type": "text", "text": text}]}
+            }) + "\n")
+
+
+def test_parallel_capture_resumes_from_checkpoints(collection, tmp_path):
+    """Test a process-pool backfill stores everything once and a rerun only reads new lines"""
+    sessions = []
+    for i in range(3):
+        session = tmp_path / f"session{i}.jsonl"
+        write_session(session, MEMORIES)
+        sessions.append(session)
+    checkpoints_file = str(tmp_path / "checkpoints.json")
+    progress = []
+
+    result = mcp_server.capture_sessions(
+        sessions, checkpoints=SessionCheckpoints.load(checkpoints_file), jobs=2,
+        on_progress=lambda *args: progress.append(args)
+    )
+    # Same content + timestamp in every session: one memory per text
+    assert len(result["captured"]) == 3
+    assert collection.count() == 3
+    assert [p[0] for p in progress] == [1, 2, 3]
+
+    embedded = sum(collection.embed_calls)
+    again = mcp_server.capture_sessions(sessions, checkpoints=SessionCheckpoints.load(checkpoints_file), jobs=2)
+    assert again["captured"] == []
+    assert sum(collection.embed_calls) == embedded
+
+    write_session(sessions[0], ["We chose to go with Redis for the session cache, decided after the benchmark."])
+    third = mcp_server.capture_sessions(sessions, checkpoints=SessionCheckpoints.load(checkpoints_file))
+    assert [m["type"] for m in third["captured"]] == ["decision"]
+    assert collection.count() == 4
+
+
+def test_rescan_does_not_reembed_stored_memories(collection, tmp_path):
+    """Test re-reading sessions from scratch only checks IDs, nothing is embedded again"""
+    session = tmp_path / "session.jsonl"
+    write_session(session, MEMORIES)
+
+    first = mcp_server.capture_sessions([session], checkpoints=SessionCheckpoints(str(tmp_path / "a.json")))
+    assert len(first["captured"]) == 3
+    embedded = sum(collection.embed_calls)
+
+    rescan = mcp_server.capture_sessions([session], checkpoints=SessionCheckpoints(str(tmp_path / "b.json")))
+    assert (len(rescan["captured"]), rescan["existing"]) == (0, 3)
+    assert sum(collection.embed_calls) == embedded
+    assert collection.count() == 3
+
+
+def test_near_duplicates_are_dropped(collection, tmp_path):
+    """Test restated memories are dropped by SimHash in a run and by vector similarity across runs"""
+    fix = "The fix was to reset the offset when the file is rotated, and now the checkpoint test passes again on CI."
+    session = tmp_path / "session.jsonl"
+    write_session(session, [fix, fix.replace(" again", ""), MEMORIES[0]])
+
+    first = mcp_server.capture_sessions([session], checkpoints=SessionCheckpoints(str(tmp_path / "a.json")))
+    assert (len(first["captured"]), first["duplicates"]) == (2, 1)
+    assert sum(collection.embed_calls) == 2
+
+    # Same text at a new timestamp (new ID) in a later run: caught by the nearest stored vector
+    later = tmp_path / "later.jsonl"
+    with open(later, "w") as f:
+        f.write(json.dumps({
+            "type": "assistant", "timestamp": "2026-02-01T00:00:00",
+            "message": {"content": [{"type": "text", "text": fix}]}
+        }) + "\n")
+    second = mcp_server.capture_sessions([later], checkpoints=SessionCheckpoints(str(tmp_path / "b.json")))
+    assert (second["captured"], second["duplicates"]) == ([], 1)
+    assert collection.count() == 2
+
+    disabled = mcp_server.capture_sessions([later], checkpoints=SessionCheckpoints(str(tmp_path / "c.json")),
+                                           similarity=0)
+    assert len(disabled["captured"]) == 1
+
+
+def test_memories_quoting_a_file_are_not_duplicates_of_its_chunks(collection, tmp_path):
+    """Test capture dedups against conversation memories only, not indexed file chunks"""
+    snippet = "Here is the fix: `offset = checkpoints.start_offset(filepath, stat) if checkpoints else 0` in the parser."
+    collection.upsert(ids=["chunk"], embeddings=mcp_server.get_embeddings_batch([snippet]), documents=[snippet],
+                      metadatas=[{"source": "file:/repo/session_parser.py", "memory_type": "context"}])
+    session = tmp_path / "session.jsonl"
+    write_session(session, [snippet])
+
+    result = mcp_server.capture_sessions([session], checkpoints=SessionCheckpoints(str(tmp_path / "a.json")))
+    assert (len(result["captured"]), result["duplicates"]) == (1, 0)
+
+
+def test_follower_captures_appended_entries(collection, tmp_path):
+    """Test the follower captures active sessions as they grow and idles otherwise"""
+    project = tmp_path / "projects" / project_dir_name("/work/app")
+    project.mkdir(parents=True)
+    session = project / "active.jsonl"
+    write_session(session, MEMORIES[:1])
+    checkpoints_file = str(tmp_path / "checkpoints.json")
+    follower = SessionFollower(
+        lambda paths, checkpoints: mcp_server.capture_sessions(paths, checkpoints=checkpoints, batch_size=2),
+        "/work/app", lambda: SessionCheckpoints.load(checkpoints_file), catalog=SessionCatalog(tmp_path / "projects")
+    )
+
+    assert len(follower.poll()["captured"]) == 1
+    assert follower.poll() is None
+
+    with open(session, "a") as f:
+        f.write(json.dumps({"type": "summary", "summary": "Moved capture to a background follower"}) + "\n")
+        f.write('{"type": "assistant", "message": ')  # still being written
+    assert [m["type"] for m in follower.poll()["captured"]] == ["context"]
+    assert follower.poll() is None
+    assert (follower.stats()["captured"], collection.count()) == (2, 2)
+
+    # An explicit capture got there first: the follower picks up its checkpoints instead of re-reading
+    with open(session, "a") as f:
+        f.write(json.dumps({"content": [{"type": "text", "text": MEMORIES[1]}]}) + "}\n")  # Line completed
+    explicit = mcp_server.capture_sessions([session], checkpoints=SessionCheckpoints.load(checkpoints_file))
+    assert len(explicit["captured"]) == 1
+    assert follower.poll() is None
+
+
+def test_checkpoints_never_move_back_on_save(tmp_path):
+    """Test a capture that read less than a concurrent one keeps the further offset when saving"""
+    session = tmp_path / "session.jsonl"
+    write_session(session, MEMORIES[:1])
+    path = str(tmp_path / "checkpoints.json")
+    stat = session.stat()
+    behind, ahead = SessionCheckpoints.load(path), SessionCheckpoints.load(path)
+    ahead.update(session, stat, stat.st_size)
+    ahead.save()
+    behind.update(session, stat, 10)
+    behind.save()
+    assert SessionCheckpoints.load(path).entries[str(session)]["offset"] == stat.st_size
+
+
+def test_capture_jobs_are_validated(monkeypatch):
+    """Test rag_capture clamps jobs to 1..cpu_count instead of spawning or crashing on bad values"""
+    used = []
+    monkeypatch.setattr(mcp_server, "find_capture_sessions", lambda *args: ["/tmp/session.jsonl"])
+    monkeypatch.setattr(mcp_server, "capture_sessions", lambda sessions, **kwargs: used.append(kwargs["jobs"]) or {
+        "captured": [], "skipped": 0, "existing": 0, "duplicates": 0, "sessions": 1})
+    monkeypatch.setattr(mcp_server, "MAX_CAPTURE_JOBS", 4)
+
+    for jobs in (0, -3, "4", 2, 10_000, 2.5):
+        mcp_server.handle_tool("rag_capture", {"jobs": jobs})
+    assert used == [1, 1, 1, 2, 4, 2]
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent embedding cache
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from embedding_cache import EmbeddingCache, LRUVectorCache, cached_embed
+
+
+def test_roundtrip_and_normalized_key(tmp_path):
+    """Test embeddings survive a reopen and are keyed by normalized text"""
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache(path=path, max_entries=100)
+    cache.put_many("model-a", ["hello world"], [[0.5, 0.25, 1.0]])
+    cache.close()
+
+    cache = EmbeddingCache(path=path, max_entries=100)
+    hits = cache.get_many("model-a", ["  hello world\n", "other"])
+    assert hits == {0: [0.5, 0.25, 1.0]}
+    assert cache.get_many("model-b", ["hello world"]) == {}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_eviction_respects_cap(tmp_path):
+    """Test least recently used entries are evicted over max_entries"""
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"), max_entries=10)
+    for i in range(10):
+        cache.put_many("m", [f"text {i}"], [[float(i)]])
+    # Touch text 0 so it is the most recently used
+    cache.get_many("m", ["text 0"])
+    cache.put_many("m", ["text 10"], [[10.0]])
+
+    stats = cache.stats()
+    assert stats["entries"] <= 10
+    assert stats["evictions"] > 0
+    assert cache.get_many("m", ["text 0"]) == {0: [0.0]}
+    assert cache.get_many("m", ["text 1"]) == {}
+
+
+def test_cached_embed_only_computes_misses(tmp_path):
+    """Test cached_embed calls the embed function for uncached texts only"""
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"), max_entries=100)
+    calls = []
+
+    def fake_embed(texts):
+        calls.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+    assert cached_embed(["a", "bb"], "m", fake_embed, cache=cache) == [[1.0], [2.0]]
+    assert cached_embed(["bb", "ccc"], "m", fake_embed, cache=cache) == [[2.0], [3.0]]
+    assert calls == [["a", "bb"], ["ccc"]]
+
+
+def test_lru_vector_cache_byte_budget():
+    """Test the in-process cache stays under its byte budget and evicts LRU first"""
+    cache = LRUVectorCache(max_bytes=3000)
+    for i in range(20):
+        cache.put(i, [float(i)] * 128)  # ~600 bytes each as float32
+        assert cache.stats()["resident_bytes"] <= 3000
+
+    stats = cache.stats()
+    assert stats["evictions"] > 0
+    assert cache.get(0) is None
+    assert cache.get(19) == [19.0] * 128
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Tests for embedding backends and batch dispatch
+"""
+import os
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import chromadb
+import pytest
+import requests
+
+import embedding_backends
+import mcp_server
+from embedding_backends import BatchSizeTuner, HashBackend, OllamaBackend, create_backend, split_batches
+
+
+def test_split_batches_by_count_and_chars():
+    """Test sub-batches respect both the count and character limits"""
+    texts = ["a" * 10] * 7
+    assert split_batches(texts, max_count=3, max_chars=1000) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert split_batches(texts, max_count=10, max_chars=25) == [[0, 1], [2, 3], [4, 5], [6]]
+    # A single oversized text still gets its own batch
+    assert split_batches(["x" * 100], max_count=10, max_chars=25) == [[0]]
+
+
+def test_batch_tuner_grows_then_backs_off():
+    """Test the tuner grows while throughput improves and halves on failure"""
+    tuner = BatchSizeTuner(size=8, min_size=4, max_size=64)
+    tuner.record(8, 1.0)
+    assert tuner.size == 12
+    tuner.record(12, 1.0)
+    assert tuner.size == 18
+    tuner.failed()
+    assert tuner.size == 9
+
+
+def test_ollama_embed_keeps_finished_sub_batches(monkeypatch):
+    """Test a failing sub-batch doesn't discard the ones that succeeded"""
+    backend = OllamaBackend(url="http://localhost:1")
+
+    def fake_post(texts):
+        if "bad" in texts:
+            raise RuntimeError("boom")
+        return [[float(len(t))] for t in texts]
+
+    monkeypatch.setattr(backend, "_post_batch", fake_post)
+    backend.tuner.size = 2
+
+    done = []
+    with pytest.raises(RuntimeError):
+        backend.embed(["a", "bb", "bad", "ccc"], on_batch=lambda t, e: done.extend(t))
+    assert sorted(done) == ["a", "bb"]
+
+
+def test_ollama_batch_gives_up_on_a_hung_server_within_budget(monkeypatch):
+    """Test timed-out halvings stop at EMBED_BATCH_BUDGET and a single text fails on its first timeout"""
+    backend = OllamaBackend(url="http://localhost:1")
+    now = [0.0]
+    monkeypatch.setattr(embedding_backends, "time", types.SimpleNamespace(
+        monotonic=lambda: now[0], time=lambda: now[0], sleep=lambda seconds: None
+    ))
+    sizes = []
+
+    def hung(url, json, timeout):
+        sizes.append(len(json["input"]))
+        now[0] += timeout
+        raise requests.exceptions.ReadTimeout()
+
+    monkeypatch.setattr(backend._http, "post", hung)
+    with pytest.raises(requests.exceptions.Timeout):
+        backend._post_batch([f"text {i}" for i in range(64)])
+    assert now[0] <= embedding_backends.EMBED_BATCH_BUDGET
+    assert sizes == [64, 32]
+
+    sizes.clear()
+    with pytest.raises(requests.exceptions.Timeout):
+        backend._post_batch(["one text"])
+    assert sizes == [1]
+
+
+def test_hash_backend_is_deterministic_and_normalized():
+    """Test the fake backend gives stable unit vectors, closer for similar texts"""
+    backend = HashBackend(dim=64)
+    a, b, c = backend.embed(["fix the cache bug", "fix the cache bug", "deploy kubernetes cluster"])
+    assert a == b
+    assert len(a) == 64
+    assert abs(sum(v * v for v in a) - 1.0) < 1e-9
+    near = sum(x * y for x, y in zip(a, backend.embed_one("fix cache bug"), strict=True))
+    far = sum(x * y for x, y in zip(a, c, strict=True))
+    assert near > far
+
+
+def test_create_backend_rejects_unknown_name():
+    """Test an unknown EMBED_BACKEND fails loudly"""
+    with pytest.raises(ValueError):
+        create_backend("nope")
+    assert create_backend("hash").cache_model.startswith("hash:")
+
+
+def test_dimension_mismatch_is_reported(monkeypatch):
+    """Test a collection embedded by another model is flagged instead of failing on query"""
+    coll = chromadb.EphemeralClient().create_collection("dim_test")
+    monkeypatch.setattr(mcp_server, "get_embedding", lambda text, use_cache=True: [0.5] * 8)
+    assert mcp_server.check_embedding_dimension(coll, mcp_server.SCOPE_GLOBAL) is None
+
+    coll.add(ids=["a"], embeddings=[[0.5] * 4], documents=["old model"])
+    message = mcp_server.check_embedding_dimension(coll, mcp_server.SCOPE_GLOBAL)
+    assert "4-dimension" in message and "produces 8" in message
+
+    monkeypatch.setitem(mcp_server._dimension_errors, mcp_server.SCOPE_GLOBAL, message)
+    assert message in mcp_server.dimension_warnings(mcp_server.SCOPE_ALL)
+    assert mcp_server.dimension_warnings(mcp_server.SCOPE_PROJECT) == ""
+
+
+def test_dimension_probe_does_not_hold_up_opening(monkeypatch, tmp_path):
+    """Test a collection opens without waiting for a slow backend to answer the dimension probe"""
+    monkeypatch.setattr(mcp_server, "get_db_path", lambda scope: str(tmp_path / "db"))
+    monkeypatch.setattr(mcp_server, "_clients", {})
+    monkeypatch.setattr(mcp_server, "_collections", {})
+    monkeypatch.setattr(mcp_server, "_dimension_errors", {})
+
+    def slow_probe(collection, scope):
+        time.sleep(0.5)
+        return "mismatch"
+
+    monkeypatch.setattr(mcp_server, "check_embedding_dimension", slow_probe)
+    start = time.monotonic()
+    mcp_server.get_collection(mcp_server.SCOPE_GLOBAL)
+    assert time.monotonic() - start < 0.4
+    deadline = time.monotonic() + 5
+    while not mcp_server._dimension_errors and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert mcp_server._dimension_errors == {mcp_server.SCOPE_GLOBAL: "mismatch"}
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tests for incremental indexing (rag_index)
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import mcp_server
+from indexer import FileWork, IndexPipeline, walk_files
+
+
+def test_index_path_skips_unchanged_and_removes_deleted(collection, tmp_path):
+    """Test re-indexing only touches changed files and drops deleted ones"""
+    (tmp_path / "a.md").write_text("# A\n\n## One\nfirst\n\n## Two\nsecond\n")
+    (tmp_path / "b.py").write_text("def f():\n    pass\n")
+
+    first = mcp_server.index_path(tmp_path)
+    assert first["updated"] == 2
+    embedded = sum(collection.embed_calls)
+    assert embedded == first["chunks"]
+
+    second = mcp_server.index_path(tmp_path)
+    assert (second["updated"], second["skipped"]) == (0, 2)
+    assert sum(collection.embed_calls) == embedded
+
+    (tmp_path / "a.md").write_text("# A only\n")
+    (tmp_path / "b.py").unlink()
+    third = mcp_server.index_path(tmp_path)
+    assert (third["updated"], third["removed"]) == (1, 1)
+
+    sources = {m["source"] for m in collection.get(include=["metadatas"])["metadatas"]}
+    assert sources == {str(tmp_path / "a.md")}
+    assert collection.count() == 1
+
+
+def test_index_path_touch_without_change_does_not_reembed(collection, tmp_path):
+    """Test an mtime-only change falls back to the content hash"""
+    target = tmp_path / "notes.md"
+    target.write_text("## Notes\nsome content\n")
+    mcp_server.index_path(tmp_path)
+
+    os.utime(target, (1, 1))
+    result = mcp_server.index_path(tmp_path)
+    assert result["skipped"] == 1
+    assert len(collection.embed_calls) == 1
+
+
+def test_pipeline_batches_across_files_and_finalizes_after_write():
+    """Test chunks of several files share embed batches and finalize runs after the upsert"""
+    events = []
+
+    def prepare(n):
+        ids = [f"{n}_{i}" for i in range(n)]
+        return FileWork(
+            source=str(n), ids=ids, documents=ids, metadatas=[{}] * n,
+            finalize=lambda: events.append(("finalize", n))
+        )
+
+    def upsert(batch):
+        assert len(batch.embeddings) == len(batch.ids)
+        events.append(("upsert", tuple(batch.ids)))
+
+    embed_sizes = []
+
+    def embed(texts):
+        embed_sizes.append(len(texts))
+        return [[0.0]] * len(texts)
+
+    pipeline = IndexPipeline(prepare, embed, upsert, readers=2, batch_size=4)
+    completed = pipeline.run([1, 2, 3, 4])
+
+    assert sorted(int(w.source) for w in completed) == [1, 2, 3, 4]
+    assert sum(embed_sizes) == 10
+    assert max(embed_sizes) <= 4
+    written = set()
+    for kind, value in events:
+        if kind == "upsert":
+            written.update(value)
+        else:
+            assert {f"{value}_{i}" for i in range(value)} <= written
+
+
+def test_pipeline_propagates_errors():
+    """Test a failing stage stops the pipeline and re-raises"""
+    def embed(texts):
+        raise RuntimeError("embedding down")
+
+    pipeline = IndexPipeline(
+        lambda n: FileWork(source=str(n), ids=[str(n)], documents=["x"], metadatas=[{}]),
+        embed, lambda batch: None, readers=2, batch_size=2
+    )
+    with pytest.raises(RuntimeError, match="embedding down"):
+        pipeline.run(range(100))
+
+
+def test_walk_files_honors_ignore_files_and_prunes(tmp_path):
+    """Test the walker skips ignored paths, default dirs, oversized and unsupported files"""
+    (tmp_path / ".gitignore").write_text("*.log.md\n/generated/\nsecret*\n!secret_ok.md\n")
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / ".ragignore").write_text("drafts/\n")
+    (tmp_path / "docs" / "drafts").mkdir()
+    (tmp_path / "docs" / "drafts" / "wip.md").write_text("x")
+    (tmp_path / "docs" / "guide.md").write_text("x")
+    (tmp_path / "generated").mkdir()
+    (tmp_path / "generated" / "out.py").write_text("x")
+    (tmp_path / "node_modules" / "pkg").mkdir(parents=True)
+    (tmp_path / "node_modules" / "pkg" / "index.js").write_text("x")
+    (tmp_path / "run.log.md").write_text("x")
+    (tmp_path / "secret.md").write_text("x")
+    (tmp_path / "secret_ok.md").write_text("x")
+    (tmp_path / "big.md").write_text("x" * 100)
+    (tmp_path / "image.png").write_bytes(b"x")
+    (tmp_path / "main.py").write_text("x")
+
+    found = {
+        os.path.relpath(path, tmp_path): (file_type, stat.st_size)
+        for path, file_type, stat in walk_files(tmp_path, mcp_server.SUPPORTED_EXTENSIONS, max_size=50)
+    }
+    assert found == {
+        os.path.join("docs", "guide.md"): ("markdown", 1),
+        "secret_ok.md": ("markdown", 1),
+        "main.py": ("python", 1),
+    }
+
+
+def test_sync_file_chunks_only_embeds_new_sections(collection):
+    """Test rag_sync reuses stored embeddings for unchanged and moved chunks"""
+    chunks = [{"text": "## A\nalpha"}, {"text": "## B\nbeta"}, {"text": "## C\ngamma"}]
+    first = mcp_server.sync_file_chunks(collection, "/tmp/CLAUDE.md", chunks, "markdown", "h1")
+    assert first["embedded"] == 3
+
+    # Insert a section at the top: every later chunk index shifts, content does not
+    edited = [{"text": "## New\nfresh"}] + chunks[:2]
+    second = mcp_server.sync_file_chunks(collection, "/tmp/CLAUDE.md", edited, "markdown", "h2")
+    assert (second["embedded"], second["reused"], second["removed"]) == (1, 2, 3)
+    assert sum(collection.embed_calls) == 4
+
+    stored = collection.get(include=["documents", "metadatas"])
+    assert sorted(stored["documents"]) == sorted(c["text"] for c in edited)
+    assert {m["file_hash"] for m in stored["metadatas"]} == {"h2"}
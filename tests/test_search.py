@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Tests for rag_search retrieval (vector, hybrid BM25 + RRF, exact identifiers)
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+import mcp_server
+from embedding_cache import SearchResultCache
+from lexical_index import looks_like_identifier, match_expression, reciprocal_rank_fusion
+
+DOCS = {
+    "sync": "SYNC_STATE_FILE stores the file hashes used by rag_sync to detect changes.",
+    "db": "We decided to use PostgreSQL instead of MySQL for the main database.",
+    "fish": "The shell prompt is configured in ~/.config/fish/config.fish with starship.",
+    "cache": "Embeddings are cached in SQLite so repeated chunks are not sent to Ollama again.",
+}
+
+
+def store(collection, docs=DOCS):
+    ids = list(docs)
+    collection.upsert(
+        ids=ids,
+        embeddings=mcp_server.get_embeddings_batch([docs[i] for i in ids]),
+        documents=[docs[i] for i in ids],
+        metadatas=[{"source": f"/notes/{i}.md", "memory_type": "context"} for i in ids],
+    )
+
+
+def test_match_expression_and_rrf():
+    """Test query terms are quoted (identifiers become phrases) and RRF rewards agreement"""
+    assert match_expression('get_collection "x"') == '"get_collection" OR "x"'
+    assert match_expression("?!") is None
+    scores = reciprocal_rank_fusion([["a", "b"], ["b", "c"]], k=1)
+    assert max(scores, key=scores.get) == "b"
+
+
+def test_lexical_index_mirrors_writes(collection):
+    """Test upserts, metadata updates and deletes through the collection reach the BM25 index"""
+    store(collection)
+    assert collection.lexical_query("config.fish", 5) == ["fish"]
+
+    collection.update(ids=["fish"], metadatas=[{"source": "/dotfiles/starship.toml", "memory_type": "snippet"}])
+    assert collection.lexical_query("starship.toml", 5) == ["fish"]
+    assert collection.lexical_query("fish", 5, memory_type="context") == []
+
+    collection.delete(ids=["fish"])
+    assert collection.lexical_query("config.fish", 5) == []
+    assert collection.lexical.count() == 3
+
+
+def test_lexical_index_builds_lazily_from_existing_collection(collection):
+    """Test documents written before the index existed are indexed on first search"""
+    raw = collection._collection
+    raw.upsert(ids=["old"], embeddings=mcp_server.get_embeddings_batch(["x"]),
+               documents=["legacy note about OLLAMA_URL"], metadatas=[{"source": "old.md"}])
+    assert collection.lexical_query("OLLAMA_URL", 5) == ["old"]
+    assert collection.lexical.is_built()
+
+
+def test_hybrid_search_ranks_exact_identifier_first(collection):
+    """Test hybrid mode surfaces the exact identifier match and fuses scores to [0, 1]"""
+    store(collection)
+    hits = mcp_server.search_memories("SYNC_STATE_FILE hashes", n_results=2, mode=mcp_server.SEARCH_MODE_HYBRID)
+    assert hits[0]["id"] == "sync"
+    assert 0 < hits[0]["score"] <= 1
+    assert all(hit["scope"] == mcp_server.SCOPE_PROJECT for hit in hits)
+
+
+def test_hybrid_search_answers_without_embedding_backend(collection, monkeypatch):
+    """Test keyword results still come back when the embedding backend is unreachable"""
+    store(collection)
+
+    def down(texts, use_cache=True):
+        raise requests.exceptions.ConnectionError()
+
+    monkeypatch.setattr(mcp_server, "get_embeddings_batch", down)
+    hits = mcp_server.search_memories("PostgreSQL", mode=mcp_server.SEARCH_MODE_HYBRID)
+    assert [hit["id"] for hit in hits] == ["db"]
+    text = mcp_server.handle_tool("rag_search", {"query": "PostgreSQL"})[0].text
+    assert "Ollama not running" in text
+
+
+def test_hybrid_search_keeps_keyword_hits_when_vector_query_fails(collection, monkeypatch):
+    """Test a scope whose vector query fails still answers hybrid queries from BM25, uncached"""
+    store(collection)
+    monkeypatch.setattr(mcp_server, "_search_cache", SearchResultCache())
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("index unavailable")
+
+    monkeypatch.setattr(mcp_server, "_vector_hits", broken)
+    hits = mcp_server.search_memories("PostgreSQL", mode=mcp_server.SEARCH_MODE_HYBRID)
+    assert [hit["id"] for hit in hits] == ["db"]
+    assert mcp_server._search_cache.stats()["entries"] == 0
+    assert mcp_server.search_memories("PostgreSQL") == []
+
+
+def test_lexical_index_meta_reads_do_not_wait_for_writes(collection):
+    """Test generation and change checks answer while a write or rebuild holds the index"""
+    store(collection)
+    collection.lexical_query("database", 1)
+    collection.lexical.acknowledge()
+    answers = []
+    with collection.lexical._lock:
+        reader = threading.Thread(target=lambda: answers.extend(
+            [collection.generation(), collection.changed_elsewhere(), collection.lexical.is_built()]
+        ))
+        reader.start()
+        reader.join(timeout=2)
+    assert answers and answers[0] and answers[1:] == [False, True]
+
+
+def test_lexical_index_is_built_once_under_concurrent_searches(collection, monkeypatch):
+    """Test searches racing on an unbuilt index wait for one build instead of each rebuilding"""
+    collection._collection.upsert(ids=["old"], embeddings=mcp_server.get_embeddings_batch(["x"]),
+                                  documents=["legacy note about OLLAMA_URL"])
+    builds = []
+    rebuild = collection.lexical.rebuild
+
+    def slow_rebuild(pages):
+        builds.append(1)
+        time.sleep(0.2)
+        rebuild(pages)
+
+    monkeypatch.setattr(collection.lexical, "rebuild", slow_rebuild)
+    results = []
+    searches = [threading.Thread(target=lambda: results.append(collection.lexical_query("OLLAMA_URL", 5)))
+                for _ in range(3)]
+    for thread in searches:
+        thread.start()
+    for thread in searches:
+        thread.join()
+    assert builds == [1]
+    assert results == [["old"]] * 3
+
+
+def test_hybrid_search_answers_when_embedding_times_out(collection, monkeypatch):
+    """Test keyword results come back when the embedding backend times out, as when it is down"""
+    store(collection)
+
+    def hung(texts, use_cache=True):
+        raise requests.exceptions.ReadTimeout()
+
+    monkeypatch.setattr(mcp_server, "get_embeddings_batch", hung)
+    hits = mcp_server.search_memories("PostgreSQL", mode=mcp_server.SEARCH_MODE_HYBRID)
+    assert [hit["id"] for hit in hits] == ["db"]
+
+
+def test_looks_like_identifier():
+    """Test identifiers and paths are detected while prose and product names are not"""
+    assert looks_like_identifier("SYNC_STATE_FILE") == "SYNC_STATE_FILE"
+    assert looks_like_identifier(" `~/.config/fish/config.fish` ") == "~/.config/fish/config.fish"
+    assert looks_like_identifier("SessionCatalog") == "SessionCatalog"
+    assert looks_like_identifier("get_collection()") == "get_collection()"
+    for query in ("PostgreSQL", "database choice", "get_collection signature", "_x"):
+        assert looks_like_identifier(query) is None
+
+
+def test_identifier_query_answers_from_trigram_index(collection, monkeypatch):
+    """Test identifier and path queries return exact substring matches without embedding"""
+    store(collection)
+
+    def down(texts, use_cache=True):
+        raise requests.exceptions.ConnectionError()
+
+    monkeypatch.setattr(mcp_server, "get_embeddings_batch", down)
+    hits = mcp_server.search_memories("STATE_FILE")
+    assert [(hit["id"], hit["exact"], hit["score"]) for hit in hits] == [("sync", True, 1.0)]
+    assert [hit["id"] for hit in mcp_server.search_memories("~/.config/fish/config.fish")] == ["fish"]
+    assert [hit["id"] for hit in mcp_server.search_memories("/notes/db.md")] == ["db"]
+
+    text = mcp_server.handle_tool("rag_search", {"query": "`SYNC_STATE_FILE`"})[0].text
+    assert "Exact match" in text
+    # No exact match (or free text): falls back to vector search, which needs the backend
+    for query in ("NO_SUCH_NAME", "database choice"):
+        assert "Ollama not running" in mcp_server.handle_tool("rag_search", {"query": query})[0].text
+
+
+def test_exact_lookups_are_bounded_by_the_scope_timeout(collection, monkeypatch):
+    """Test a scope stuck in an exact lookup is left out after the timeout and the answer is not cached"""
+    store(collection)
+    monkeypatch.setattr(mcp_server, "_abandoned", {})
+    monkeypatch.setattr(mcp_server, "_search_cache", SearchResultCache())
+
+    class StuckCollection:
+        def exact_query(self, needle, n_results, memory_type=None):
+            time.sleep(1)
+            return []
+
+    monkeypatch.setattr(mcp_server, "get_collections_for_scope",
+                        lambda scope: [(StuckCollection(), mcp_server.SCOPE_GLOBAL), (collection, mcp_server.SCOPE_PROJECT)])
+    monkeypatch.setattr(mcp_server, "SEARCH_SCOPE_TIMEOUT", 0.2)
+
+    start = time.monotonic()
+    hits = mcp_server.search_memories("SYNC_STATE_FILE")
+    assert time.monotonic() - start < 0.9
+    assert [(hit["id"], hit["scope"]) for hit in hits] == [("sync", mcp_server.SCOPE_PROJECT)]
+    assert mcp_server._search_cache.stats()["entries"] == 0
+
+
+def test_scopes_are_queried_concurrently_with_timeout(collection, monkeypatch):
+    """Test a slow scope is dropped after the timeout while the other scope's hits are merged"""
+    store(collection)
+    monkeypatch.setattr(mcp_server, "_abandoned", {})
+
+    class SlowCollection:
+        def query(self, **kwargs):
+            time.sleep(1)
+            raise AssertionError("should have been abandoned")
+
+    monkeypatch.setattr(mcp_server, "get_collections_for_scope",
+                        lambda scope: [(SlowCollection(), mcp_server.SCOPE_GLOBAL), (collection, mcp_server.SCOPE_PROJECT)])
+    monkeypatch.setattr(mcp_server, "SEARCH_SCOPE_TIMEOUT", 0.2)
+
+    start = time.monotonic()
+    hits = mcp_server.search_memories("database", n_results=3)
+    assert time.monotonic() - start < 0.9
+    assert len(hits) == 3
+    assert {hit["scope"] for hit in hits} == {mcp_server.SCOPE_PROJECT}
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+
+
+def test_hung_scope_is_skipped_until_its_query_returns(collection, monkeypatch):
+    """Test a scope still running a timed-out query is not queried again, so it cannot fill the search pool"""
+    store(collection)
+    monkeypatch.setattr(mcp_server, "_abandoned", {})
+    release = threading.Event()
+    calls = []
+
+    class HungCollection:
+        def query(self, **kwargs):
+            calls.append(1)
+            release.wait(timeout=5)
+            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+    monkeypatch.setattr(mcp_server, "get_collections_for_scope",
+                        lambda scope: [(HungCollection(), mcp_server.SCOPE_GLOBAL), (collection, mcp_server.SCOPE_PROJECT)])
+    monkeypatch.setattr(mcp_server, "SEARCH_SCOPE_TIMEOUT", 0.2)
+    for _ in range(3):
+        hits = mcp_server.search_memories("database", n_results=2)
+        assert {hit["scope"] for hit in hits} == {mcp_server.SCOPE_PROJECT}
+    assert len(calls) == 1
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while mcp_server._abandoned[mcp_server.SCOPE_GLOBAL] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    mcp_server.search_memories("database", n_results=2)
+    assert len(calls) == 2
+
+
+def test_search_results_are_cached_until_a_write(collection, monkeypatch):
+    """Test repeated searches skip embedding and any write invalidates the cached results"""
+    store(collection)
+    monkeypatch.setattr(mcp_server, "_search_cache", SearchResultCache())
+    first = mcp_server.search_memories("Which database do we use?", n_results=2)
+    embedded = len(collection.embed_calls)
+
+    again = mcp_server.search_memories("  which DATABASE do we use? ", n_results=2)
+    assert [hit["id"] for hit in again] == [hit["id"] for hit in first]
+    assert len(collection.embed_calls) == embedded
+
+    generation = collection.generation()
+    collection.delete(ids=[first[0]["id"]])
+    assert collection.generation() != generation
+    after = mcp_server.search_memories("Which database do we use?", n_results=2)
+    assert first[0]["id"] not in [hit["id"] for hit in after]
+    assert len(collection.embed_calls) == embedded + 1
+    assert mcp_server._search_cache.stats()["hits"] == 1
+
+
+def test_identifier_queries_are_cached_case_sensitively(collection, monkeypatch):
+    """Test an identifier query is not answered with the cached ranking of another casing"""
+    store(collection, {**DOCS, "lower": "rag_sync reads sync_state_file before hashing."})
+    monkeypatch.setattr(mcp_server, "_search_cache", SearchResultCache())
+    assert [hit["id"] for hit in mcp_server.search_memories("sync_state_file", n_results=2)] == ["lower", "sync"]
+    assert [hit["id"] for hit in mcp_server.search_memories("SYNC_STATE_FILE", n_results=2)] == ["sync", "lower"]
+    assert [hit["id"] for hit in mcp_server.search_memories("sync_state_file", n_results=2)] == ["lower", "sync"]
+    assert mcp_server._search_cache.stats()["hits"] == 1
+
+
+def test_search_batch_embeds_once_and_dedupes(collection, monkeypatch):
+    """Test a batch embeds all queries in one call, sends one multi-query per filter and dedupes output"""
+    store(collection)
+    collection.update(ids=["db"], metadatas=[{"source": "/notes/db.md", "memory_type": "decision"}])
+    monkeypatch.setattr(mcp_server, "_search_cache", SearchResultCache())
+    calls = []
+    query = collection.query
+
+    def counting_query(**kwargs):
+        calls.append((len(kwargs["query_embeddings"]), kwargs["where"]))
+        return query(**kwargs)
+
+    monkeypatch.setattr(collection, "query", counting_query)
+    embedded = len(collection.embed_calls)
+
+    queries = [
+        {"query": "database choice", "memory_type": "decision"},
+        {"query": "fish shell config", "n_results": 4},
+        {"query": "embedding cache", "n_results": 4},
+    ]
+    text = mcp_server.handle_tool("rag_search_batch", {"queries": queries, "scope": "project"})[0].text
+
+    assert collection.embed_calls[embedded:] == [3]
+    assert sorted(calls, key=lambda c: c[0]) == [(1, {"memory_type": "decision"}), (2, None)]
+    assert text.count("## ") == 3
+    # Queries 2 and 3 return all four memories: those shown earlier are only counted
+    assert "(1 result(s) already shown above)" in text
+    assert "(4 result(s) already shown above)" in text
+
+    results = mcp_server.search_memories_batch(
+        [{"query": q["query"], "n_results": q.get("n_results", 3), "memory_type": q.get("memory_type"), "mode": "vector"}
+         for q in queries], scope="project")
+    assert [hit["id"] for hit in results[0]] == ["db"]
+    assert len(collection.embed_calls) == embedded + 1  # Served from the search cache
+
+
+def test_search_batch_validates_queries(collection):
+    """Test malformed batches are rejected before any search"""
+    assert "non-empty list" in mcp_server.handle_tool("rag_search_batch", {"queries": []})[0].text
+    assert "query 2 is missing" in mcp_server.handle_tool("rag_search_batch", {"queries": ["ok", {"n_results": 2}]})[0].text
+    assert "too many" in mcp_server.handle_tool("rag_search_batch", {"queries": ["q"] * 11})[0].text
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Tests for session parsing and incremental capture
+"""
+import json
+import logging
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import session_parser
+from session_parser import (
+    MEMORY_TYPE_RULES,
+    KeywordMatcher,
+    SessionCatalog,
+    SessionCheckpoints,
+    SimHashIndex,
+    _strip_optional_prefix,
+    detect_memory_type,
+    extract_tags,
+    load_keywords,
+    parse_session_file,
+    parse_sessions_parallel,
+    project_dir_name,
+    scan_session,
+    simhash,
+)
+
+DECISION = "We decided to use PostgreSQL instead of MySQL for the main database of this service."
+BUGFIX = "The error was in the session parser: I fixed the offset handling and it works now, all green again."
+
+
+def assistant_line(text: str) -> str:
+    return json.dumps({"type": "assistant", "message": {"content": [{"type": "text", "text": text}]}}) + "\n"
+
+
+def test_checkpoint_resumes_after_appended_lines(tmp_path):
+    """Test a second pass only yields lines appended since the first"""
+    session = tmp_path / "session.jsonl"
+    session.write_text(assistant_line(DECISION))
+    checkpoints = SessionCheckpoints(str(tmp_path / "checkpoints.json"))
+
+    assert [m.memory_type for m in parse_session_file(session, checkpoints)] == ["decision"]
+    checkpoints.save()
+
+    with open(session, "a") as f:
+        f.write(assistant_line(BUGFIX))
+        f.write(assistant_line(DECISION)[:20])  # Partial line still being written
+
+    reloaded = SessionCheckpoints.load(str(tmp_path / "checkpoints.json"))
+    assert [m.memory_type for m in parse_session_file(session, reloaded)] == ["bugfix"]
+    assert reloaded.entries[str(session)]["offset"] == len(assistant_line(DECISION) + assistant_line(BUGFIX))
+
+
+def test_checkpoints_are_kept_per_namespace(tmp_path):
+    """Test what one collection captured is still unread for another, and clear() only resets its own"""
+    session = tmp_path / "session.jsonl"
+    session.write_text(assistant_line(DECISION))
+    path = str(tmp_path / "checkpoints.json")
+    with open(path, "w") as f:
+        json.dump({str(session): {"inode": session.stat().st_ino, "size": 1, "offset": 1}}, f)  # Pre-namespace file
+
+    project = SessionCheckpoints.load(path, namespace="projects/abc")
+    assert project.entries == {}
+    assert len(list(parse_session_file(session, project))) == 1
+    project.save()
+
+    global_ = SessionCheckpoints.load(path, namespace="global")
+    assert len(list(parse_session_file(session, global_))) == 1
+    global_.save()
+    assert list(parse_session_file(session, SessionCheckpoints.load(path, namespace="projects/abc"))) == []
+
+    SessionCheckpoints.clear("projects/abc", path)
+    assert len(list(parse_session_file(session, SessionCheckpoints.load(path, namespace="projects/abc")))) == 1
+    assert list(parse_session_file(session, SessionCheckpoints.load(path, namespace="global"))) == []
+
+
+def test_checkpoint_restarts_on_truncation_and_rotation(tmp_path):
+    """Test a truncated or replaced file is read again from the start"""
+    session = tmp_path / "session.jsonl"
+    session.write_text(assistant_line(DECISION) + assistant_line(BUGFIX))
+    checkpoints = SessionCheckpoints(str(tmp_path / "checkpoints.json"))
+    assert len(list(parse_session_file(session, checkpoints))) == 2
+    assert list(parse_session_file(session, checkpoints)) == []
+
+    session.write_text(assistant_line(BUGFIX))
+    assert [m.memory_type for m in parse_session_file(session, checkpoints)] == ["bugfix"]
+
+    rotated = tmp_path / "rotated.jsonl"
+    rotated.write_text(assistant_line(BUGFIX) + assistant_line(DECISION))
+    os.replace(rotated, session)
+    assert len(list(parse_session_file(session, checkpoints))) == 2
+
+
+def reference_memory_type(text: str) -> tuple[str, float]:
+    """One re.search per pattern, in priority order (the original implementation)"""
+    for name, patterns, confidence in MEMORY_TYPE_RULES:
+        for pattern in patterns:
+            if re.search(pattern, text.lower(), re.IGNORECASE):
+                return name, confidence
+    return "context", 0.5
+
+
+def test_detect_memory_type_keeps_priority_order():
+    """Test the compiled classifier matches the per-pattern loop, including overlapping matches"""
+    texts = [
+        DECISION,
+        BUGFIX,
+        "The architecture of the project: components are split in modules.",
+        "By default I want tabs.",
+        "Here is the code:\n```python\nprint(1)\n```",
+        "Nothing to see here, just reading logs.",
+        # A lower-priority match starts first and overlaps a higher-priority one
+        "The structure of the project solution is simple",
+        "the fix was to go with a lock",
+        "services we decided",
+    ]
+    for text in texts:
+        assert detect_memory_type(text) == reference_memory_type(text), text
+    assert detect_memory_type("the structure of the code solution is") == ("decision", 0.8)
+
+
+def test_strip_optional_prefix():
+    """Test only leading optional groups are dropped"""
+    assert _strip_optional_prefix(r"(?:j'ai |on a |we )?(décidé|decided)") == "(décidé|decided)"
+    assert _strip_optional_prefix(r"(?:toujours |always )(?:utiliser|use)") == r"(?:toujours |always )(?:utiliser|use)"
+    assert _strip_optional_prefix(r"(?:le |the )?(?:bug|error) (?:was)") == r"(?:bug|error) (?:was)"
+    assert _strip_optional_prefix(r"```[\w]*\n") == r"```[\w]*\n"
+
+
+def test_extract_tags_matches_whole_words_in_keyword_order():
+    """Test substrings no longer produce tags and order follows the keyword list"""
+    assert extract_tags("A good, rapid search through the archive") == []
+    assert extract_tags("Deploy with Docker on Linux, then Python; Go later") == ["python", "go", "docker", "linux"]
+    assert len(extract_tags("python rust go java docker nginx redis git")) == 5
+
+
+def test_keyword_matcher_phrases_and_file(tmp_path):
+    """Test multi-word keywords and loading a keyword file"""
+    keywords = tmp_path / "keywords.txt"
+    keywords.write_text("# team tags\ngithub actions\nterraform  # infra\n\ngithub\n")
+    matcher = KeywordMatcher(load_keywords(str(keywords)))
+    assert matcher.keywords == ["github actions", "terraform", "github"]
+    assert matcher.find("Moved the Terraform plan into GitHub Actions") == ["github actions", "terraform", "github"]
+    assert matcher.find("GitHub alone, actions elsewhere") == ["github"]
+
+
+def test_prefilter_skips_other_lines_without_losing_memories(tmp_path):
+    """Test non-assistant lines are skipped undecoded, broken lines don't stop parsing"""
+    session = tmp_path / "session.jsonl"
+    with open(session, "wb") as f:
+        f.write(json.dumps({"type": "user", "message": {"content": DECISION}}).encode() + b"\n")
+        f.write(b'{"type": "assistant", "message": {"content": [{"type": "text", "text": "\xff\xfe broken"}]}}\n')
+        f.write(assistant_line(BUGFIX).encode())
+        f.write(json.dumps({"type": "summary", "summary": "Moved capture to checkpoints"}).encode() + b"\n")
+
+    memories = list(parse_session_file(session))
+    assert [m.memory_type for m in memories] == ["bugfix", "context"]
+    assert memories[1].content == "Session summary: Moved capture to checkpoints"
+
+
+def test_oversized_line_is_truncated_and_salvaged(tmp_path, monkeypatch):
+    """Test a line over MAX_LINE_SIZE still yields its (truncated) assistant text"""
+    monkeypatch.setattr(session_parser, "MAX_LINE_SIZE", 400)
+    monkeypatch.setattr(session_parser, "READ_BLOCK_SIZE", 64)
+    session = tmp_path / "session.jsonl"
+    huge = DECISION + " Détails: " + "é" * 2000
+    with open(session, "w") as f:
+        f.write(json.dumps({"type": "user", "message": {"content": "x" * 5000}}) + "\n")
+        f.write(json.dumps({"timestamp": "2026-01-01T00:00:00", "message": {"role": "assistant", "content": [
+            {"type": "text", "text": huge}, {"type": "tool_use", "input": {"data": "y" * 5000}}
+        ]}, "type": "assistant"}) + "\n")
+        f.write(assistant_line(BUGFIX))
+
+    memories = list(parse_session_file(session))
+    assert [m.memory_type for m in memories] == ["decision", "bugfix"]
+    assert memories[0].content.startswith(DECISION)
+    assert huge.startswith(memories[0].content)
+    assert memories[0].timestamp == "2026-01-01T00:00:00"
+
+
+def test_read_budget_resumes_across_passes(tmp_path):
+    """Test a session over the per-pass budget is read completely, one bounded pass at a time"""
+    session = tmp_path / "session.jsonl"
+    texts = [f"{DECISION} Variant {i}." for i in range(10)]
+    session.write_text("".join(assistant_line(t) for t in texts))
+    line_size = len(assistant_line(texts[0]))
+
+    checkpoints = SessionCheckpoints(str(tmp_path / "checkpoints.json"))
+    first = list(parse_session_file(session, checkpoints, max_bytes=line_size * 3))
+    assert len(first) == 3
+
+    passes = list(parse_sessions_parallel([session], checkpoints, jobs=1, max_bytes=line_size * 3))
+    assert [len(memories) for _, memories, _ in passes] == [3, 3, 1]
+    assert [finished for _, _, finished in passes] == [False, False, True]
+    assert checkpoints.entries[str(session)]["offset"] == session.stat().st_size
+
+
+def test_read_budget_counts_from_where_a_rotated_file_restarts(tmp_path, caplog):
+    """Test a rotated session over the budget is not marked finished after its first pass"""
+    session = tmp_path / "session.jsonl"
+    session.write_text("".join(assistant_line(f"{DECISION} Old {i}.") for i in range(10)))
+    checkpoints = SessionCheckpoints(str(tmp_path / "checkpoints.json"))
+    list(parse_session_file(session, checkpoints, max_bytes=None))
+
+    rotated = tmp_path / "rotated.jsonl"
+    texts = [f"{BUGFIX} New {i}." for i in range(6)]
+    rotated.write_text("".join(assistant_line(t) for t in texts))
+    os.replace(rotated, session)
+    line_size = len(assistant_line(texts[0]))
+    memories, checkpoint, more = scan_session(str(session), checkpoints.entries[str(session)], line_size * 3)
+    assert len(memories) == 3 and more
+    assert checkpoint["offset"] == line_size * 3
+
+    # Without checkpoints nothing resumes: the skipped rest is reported
+    with caplog.at_level(logging.WARNING):
+        assert len(list(parse_session_file(session, max_bytes=line_size * 3))) == 3
+    assert "the rest is skipped" in caplog.text
+
+
+def test_session_catalog_scopes_to_project(tmp_path):
+    """Test the catalog lists only this project's sessions, newest first, with captured offsets"""
+    projects = tmp_path / "projects"
+    mine = projects / project_dir_name("/work/my_app")
+    other = projects / project_dir_name("/work/other")
+    mine.mkdir(parents=True)
+    other.mkdir()
+    assert mine.name == "-work-my-app"
+
+    old, new = mine / "old.jsonl", mine / "new.jsonl"
+    old.write_text(assistant_line(DECISION))
+    new.write_text(assistant_line(BUGFIX))
+    os.utime(old, (1, 1))
+    (other / "x.jsonl").write_text(assistant_line(DECISION))
+    (mine / "link.jsonl").symlink_to(other / "x.jsonl")
+
+    checkpoints = SessionCheckpoints(tmp_path / "checkpoints.json")
+    checkpoints.update(old, old.stat(), old.stat().st_size)
+
+    catalog = SessionCatalog(projects)
+    infos = catalog.sessions("/work/my_app", checkpoints)
+    assert [i.path.name for i in infos] == ["new.jsonl", "old.jsonl"]
+    assert [i.unread for i in infos] == [new.stat().st_size, 0]
+    assert len(catalog.sessions()) == 3
+    assert catalog.sessions("/work/missing") == []
+
+
+def test_simhash_index_finds_restatements_only():
+    """Test near-identical texts land within the SimHash distance and unrelated ones do not"""
+    index = SimHashIndex(distance=4)
+    index.add(simhash(BUGFIX))
+    assert index.find(simhash(BUGFIX.replace(" again", ""))) is not None
+    assert index.find(simhash(DECISION)) is None
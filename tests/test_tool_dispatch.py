@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Tests for non-blocking MCP tool dispatch
+"""
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mcp_server
+from embedding_backends import HashBackend
+from embedding_cache import EmbeddingCache, LRUVectorCache
+
+
+def test_slow_tool_does_not_block_other_tools(monkeypatch):
+    """Test a slow bulk tool runs concurrently with an interactive one"""
+    def fake_handle(name, arguments):
+        time.sleep(0.5 if name == "rag_index" else 0.01)
+        return name
+
+    monkeypatch.setattr(mcp_server, "handle_tool", fake_handle)
+
+    async def run():
+        start = time.perf_counter()
+        index_task = asyncio.create_task(mcp_server.call_tool("rag_index", {}))
+        await asyncio.sleep(0.05)
+        assert await mcp_server.call_tool("rag_search", {}) == "rag_search"
+        search_done = time.perf_counter() - start
+        assert await index_task == "rag_index"
+        return search_done
+
+    assert asyncio.run(run()) < 0.4
+
+
+def test_bulk_tool_concurrency_limit(monkeypatch):
+    """Test two rag_index calls are serialized by the per-tool limit"""
+    active = []
+    peak = []
+
+    def fake_handle(name, arguments):
+        active.append(name)
+        peak.append(len(active))
+        time.sleep(0.05)
+        active.remove(name)
+        return name
+
+    monkeypatch.setattr(mcp_server, "handle_tool", fake_handle)
+    monkeypatch.setattr(mcp_server, "_tool_semaphores", {})
+
+    async def run():
+        await asyncio.gather(*(mcp_server.call_tool("rag_index", {}) for _ in range(3)))
+
+    asyncio.run(run())
+    assert max(peak) == 1
+
+
+def test_cache_counters_are_exact_across_threads(monkeypatch, tmp_path):
+    """Test embedding cache hits/misses are not lost when handlers embed concurrently"""
+    monkeypatch.setattr(mcp_server, "get_backend", lambda: HashBackend(dim=8))
+    monkeypatch.setattr(mcp_server, "get_disk_cache", lambda: EmbeddingCache(str(tmp_path / "cache.db")))
+    monkeypatch.setattr(mcp_server, "_embedding_cache", LRUVectorCache())
+    before = mcp_server.get_cache_stats()["total"]
+
+    texts = [f"text {i % 20}" for i in range(50)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda chunk: mcp_server.get_embeddings_batch(chunk), [texts] * 16))
+        list(pool.map(mcp_server.get_embedding, texts * 4))
+
+    assert mcp_server.get_cache_stats()["total"] - before == 16 * 50 + 4 * 50
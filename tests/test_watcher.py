@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the file watcher (claude-rag watch)
+"""
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mcp_server
+import watcher
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What claude-rag watch does from its own process: write through a separate client
+OTHER_PROCESS_WRITE = """
+import sys
+sys.path.insert(0, sys.argv[1])
+import chromadb
+from lexical_index import LEXICAL_INDEX_FILE, IndexedCollection, LexicalIndex
+client = chromadb.PersistentClient(path=sys.argv[2])
+coll = IndexedCollection(client.get_collection("memories"), LexicalIndex(sys.argv[2] + "/" + LEXICAL_INDEX_FILE))
+coll.upsert(ids=["theirs"], embeddings=[[0.0, 1.0]], documents=["written by the watcher"])
+"""
+
+
+def test_change_queue_debounces_and_coalesces():
+    """Test bursts of edits to one file come out once, after the quiet period"""
+    queue = watcher.ChangeQueue(debounce=1.0, max_delay=10.0)
+    for t in (0.0, 0.3, 0.6):
+        queue.add("/a.md", now=t)
+    queue.add("/b.md", now=0.5)
+
+    assert len(queue) == 2
+    assert queue.pop_ready(now=1.4) == []
+    assert queue.lag(now=1.4) == 1.4
+    assert queue.pop_ready(now=1.5) == ["/b.md"]
+    assert queue.pop_ready(now=1.6) == ["/a.md"]
+    assert len(queue) == 0
+
+
+def test_change_queue_max_delay_for_constant_edits():
+    """Test a file that never goes quiet is still released after max_delay"""
+    queue = watcher.ChangeQueue(debounce=1.0, max_delay=3.0)
+    t = 0.0
+    while t < 3.0:
+        queue.add("/busy.md", now=t)
+        t += 0.5
+    assert queue.pop_ready(now=3.0) == ["/busy.md"]
+
+
+def test_polling_observer_reports_changes_and_backs_off(tmp_path):
+    """Test polling picks up added/modified/deleted files and slows down while idle"""
+    (tmp_path / "a.md").write_text("one")
+    (tmp_path / "b.md").write_text("two")
+    changes = []
+    observer = watcher.PollingObserver([str(tmp_path)], [], changes.append, min_interval=1.0, max_interval=4.0)
+
+    assert observer.poll() == 0
+    assert observer.poll() == 0
+    assert observer.interval == 2.25
+
+    (tmp_path / "a.md").write_text("one, edited")
+    (tmp_path / "b.md").unlink()
+    (tmp_path / "c.md").write_text("three")
+    (tmp_path / "ignored.bin").write_text("x")
+    assert observer.poll() == 3
+    assert sorted(os.path.basename(p) for p in changes) == ["a.md", "b.md", "c.md"]
+    assert observer.interval == 1.0
+
+
+def test_writes_from_another_process_reach_queries(monkeypatch, tmp_path):
+    """Test the server reopens a collection another process wrote to (Chroma would keep serving stale vectors)"""
+    db_path = str(tmp_path / "db")
+    monkeypatch.setattr(mcp_server, "get_db_path", lambda scope: db_path)
+    monkeypatch.setattr(mcp_server, "check_embedding_dimension", lambda collection, scope: None)
+    monkeypatch.setattr(mcp_server, "_clients", {})
+    monkeypatch.setattr(mcp_server, "_collections", {})
+
+    coll = mcp_server.get_collection(mcp_server.SCOPE_GLOBAL)
+    coll.upsert(ids=["ours"], embeddings=[[1.0, 0.0]], documents=["written by the server"])
+    assert mcp_server.get_collection(mcp_server.SCOPE_GLOBAL) is coll
+    system = mcp_server._clients[mcp_server.SCOPE_GLOBAL]._system
+
+    subprocess.run([sys.executable, "-c", OTHER_PROCESS_WRITE, REPO, db_path], check=True, capture_output=True)
+    fresh = mcp_server.get_collection(mcp_server.SCOPE_GLOBAL)
+    assert fresh is not coll
+    assert not system._running  # The dropped system is stopped, not leaked
+    assert fresh.query(query_embeddings=[[0.0, 1.0]], n_results=1)["ids"] == [["theirs"]]
+    assert mcp_server.get_collection(mcp_server.SCOPE_GLOBAL) is fresh
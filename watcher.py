@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Claude Code RAG - File Watcher
+Keeps memory fresh while files change: files tracked by rag_sync plus watched
+directories are debounced, coalesced and fed to the incremental indexer.
+Uses watchfiles (inotify/FSEvents) when installed, otherwise stdlib polling.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+import mcp_server
+from indexer import INDEX_MAX_FILE_SIZE, is_ignored_path, walk_files
+
+# Configuration
+WATCH_PATHS = [p for p in os.environ.get("WATCH_PATHS", "").split(os.pathsep) if p]
+WATCH_DEBOUNCE = float(os.environ.get("WATCH_DEBOUNCE", "1.0"))
+WATCH_POLL_MAX = float(os.environ.get("WATCH_POLL_MAX", "30"))
+
+# A file that keeps changing is still indexed at least this often
+WATCH_MAX_DELAY = 10.0
+
+# Polling backs off from the min to the max interval while nothing changes
+WATCH_POLL_MIN = 1.0
+WATCH_POLL_BACKOFF = 1.5
+
+# Rewrite the status file at least this often, so readers can tell the watcher is alive
+STATUS_HEARTBEAT = mcp_server.WATCH_STATUS_MAX_AGE / 3
+
+
+class ChangeQueue:
+    """Pending changed paths, coalesced per path and released once quiet for `debounce` seconds"""
+
+    def __init__(self, debounce: float = WATCH_DEBOUNCE, max_delay: float = WATCH_MAX_DELAY):
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._pending = {}  # path -> (first_seen, last_seen)
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending)
+
+    def add(self, path: str, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        with self._cond:
+            first, _ = self._pending.get(path, (now, now))
+            self._pending[path] = (first, now)
+            self._cond.notify()
+
+    def _is_ready(self, first: float, last: float, now: float) -> bool:
+        return now - last >= self.debounce or now - first >= self.max_delay
+
+    def pop_ready(self, now: Optional[float] = None) -> list[str]:
+        """Remove and return paths that are quiet (or have waited max_delay)"""
+        now = time.monotonic() if now is None else now
+        with self._cond:
+            ready = [p for p, (first, last) in self._pending.items() if self._is_ready(first, last, now)]
+            for path in ready:
+                del self._pending[path]
+            return ready
+
+    def wait(self, timeout: float):
+        """Sleep until the next path can become ready, a new path arrives, or timeout"""
+        with self._cond:
+            if self._pending:
+                deadline = min(min(last + self.debounce, first + self.max_delay)
+                               for first, last in self._pending.values())
+                timeout = min(timeout, max(0.0, deadline - time.monotonic()))
+            self._cond.wait(timeout)
+
+    def wake(self):
+        """Interrupt a wait() early"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def lag(self, now: Optional[float] = None) -> float:
+        """Age in seconds of the oldest pending change"""
+        now = time.monotonic() if now is None else now
+        with self._cond:
+            if not self._pending:
+                return 0.0
+            return now - min(first for first, _ in self._pending.values())
+
+
+class PollingObserver:
+    """Stdlib fallback: periodic (mtime, size) snapshots with adaptive interval"""
+
+    mode = "polling"
+
+    def __init__(self, roots: list[str], files: list[str], on_change: Callable[[str], None],
+                 min_interval: float = WATCH_POLL_MIN, max_interval: float = WATCH_POLL_MAX):
+        self.roots = roots
+        self.files = files
+        self.on_change = on_change
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.interval = min_interval
+        self._snapshot = self.scan()
+
+    def scan(self) -> dict:
+        snapshot = {}
+        for root in self.roots:
+            for path, _, stat in walk_files(root, mcp_server.SUPPORTED_EXTENSIONS):
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        for path in self.files:
+            try:
+                stat = os.stat(path)
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                continue
+        return snapshot
+
+    def poll(self) -> int:
+        """Compare against the previous snapshot and report changed paths"""
+        snapshot = self.scan()
+        changed = {p for p, state in snapshot.items() if self._snapshot.get(p) != state}
+        changed.update(p for p in self._snapshot if p not in snapshot)
+        self._snapshot = snapshot
+        for path in sorted(changed):
+            self.on_change(path)
+
+        # Back off while idle, snap back to fast polling on activity
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.max_interval, self.interval * WATCH_POLL_BACKOFF)
+        return len(changed)
+
+    def run(self, stop: threading.Event):
+        while not stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logging.warning(f"Watch poll failed: {e}")
+
+
+class NativeObserver:
+    """OS file events through watchfiles (optional dependency)"""
+
+    mode = "native"
+
+    def __init__(self, roots: list[str], files: list[str], on_change: Callable[[str], None]):
+        import watchfiles  # noqa: F401 - fail early when not installed
+        self.roots = roots
+        self.files = set(files)
+        self.on_change = on_change
+
+    def _accept(self, path: str) -> bool:
+        if path in self.files:
+            return True
+        if os.path.splitext(path)[1].lower() not in mcp_server.SUPPORTED_EXTENSIONS:
+            return False
+        for root in self.roots:
+            if path.startswith(root + os.sep):
+                if is_ignored_path(root, path):
+                    return False
+                try:
+                    return os.path.getsize(path) <= INDEX_MAX_FILE_SIZE
+                except OSError:
+                    return True  # Deleted: let the indexer drop its chunks
+        return False
+
+    def _watch(self, paths: list[str], recursive: bool, stop: threading.Event):
+        import watchfiles
+        for changes in watchfiles.watch(*paths, recursive=recursive, stop_event=stop, debounce=50):
+            for _, path in changes:
+                if self._accept(path):
+                    self.on_change(path)
+
+    def run(self, stop: threading.Event):
+        # Editors replace files by rename, so single files are watched through their directory
+        parents = sorted({os.path.dirname(f) for f in self.files if os.path.isdir(os.path.dirname(f))})
+        threads = []
+        for paths, recursive in ((self.roots, True), (parents, False)):
+            if paths:
+                thread = threading.Thread(target=self._watch, args=(paths, recursive, stop), daemon=True)
+                thread.start()
+                threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+
+def get_synced_files() -> dict:
+    """Files tracked by rag_sync: {path: scope}"""
+    files = {}
+    for key in mcp_server.get_sync_state():
+        scope, _, path = key.partition(":")
+        if path:
+            files[path] = scope
+    return files
+
+
+class Watcher:
+    """Feeds debounced file changes to rag_sync (tracked files) or the incremental indexer"""
+
+    def __init__(self, roots: list[str], synced: dict, scope: str = mcp_server.SCOPE_PROJECT,
+                 debounce: float = WATCH_DEBOUNCE, native: Optional[bool] = None,
+                 status_file: Optional[str] = mcp_server.WATCH_STATUS_FILE):
+        self.roots = [os.path.abspath(os.path.expanduser(r)) for r in roots]
+        self.synced = synced
+        self.scope = scope
+        self.status_file = status_file
+        self.queue = ChangeQueue(debounce)
+        self.processed = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_batch = None
+        self.observer = self._create_observer(native)
+        self._status_written = 0.0
+        self._stop = threading.Event()
+
+    def _create_observer(self, native: Optional[bool]):
+        if native is not False:
+            try:
+                return NativeObserver(self.roots, list(self.synced), self.queue.add)
+            except ImportError:
+                if native:
+                    raise
+        return PollingObserver(self.roots, list(self.synced), self.queue.add)
+
+    def process(self, paths: list[str]) -> dict:
+        """Reindex one batch of changed paths"""
+        start = time.time()
+        result = {"files": len(paths), "updated": 0, "removed": 0}
+
+        by_scope = {}
+        indexed = []
+        for path in paths:
+            if path in self.synced:
+                by_scope.setdefault(self.synced[path], []).append(path)
+            else:
+                indexed.append(path)
+
+        try:
+            for scope, files in by_scope.items():
+                synced = mcp_server.sync_paths(files, scope=scope)
+                result["updated"] += len(synced["updated"])
+            if indexed:
+                changes = mcp_server.index_files(indexed, scope=self.scope)
+                result["updated"] += changes["updated"]
+                result["removed"] += changes["removed"]
+        except Exception as e:
+            self.errors += 1
+            result["error"] = str(e)
+            logging.warning(f"Watch reindex failed: {e}")
+
+        self.processed += len(paths)
+        self.batches += 1
+        result["elapsed"] = time.time() - start
+        self.last_batch = dict(result, at=time.time())
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "mode": self.observer.mode,
+            "roots": self.roots,
+            "synced_files": len(self.synced),
+            "queue_depth": len(self.queue),
+            "lag": round(self.queue.lag(), 3),
+            "processed": self.processed,
+            "batches": self.batches,
+            "errors": self.errors,
+            "last_batch": self.last_batch,
+            "updated_at": time.time(),
+        }
+
+    def write_status(self, force: bool = False):
+        if not self.status_file or (not force and time.time() - self._status_written < STATUS_HEARTBEAT):
+            return
+        try:
+            os.makedirs(os.path.dirname(self.status_file), exist_ok=True)
+            tmp = f"{self.status_file}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.stats(), f, indent=2)
+            os.replace(tmp, self.status_file)
+            self._status_written = time.time()
+        except OSError as e:
+            logging.warning(f"Could not write watch status: {e}")
+
+    def stop(self):
+        self._stop.set()
+        self.queue.wake()
+
+    def run(self, on_batch: Optional[Callable[[dict], None]] = None):
+        """Watch until stop() is called"""
+        stop = self._stop
+        observer = threading.Thread(target=self.observer.run, args=(stop,), name="watch-observer", daemon=True)
+        observer.start()
+        self.write_status(force=True)
+        try:
+            while not stop.is_set():
+                self.queue.wait(timeout=STATUS_HEARTBEAT)
+                paths = self.queue.pop_ready()
+                if paths:
+                    result = self.process(paths)
+                    if on_batch:
+                        on_batch(result)
+                self.write_status(force=bool(paths))
+        finally:
+            stop.set()
+            observer.join(timeout=5)
+            if self.status_file:
+                try:
+                    os.remove(self.status_file)
+                except OSError:
+                    pass
+
@@ -7,6 +7,7 @@ from __future__ import annotations
 
 import os
 import sys
+import threading
 from pathlib import Path
 from datetime import datetime
 from string import Template
@@ -18,6 +19,10 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import uvicorn
 
+from embedding_backends import get_backend
+from embedding_cache import SearchResultCache, cached_embed
+from lexical_index import LEXICAL_INDEX_FILE, IndexedCollection, LexicalIndex
+
 # Add project root to path
 SCRIPT_DIR = Path(__file__).parent
 sys.path.insert(0, str(SCRIPT_DIR))
@@ -26,6 +31,8 @@ sys.path.insert(0, str(SCRIPT_DIR))
 try:
     import chromadb
     from chromadb.config import Settings
+
+    from chroma_client import reopen_client
     CHROMA_AVAILABLE = True
 except ImportError:
     CHROMA_AVAILABLE = False
@@ -60,47 +67,86 @@ def get_db_path(scope: str) -> str:
         return os.path.join(chroma_base, project_id)
 
 
+# Opened collections, reused across requests (scope -> IndexedCollection)
+_collections = {}
+_collections_lock = threading.Lock()
+
+
+def _open_collection(db_path: str, index: LexicalIndex, reopen: bool = False) -> IndexedCollection:
+    """
+    Open a scope's collection. reopen: another process (the MCP server) wrote since
+    it was opened, so the client is replaced to read the database afresh.
+    """
+    index.acknowledge()  # First: writes landing from now on trigger another reopen
+    settings = Settings(anonymized_telemetry=False)
+    if reopen:
+        client = reopen_client(db_path, settings=settings)
+    else:
+        client = chromadb.PersistentClient(path=db_path, settings=settings)
+    # Deletes from the dashboard must reach the BM25 index as well
+    return IndexedCollection(client.get_collection("memories"), index)
+
+
 def get_collection(scope: str = "project"):
     """Get ChromaDB collection (matches mcp_server.py structure)"""
     if not CHROMA_AVAILABLE:
         return None
 
+    collection = _collections.get(scope)
+    if collection is not None and not collection.changed_elsewhere():
+        return collection
+
     db_path = get_db_path(scope)
     if not os.path.exists(db_path):
         return None
 
-    try:
-        client = chromadb.PersistentClient(
-            path=db_path,
-            settings=Settings(anonymized_telemetry=False)
-        )
-        return client.get_collection("memories")
-    except Exception:
-        return None
+    with _collections_lock:
+        collection = _collections.get(scope)
+        if collection is not None and not collection.changed_elsewhere():
+            return collection
+        index = collection.lexical if collection else LexicalIndex(os.path.join(db_path, LEXICAL_INDEX_FILE))
+        try:
+            opened = _open_collection(db_path, index, reopen=collection is not None)
+        except Exception:
+            return collection  # A failed reopen keeps serving what was open
+        _collections[scope] = opened
+        return opened
 
 
 def get_embedding(text: str) -> list:
-    """Get embedding from Ollama"""
-    import requests
-    resp = requests.post(
-        f"{OLLAMA_URL}/api/embeddings",
-        json={"model": "nomic-embed-text", "prompt": text},
-        timeout=30
-    )
-    return resp.json().get("embedding", [])
+    """Get embedding from the configured backend (through the persistent cache)"""
+    backend = get_backend()
+    try:
+        return cached_embed([text], backend.cache_model, backend.embed)[0]
+    except ValueError:
+        return []
+
+
+# Live search re-runs identical queries: results are reused until a collection is written to
+_search_cache = SearchResultCache()
 
 
 def search_memories(query: str, scope: str = "all", n_results: int = 20, memory_type: str = None) -> list:
     """Search memories"""
     results = []
     scopes = ["project", "global"] if scope == "all" else [scope]
+    collections = [(s, get_collection(s)) for s in scopes]
+
+    # A scope without a database yet still gets a version, so creating it invalidates too
+    generations = tuple(collection.generation() if collection else "absent" for _, collection in collections)
+    key = None
+    if None not in generations:
+        key = _search_cache.key(query, scope, n_results, memory_type, generations)
+        cached = _search_cache.get(key)
+        if cached is not None:
+            return cached
 
     query_embedding = get_embedding(query)
     if not query_embedding:
         return []
 
-    for s in scopes:
-        collection = get_collection(s)
+    complete = True
+    for s, collection in collections:
         if not collection:
             continue
 
@@ -125,9 +171,12 @@ def search_memories(query: str, scope: str = "all", n_results: int = 20, memory_
                     "score": 1 - distance,  # Convert distance to similarity
                 })
         except Exception:
-            pass
+            complete = False
 
-    return sorted(results, key=lambda x: x["score"], reverse=True)[:n_results]
+    results = sorted(results, key=lambda x: x["score"], reverse=True)[:n_results]
+    if key and complete:
+        _search_cache.put(key, results)
+    return results
 
 
 def get_all_memories(scope: str = "all", memory_type: str = None, limit: int = 100) -> list: